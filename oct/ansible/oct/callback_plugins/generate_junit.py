@@ -4,16 +4,16 @@ A callback module that outputs jUnit XML for plays.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from random import choice
-from string import ascii_letters
 from timeit import default_timer as timer
 
 import os
 from ansible.plugins.callback import CallbackBase
-from junit_xml import TestCase, TestSuite
+from junit_xml import TestCase
 from os import getenv, makedirs
 from os.path import abspath, exists, expanduser, join, normpath, realpath, sep, splitext
-from codecs import open as codec_open
+
+from oct.util.junit_report import DEFAULT_OUTPUT_LIMIT, JUnitReportIndex, JUnitReportWriter, junit_report_name
+from oct.util.log_index import new_run_id
 
 
 class CallbackModule(CallbackBase):
@@ -33,22 +33,33 @@ class CallbackModule(CallbackBase):
         self.current_task = None
         self.current_task_start = None
 
-        # we track the entirety of our actions as a
-        # suite, which we can create at the end. For
-        # that, we need to keep track of test suites
-        # during execution and the name of the play-
-        # book we are running
-        self.test_suites = {}
+        # we write every test case to the report as soon
+        # as we have it, so that a long run does not need
+        # to hold all of its results in memory and a run
+        # that dies leaves behind what it has recorded
+        self.log_dir = junit_directory()
+        if not exists(self.log_dir):
+            makedirs(self.log_dir)
+        self.index = JUnitReportIndex(self.log_dir)
+        self.index.recover()
+
+        # reports are named for the run ID, which the CLI
+        # sets so that it can share it with other callbacks
+        # that write files for a run, and the playbook
+        self.run_id = getenv('ANSIBLE_RUN_ID') or new_run_id()
+        self.output_limit = int(getenv('ANSIBLE_JUNIT_OUTPUT_LIMIT', DEFAULT_OUTPUT_LIMIT))
+        self.writer = None
+        self.report_name = None
         self.playbook_name = ''
 
         super(CallbackModule, self).__init__(*args, **kwargs)
 
     def append_test_case(self, test_case):
+        if self.writer is None:
+            return
+
         play_name = self.current_task._parent._play.get_name()
-        if play_name in self.test_suites:
-            self.test_suites[play_name].append(test_case)
-        else:
-            self.test_suites[play_name] = [test_case]
+        self.writer.add_case(play_name, test_case)
 
     def test_case_for_result(self, result):
         return TestCase(
@@ -60,38 +71,16 @@ class CallbackModule(CallbackBase):
         """
         Implementation of the callback endpoint to be
         fired when execution of a new playbook begins.
-        We are only interested in recording the results
-        for the last run of any particular playbook, so
-        if the log directory already exists for this
-        playbook, we will over-write it. Otherwise, we
-        make sure to set up the directory for future
-        writes from other callback handlers.
+        We start the report for the playbook in this run
+        and record it in the index, so that the report
+        can be found without scanning every report.
 
         :param playbook: playbook which began execution
         """
-        # We want the playbook names to be short but
-        # ultimately unique identifiers. If we notice
-        # that we're running a playbook from a known
-        # repo, we strip the leading path for brevity.
-        # We do not need the file extension, and it is
-        # interpreted weirdly by jUnit viewers, so we
-        # get rid of it
-        playbook_path = splitext(normpath(realpath(playbook._file_name)))[0].split(sep)
-        project_prefixes = [
-            ['oct', 'ansible', 'oct', 'playbooks'],
-            ['openshift-ansible', 'playbooks'],
-            ['openshift-ansible-gce', 'playbooks'],
-        ]
-        for i in range(len(playbook_path)):
-            for prefix in project_prefixes:
-                if i + len(prefix) >= len(playbook_path):
-                    continue
-
-                if playbook_path[i:i + len(prefix)] == prefix:
-                    self.playbook_name = sep.join(playbook_path[i + len(prefix):])
-                    return
-
-        self.playbook_name = playbook._file_name
+        self.playbook_name = junit_playbook_name(playbook._file_name)
+        self.report_name = junit_report_name(self.run_id, self.playbook_name)
+        self.index.record_start(self.report_name, self.run_id, self.playbook_name)
+        self.writer = JUnitReportWriter(join(self.log_dir, self.report_name), self.output_limit)
 
     def v2_playbook_on_task_start(self, task, is_conditional):
         """
@@ -161,38 +150,60 @@ class CallbackModule(CallbackBase):
         Implementation of the callback endpoint to be
         fired when a playbook is finished. As we are
         only running one playbook at a time, we know
-        we are done logging and can aggregate the jUnit
-        test suite and serialize it.
+        we are done logging and can finish the report.
 
         :param stats: statistics about the run
         """
-        suites = []
-        for play_name in self.test_suites:
-            suites.append(TestSuite(play_name, self.test_suites[play_name]))
+        if self.writer is not None:
+            self.writer.close()
+            self.index.record_end(self.report_name, self.writer.counts)
+            self.writer = None
 
-        if 'ANSIBLE_JUNIT_DIR' in os.environ:
-            log_dir = abspath(getenv('ANSIBLE_JUNIT_DIR'))
-        else:
-            if 'OCT_CONFIG_HOME' in os.environ:
-                base_dir = getenv('OCT_CONFIG_HOME')
-            else:
-                base_dir = abspath(join(expanduser('~'), '.config'))
-            log_dir = abspath(join(base_dir, 'origin-ci-tool', 'logs', 'junit'))
-
-        if not exists(log_dir):
-            makedirs(log_dir)
-
-        log_filename = ''
-        for _ in range(10):
-            log_basename = '{}.xml'.format(''.join(choice(ascii_letters) for _ in range(10)))
-            log_filename = join(log_dir, log_basename)
-            if not exists(log_filename):
-                # TODO: determine a better way to do this
-                break
-
-        contents = TestSuite.to_xml_string(suites, 'utf-8')
-        with codec_open(log_filename, 'w', 'utf-8') as result_file:
-            result_file.write(contents)
+
+def junit_directory():
+    """
+    Determine the directory that jUnit reports are
+    written to.
+
+    :return: absolute path to the directory
+    """
+    if 'ANSIBLE_JUNIT_DIR' in os.environ:
+        return abspath(getenv('ANSIBLE_JUNIT_DIR'))
+
+    if 'OCT_CONFIG_HOME' in os.environ:
+        base_dir = getenv('OCT_CONFIG_HOME')
+    else:
+        base_dir = abspath(join(expanduser('~'), '.config'))
+    return abspath(join(base_dir, 'origin-ci-tool', 'logs', 'junit'))
+
+
+def junit_playbook_name(playbook_file):
+    """
+    Determine a short but ultimately unique name for
+    a playbook. If we notice that we're running a play-
+    book from a known repo, we strip the leading path
+    for brevity. We do not need the file extension, and
+    it is interpreted weirdly by jUnit viewers, so we
+    get rid of it.
+
+    :param playbook_file: path to the playbook
+    :return: name of the playbook
+    """
+    playbook_path = splitext(normpath(realpath(playbook_file)))[0].split(sep)
+    project_prefixes = [
+        ['oct', 'ansible', 'oct', 'playbooks'],
+        ['openshift-ansible', 'playbooks'],
+        ['openshift-ansible-gce', 'playbooks'],
+    ]
+    for i in range(len(playbook_path)):
+        for prefix in project_prefixes:
+            if i + len(prefix) >= len(playbook_path):
+                continue
+
+            if playbook_path[i:i + len(prefix)] == prefix:
+                return sep.join(playbook_path[i + len(prefix):])
+
+    return playbook_file
 
 
 def format_result(result):
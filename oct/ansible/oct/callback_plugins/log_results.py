@@ -2,24 +2,89 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from contextlib import contextmanager
+from errno import ENOENT
 from functools import wraps
-from logging import INFO, FileHandler
-from os import environ, makedirs
-from os.path import exists, join
-
+from gzip import open as gzip_open
+from hashlib import sha1
+from logging import INFO, Handler
+from os import environ, makedirs, rename, utime
+from os.path import dirname, exists, join
+from threading import Thread
+
+from ansible.module_utils.six import string_types
 from ansible.plugins.callback import CallbackBase
 from structlog import configure, get_logger
 from structlog.stdlib import BoundLogger, LoggerFactory, add_log_level
 from structlog.processors import JSONRenderer, TimeStamper, UnicodeDecoder, format_exc_info
 from yaml import dump
 
+from oct.util.log_index import CONTENT_DIRECTORY, DEFAULT_RETENTION_BYTES, DEFAULT_RETENTION_DAYS, RunLogIndex, new_run_id, \
+    run_event_index_path, run_log_path, summarize_event, write_event_index
+
+try:
+    from queue import Empty, Queue
+except ImportError:
+    from Queue import Empty, Queue
+
+# output fields in task results that may be arbitrarily
+# large and are therefore candidates for storage outside
+# of the log file, and the fields that duplicate them
+_OUTPUT_FIELDS = {
+    'stdout': 'stdout_lines',
+    'stderr': 'stderr_lines',
+    'module_stdout': None,
+    'module_stderr': None,
+}
+
+# output fields longer than this many characters are not
+# written into the log file, unless overridden by setting
+# $ANSIBLE_LOG_OUTPUT_LIMIT; a limit of zero disables this
+_DEFAULT_OUTPUT_LIMIT = 4096
+
+# the most events the writer will render in one batch
+_BATCH_SIZE = 256
+
+# sentinel asking the writer to stop
+_STOP = object()
+
+
+def defer_rendering(_, __, event_dict):
+    """
+    Hand the event to the logging handler without rendering it,
+    so that the expensive work of rendering happens in the writer
+    thread. As the task results we log are shared with Ansible
+    and other callbacks that may change them after we return, we
+    hand off a snapshot of the event instead.
+
+    :param event_dict: structured log event
+    :return: arguments for the standard library logger
+    """
+    return (snapshot(event_dict), ), {}
+
+
+def snapshot(data):
+    """
+    Copy the containers in the data, but not the values they
+    hold, as those are immutable for all intents and purposes
+    and copying large outputs is what we are trying to avoid.
+
+    :param data: data to copy
+    :return: copy of the data
+    """
+    if isinstance(data, dict):
+        return dict((key, snapshot(data[key])) for key in data)
+    if isinstance(data, (list, tuple)):
+        return [snapshot(item) for item in data]
+    return data
+
+
 configure(
     processors=[
         add_log_level,
         TimeStamper(fmt="iso"),
         format_exc_info,
         UnicodeDecoder(),
-        JSONRenderer(),
+        defer_rendering,
     ], context_class=dict, logger_factory=LoggerFactory(), wrapper_class=BoundLogger, cache_logger_on_first_use=True
 )
 logger = get_logger('origin-ci-tool')
@@ -129,13 +194,23 @@ def determine_location_for_workload(workload):
 
 
 def log_callback_result(func):
-    """ Add the `host` and `result` callback parameters to the log. """
+    """
+    Add the `host` and `result` callback parameters to the log,
+    along with identification information about the task that
+    produced the result, so results can be found by task.
+    """
 
     @wraps(func)
     def wrapper(callback_module, raw_result, *args, **kwargs):
         host = raw_result._host.get_name()
         sanitize_results(raw_result._result)
-        with bind_logger(host=host, result=raw_result._result):
+        task_information = {}
+        task = getattr(raw_result, '_task', None)
+        if task is not None:
+            task_information['name'] = task.get_name()
+            task_information['uuid'] = str(task._uuid)
+            task_information['location'] = '{}:{}'.format(*determine_location_for_workload(task))
+        with bind_logger(host=host, result=raw_result._result, **task_information):
             func(callback_module, raw_result, *args, **kwargs)
 
     return wrapper
@@ -164,6 +239,184 @@ def remove_ansible_data(result):
             del result[key]
 
 
+class AsynchronousLogWriter(Handler):
+    """
+    A logging handler that renders and writes events from a
+    background thread, in batches, so that logging large task
+    results does not hold up the Ansible main thread. Large
+    output is moved out of the log file and into files of its
+    own, or truncated, so that the log file stays small.
+    """
+
+    def __init__(self, log_directory, log_path, event_index_path, output_limit, truncate_output):
+        """
+        :param log_directory: root directory for logs
+        :param log_path: compressed file to write the log to
+        :param event_index_path: file to write the index of task results to
+        :param output_limit: longest output to write inline, or zero
+        :param truncate_output: whether to truncate instead of storing output
+        """
+        Handler.__init__(self)
+        self.log_directory = log_directory
+        self.output_limit = output_limit
+        self.truncate_output = truncate_output
+
+        self._renderer = JSONRenderer()
+        self._event_index_path = event_index_path
+        self._event_summaries = []
+        self._line_count = 0
+        self._log_file = gzip_open(log_path, 'wb')
+        self._queue = Queue()
+        self._writer = Thread(target=self._write_batches)
+        self._writer.daemon = True
+        self._writer.start()
+
+    def emit(self, record):
+        """
+        Queue the event for the writer.
+
+        :param record: log record holding an event snapshot
+        """
+        self._queue.put(record.msg)
+
+    def flush(self):
+        """
+        Wait for the writer to write every queued event.
+        """
+        if self._writer.is_alive():
+            self._queue.join()
+            self._log_file.flush()
+
+    def close(self):
+        """
+        Write every queued event and stop the writer.
+        """
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._log_file.close()
+            write_event_index(self._event_index_path, self._event_summaries)
+        Handler.close(self)
+
+    def _write_batches(self):
+        """
+        Write queued events until asked to stop, rendering as
+        many events as are waiting before writing them at once.
+        """
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            lines = []
+            for event in batch:
+                if event is _STOP:
+                    continue
+
+                try:
+                    lines.append(self._render(event))
+                except Exception as e:
+                    # we have nowhere better to report this
+                    lines.append(self._renderer(None, None, {'event': 'failed to render log event', 'error': repr(e)}) + '\n')
+                self._line_count += 1
+
+            self._log_file.write(''.join(lines).encode('utf-8'))
+
+            for _ in batch:
+                self._queue.task_done()
+
+            if _STOP in batch:
+                return
+
+    def _render(self, event):
+        """
+        Render an event as one JSON line.
+
+        :param event: event snapshot
+        :return: rendered event
+        """
+        if isinstance(event, dict):
+            self._limit_output(event)
+        else:
+            # records that were not logged through structlog
+            event = {'event': event}
+
+        line = self._renderer(None, None, event) + '\n'
+        summary = summarize_event(self._line_count, event)
+        if summary:
+            self._event_summaries.append(summary)
+        return line
+
+    def _limit_output(self, data):
+        """
+        Replace output that is too long to be written inline.
+
+        :param data: event snapshot to update in place
+        """
+        if isinstance(data, list):
+            for item in data:
+                self._limit_output(item)
+            return
+
+        if not isinstance(data, dict):
+            return
+
+        for key in list(data.keys()):
+            if key not in data:
+                # we removed a duplicate of an output field
+                continue
+
+            value = data[key]
+            if key in _OUTPUT_FIELDS and isinstance(value, string_types):
+                # we can let people load the data and format
+                # it however they want, but we don't want to
+                # store it twice
+                data.pop(_OUTPUT_FIELDS[key], None)
+                if 0 < self.output_limit < len(value):
+                    data[key] = self._replace_output(value)
+            else:
+                self._limit_output(value)
+
+    def _replace_output(self, output):
+        """
+        Truncate the output or store it in a file named for its
+        content, so that identical output is only stored once.
+        Output that is too long is truncated if the user set
+        $ANSIBLE_LOG_TRUNCATE_OUTPUT.
+
+        :param output: output that is too long
+        :return: value to log instead
+        """
+        if self.truncate_output:
+            return '{}... [{} characters truncated]'.format(output[:self.output_limit], len(output) - self.output_limit)
+
+        encoded_output = output.encode('utf-8')
+        digest = sha1(encoded_output).hexdigest()
+        relative_path = join(CONTENT_DIRECTORY, digest[:2], digest)
+        path = join(self.log_directory, relative_path)
+        try:
+            # stored output is retained for as long as
+            # runs keep producing it, so mark it as used
+            utime(path, None)
+        except OSError as e:
+            if e.errno != ENOENT:
+                raise
+
+            # the output is new, or was pruned since it was stored
+            if not exists(join(self.log_directory, CONTENT_DIRECTORY, digest[:2])):
+                makedirs(join(self.log_directory, CONTENT_DIRECTORY, digest[:2]))
+
+            # readers should never see partial content
+            with open(path + '.tmp', 'wb') as content_file:
+                content_file.write(encoded_output)
+            rename(path + '.tmp', path)
+
+        return {'content': relative_path, 'length': len(output)}
+
+
 class CallbackModule(CallbackBase):
     """ Log playbook, play, and task execution to a file formatted as json. """
     CALLBACK_VERSION = 2.0
@@ -172,13 +425,36 @@ class CallbackModule(CallbackBase):
     CALLBACK_NEEDS_WHITELIST = True
 
     def __init__(self):
-        """ Make sure the log directory exists. """
+        """
+        Make sure the log directory exists, make room for
+        the log for this run and start writing to it.
+        """
         super(CallbackModule, self).__init__()
         log_directory = environ.get('ANSIBLE_LOG_ROOT_PATH')
         if not exists(log_directory):
             makedirs(log_directory)
-        handler = FileHandler(join(log_directory, 'log.txt'), 'a')
-        logger.addHandler(handler)
+
+        # every run is logged to its own file, named for the
+        # run ID, which the CLI sets so that it can share it
+        # with other callbacks that write files for a run
+        self.run_id = environ.get('ANSIBLE_RUN_ID') or new_run_id()
+        self.index = RunLogIndex(log_directory)
+        self.index.prune(
+            retention_days=float(environ.get('ANSIBLE_LOG_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)),
+            retention_bytes=int(environ.get('ANSIBLE_LOG_RETENTION_BYTES', DEFAULT_RETENTION_BYTES)),
+        )
+
+        log_path = run_log_path(log_directory, self.run_id)
+        if not exists(dirname(log_path)):
+            makedirs(dirname(log_path))
+        self.writer = AsynchronousLogWriter(
+            log_directory=log_directory,
+            log_path=log_path,
+            event_index_path=run_event_index_path(log_directory, self.run_id),
+            output_limit=int(environ.get('ANSIBLE_LOG_OUTPUT_LIMIT', _DEFAULT_OUTPUT_LIMIT)),
+            truncate_output='ANSIBLE_LOG_TRUNCATE_OUTPUT' in environ,
+        )
+        logger.addHandler(self.writer)
 
     @log_exceptions_v2_playbook_on_start
     @log_exceptions
@@ -190,7 +466,8 @@ class CallbackModule(CallbackBase):
 
         :param playbook: playbook which began execution
         """
-        logger.info(playbook=playbook._file_name)
+        self.index.record_start(self.run_id, playbook._file_name)
+        logger.info(playbook=playbook._file_name, run_id=self.run_id)
 
     @log_exceptions
     @log_callback_result
@@ -511,3 +788,11 @@ class CallbackModule(CallbackBase):
         :param result: result of the item execution
         """
         logger.info()
+
+        # this is the last event in a playbook run, and the
+        # process may exit without running `atexit` handlers
+        # after it, so we cannot leave any events unwritten
+        # and the compressed log must be closed to be readable
+        logger.removeHandler(self.writer)
+        self.writer.close()
+        self.index.record_end(self.run_id)
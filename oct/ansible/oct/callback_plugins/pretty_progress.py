@@ -1,16 +1,12 @@
 # coding=utf-8
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-try:
-    from Queue import Empty  # for python 2
-except ImportError:
-    from queue import Empty  # for python 3
-from multiprocessing import Process, Queue
+from copy import copy
 from os import environ
 from os.path import join
 from re import sub
 from sys import stderr, stdout
-from time import sleep
+from threading import Event, Thread
 from timeit import default_timer as timer
 
 from ansible.constants import COLOR_ERROR, COLOR_OK, COLOR_SKIP
@@ -20,6 +16,11 @@ from ansible.playbook.task import Task
 from ansible.plugins.callback import CallbackBase
 from backports.shutil_get_terminal_size import get_terminal_size
 
+try:
+    from Queue import Empty, Queue  # for python 2
+except ImportError:
+    from queue import Empty, Queue  # for python 3
+
 RUNNING_PREFIX = 'RUNNING'
 SUCCESS_PREFIX = 'SUCCESS'
 FAILURE_PREFIX = 'FAILURE'
@@ -46,48 +47,235 @@ IDENTIFIER_WIDTH = OUTPUT_WIDTH - \
                    time_padding_width - time_width
 
 # TODO: determine if there is a better way
-MOVE_UP_ONE_LINE = b'\033[F'
-CLEAR_LINE = b'\033[K'
+MOVE_UP_LINES = '\033[{}F'
+MOVE_DOWN_LINES = '\033[{}E'
+CLEAR_LINE = '\033[K'
+CLEAR_BELOW = '\033[J'
+
+# changes to the list of displayed items that
+# the callback sends to the display thread
+APPEND = 'append'
+REPLACE = 'replace'
+COMPLETE = 'complete'
+TRUNCATE = 'truncate'
+FLUSH = 'flush'
+STOP = 'stop'
+
+
+class ProgressDisplay(object):
+    """
+    Displays the workloads on the terminal from a background
+    thread. The callback sends the display only the changes to
+    the list of workloads as they happen, and the display keeps
+    its own copy of the list, repainting at 20Hz only the lines
+    that changed: the running timers of the few workloads that
+    are still running and whatever was added to the end of the
+    list. The cost of a refresh does not grow with the length
+    of the run.
+    """
+
+    def __init__(self):
+        self._queue = Queue()
+
+        # the items we display and the first line of each
+        self._items = []
+        self._offsets = []
+        # indices of items whose timers are still running
+        # and of items changed since we last repainted
+        self._running = set()
+        self._changed = set()
+        # the lines currently on the screen, with the cursor
+        # sitting at the start of the line after the last one
+        self._lines = []
+        # lines that have scrolled off of the screen
+        self._frozen_lines = 0
+
+        self._worker = Thread(target=self._display)
+        # ensure that the worker thread is reaped if
+        # the main thread dies by marking the thread
+        # as a daemon
+        self._worker.daemon = True
+        self._worker.start()
+
+    def send(self, *change):
+        """
+        Send a change to the display thread.
+
+        :param change: kind of change and its arguments
+        """
+        self._queue.put(change)
+
+    def flush(self):
+        """
+        Wait for the display thread to paint all of the changes
+        sent so far. The thread acknowledges the request once it
+        has written them out, so we wait exactly as long as that
+        takes, unless the thread is no longer there to answer.
+        """
+        acknowledged = Event()
+        self.send(FLUSH, acknowledged)
+        while self._worker.is_alive() and not acknowledged.is_set():
+            acknowledged.wait(POLL_DURATION)
+
+    def stop(self):
+        """
+        Wait for the display thread to paint all of the changes
+        sent so far, then ask it to exit and wait for it to do so.
+        Stopping a display that has already stopped does nothing.
+        """
+        if not self._worker.is_alive():
+            return
+
+        self.flush()
+        self.send(STOP)
+        self._worker.join()
+
+    def _display(self):
+        """
+        Apply the changes sent to us and repaint the screen
+        at least every poll interval, until asked to stop.
+        """
+        stopping = False
+        while not stopping:
+            changes = []
+            try:
+                changes.append(self._queue.get(timeout=POLL_DURATION))
+                while True:
+                    changes.append(self._queue.get_nowait())
+            except Empty:
+                pass
+
+            first_appended_item = len(self._items)
+            acknowledgements = []
+            for change in changes:
+                if change[0] == STOP:
+                    stopping = True
+                elif change[0] == FLUSH:
+                    acknowledgements.append(change[1])
+                else:
+                    first_appended_item = min(first_appended_item, self._apply(*change))
+
+            self._repaint(first_appended_item)
+            for acknowledgement in acknowledgements:
+                acknowledgement.set()
+
+    def _apply(self, kind, *args):
+        """
+        Apply a change to the items we display. Workloads
+        always take up one line, so replacing or completing
+        one does not move any of the lines after it, but
+        adding or removing items at the end of the list does.
+
+        :param kind: kind of change
+        :param args: arguments for the change
+        :return: index of the first item added or removed
+        """
+        if kind == APPEND:
+            item, = args
+            self._items.append(item)
+            index = len(self._items) - 1
+        elif kind == TRUNCATE:
+            index, = args
+            del self._items[index:]
+            self._running = set(running for running in self._running if running < index)
+            self._changed = set(changed for changed in self._changed if changed < index)
+            return index
+        else:
+            if kind == REPLACE:
+                index, item = args
+            else:
+                index, status, elapsed_time = args
+                item = copy(self._items[index])
+                item.status, item.elapsed_time = status, elapsed_time
+
+            self._items[index] = item
+            self._changed.add(index)
+
+        if getattr(self._items[index], 'elapsed_time', True) is None:
+            self._running.add(index)
+        else:
+            self._running.discard(index)
+
+        return len(self._items) if kind != APPEND else index
+
+    def _repaint(self, first_appended_item):
+        """
+        Repaint the lines for running or changed items in place
+        and write everything from the first item added or removed
+        on. Lines that have scrolled off of the top of the screen
+        can no longer be reached and are left as they are.
+
+        :param first_appended_item: index of the first item added or removed
+        """
+        # a terminal that does not report its height is
+        # treated as tall enough to hold every line
+        lines = get_terminal_size().lines
+        if lines > 0:
+            self._frozen_lines = max(self._frozen_lines, len(self._lines) - lines + 1)
+
+        # repaint from the bottom up, so we only move up
+        output = []
+        position = len(self._lines)
+        for index in sorted(self._running | self._changed, reverse=True):
+            if index >= min(first_appended_item, len(self._offsets)) or self._offsets[index] < self._frozen_lines:
+                continue
+
+            line = self._items[index].format()
+            if line == self._lines[self._offsets[index]]:
+                continue
+
+            output.append((stdout, MOVE_UP_LINES.format(position - self._offsets[index]) + CLEAR_LINE + line))
+            self._lines[self._offsets[index]] = line
+            position = self._offsets[index] + 1
+        self._changed.clear()
+
+        if first_appended_item < len(self._offsets):
+            first_changed_line = max(self._offsets[first_appended_item], self._frozen_lines)
+        else:
+            first_changed_line = len(self._lines)
 
+        if first_changed_line < position:
+            output.append((stdout, MOVE_UP_LINES.format(position - first_changed_line)))
+        elif first_changed_line > position:
+            output.append((stdout, MOVE_DOWN_LINES.format(first_changed_line - position)))
+        if first_changed_line < len(self._lines):
+            output.append((stdout, CLEAR_BELOW))
 
-def display_workload(queue):
+        del self._lines[first_changed_line:]
+        del self._offsets[first_appended_item:]
+        for index in range(first_appended_item, len(self._items)):
+            self._offsets.append(len(self._lines))
+            item = self._items[index]
+            for line in item.format().splitlines(True):
+                output.append((item.stream, line))
+                self._lines.append(line)
+
+        write_output(output)
+
+
+def write_output(output):
     """
-    Async worker to display the workloads as fed
-    by the queue. Will attempt to fetch new data
-    from the queue at 20Hz, but failing that, it
-    will re-render and display the last seen data
-    to keep the refresh rate at or above 20Hz.
+    Write text to the terminal, keeping the order between
+    what is written to stdout and what is written to stderr.
 
-    :param queue: queue to consume data from
+    :param output: stream and text pairs
     """
-    last_workload = []
-    last_num_lines = 0
-    while True:
-        try:
-            workload = queue.get(timeout=POLL_DURATION)
-        except Empty:
-            workload = last_workload
-
-        # navigate to the top to over-write the last output
-        for i in range(last_num_lines):
-            try:  # for python3
-                stdout.buffer.write(MOVE_UP_ONE_LINE)
-            except AttributeError:  # for python2
-                stdout.write(MOVE_UP_ONE_LINE)
-            if i < last_num_lines - len(workload):
-                # if there are lines in the old output which
-                # we may not overwrite, just clear them
-                try:  # for python3
-                    stdout.buffer.write(CLEAR_LINE)
-                except AttributeError:  # for python2
-                    stdout.write(CLEAR_LINE)
-
-        # re-render and print the new output
-        last_num_lines = 0
-        for item in workload:
-            last_num_lines += item.render()
-
-        last_workload = workload
+    last_stream = None
+    for stream, text in output:
+        if last_stream is not None and stream is not last_stream:
+            last_stream.flush()
+
+        if not isinstance(text, bytes):
+            text = text.encode('utf-8')
+
+        try:  # for python3
+            stream.buffer.write(text)
+        except AttributeError:  # for python2
+            stream.write(text)
+        last_stream = stream
+
+    if last_stream is not None:
+        last_stream.flush()
 
 
 class CallbackModule(CallbackBase):
@@ -107,25 +295,44 @@ class CallbackModule(CallbackBase):
 
         # set up for the async worker we use to update
         # the screen at a rate more frequent than that
-        # which we get callbacks at
-        self._queue = Queue()
-        self._worker = Process(target=display_workload, args=(self._queue, ))
-        # ensure that the worker thread is reaped if
-        # the main thread dies by marking the thread
-        # as a daemon
-        self._worker.daemon = True
-        self._worker.start()
+        # which we get callbacks at; every change we make
+        # to the workloads must also be sent to it
+        self._progress = ProgressDisplay()
 
         super(CallbackModule, self).__init__(*args, **kwargs)
 
+    def append_workload(self, workload):
+        """
+        Add a workload to the end of the list and send
+        it to the display.
+
+        :param workload: Workload or Failure to add
+        """
+        self._workloads.append(workload)
+        # the display must not share the workloads we
+        # go on to change, so it gets its own copy
+        self._progress.send(APPEND, copy(workload))
+
+    def complete_workload(self, index, status):
+        """
+        Update a workload to complete and send the
+        change to the display.
+
+        :param index: index of the workload to update
+        :param status: status to update to
+        """
+        index = index % len(self._workloads)
+        workload = self._workloads[index]
+        workload.complete(status)
+        self._progress.send(COMPLETE, index, workload.status, workload.elapsed_time)
+
     def update_last_workload(self, status):
         """
-        Update the last workload to complete and send
-        the updated list of workloads to the consumer.
+        Update the last workload to complete.
 
         :param status: status to update to
         """
-        self._workloads[-1].complete(status)
+        self.complete_workload(-1, status)
 
     def finalize_last_play(self, status):
         """
@@ -151,8 +358,9 @@ class CallbackModule(CallbackBase):
                 # so we can hide them; otherwise, we want the
                 # users to see the failed tasks
                 self._workloads = self._workloads[:last_play_index + 1]
+                self._progress.send(TRUNCATE, last_play_index + 1)
 
-            self._workloads[last_play_index].complete(status)
+            self.complete_workload(last_play_index, status)
 
     def finalize_playbook(self, status):
         """
@@ -168,7 +376,7 @@ class CallbackModule(CallbackBase):
         # that there is only one playbook in the
         # list of workloads, and that it is the first
         # item in the list
-        self._workloads[0].complete(status)
+        self.complete_workload(0, status)
 
     def v2_playbook_on_start(self, playbook):
         """
@@ -181,7 +389,7 @@ class CallbackModule(CallbackBase):
 
         :param playbook: playbook that just started
         """
-        self._workloads.append(Workload(playbook))
+        self.append_workload(Workload(playbook))
 
     def v2_playbook_on_play_start(self, play):
         """
@@ -193,7 +401,7 @@ class CallbackModule(CallbackBase):
         :param play: play that just started
         """
         self.finalize_last_play(SUCCESS_PREFIX)
-        self._workloads.append(Workload(play))
+        self.append_workload(Workload(play))
 
     def v2_playbook_on_task_start(self, task, is_conditional):
         """
@@ -208,8 +416,9 @@ class CallbackModule(CallbackBase):
         """
         if 'TASK' in self._workloads[-1].identifier:
             self._workloads[-1] = Workload(task)
+            self._progress.send(REPLACE, len(self._workloads) - 1, copy(self._workloads[-1]))
         else:
-            self._workloads.append(Workload(task))
+            self.append_workload(Workload(task))
 
     def v2_runner_on_ok(self, result):
         """
@@ -236,7 +445,7 @@ class CallbackModule(CallbackBase):
         self.update_last_workload(status)
 
         if not ignore_errors:
-            self._workloads.append(Failure(result))
+            self.append_workload(Failure(result))
 
     def v2_runner_on_unreachable(self, result):
         """
@@ -248,7 +457,7 @@ class CallbackModule(CallbackBase):
         :param result: result of the last task
         """
         self.update_last_workload(ERRORED_PREFIX)
-        self._workloads.append(Failure(result))
+        self.append_workload(Failure(result))
 
     def v2_runner_on_skipped(self, result):
         """
@@ -259,28 +468,6 @@ class CallbackModule(CallbackBase):
         """
         self.update_last_workload(SKIPPED_PREFIX)
 
-    def v2_on_any(self, *args, **kwargs):
-        """
-        Implementation of the callback endpoint to be
-        fired *after* any other callback is fired. We
-        know that if a callback happened, it could have
-        changed the state of the workloads we track,
-        so we send the updated state to the consumer
-        thread after any callback. If the callback did
-        not change the internal state, the consumer
-        will just refresh faster than normal, which is
-        not an problem. We also will trigger after the
-        `v2_playbook_on_stats` endpoint, after which
-        we will not have anyone listening to the other
-        end of the queue, but we will also be cleaning
-        up and exiting soon anyway, so again it is not
-        an issue.
-
-        :param args: arguments [ignored]
-        :param kwargs: keyword arguments [ignored]
-        """
-        self._queue.put(self._workloads)
-
     def v2_playbook_on_stats(self, stats):
         """
         Implementation of the callback endpoint to be
@@ -315,25 +502,16 @@ class CallbackModule(CallbackBase):
                 break
 
         self.finalize_playbook(status)
-        # we need to manually trigger this queue update
-        self._queue.put(self._workloads)
-
-        # wait for consumer to post everything we have
-        while not self._queue.empty():
-            sleep(POLL_DURATION)
-
-        # we are using the multiprocessing queue, which
-        # does not implement join() and task_done(), so
-        # we cannot reliably know that the consumer has
-        # worked on the last element when we see that the
-        # queue is empty on our end. No implementation
-        # exists with a peek(), either, so we just have
-        # to wait for one timeout iteration here and
-        # hope for the best.
-        sleep(POLL_DURATION)
-
-        self._worker.terminate()
-        self._worker.join()
+        self.shutdown()
+
+    def shutdown(self):
+        """
+        Wait for the display to paint everything we have
+        and stop it. This is called when the playbook is
+        finished, and by the client once the run is over,
+        as a run that is cut short never finishes.
+        """
+        self._progress.stop()
 
 
 def format_identifier(workload):
@@ -399,6 +577,9 @@ class Workload(object):
         # to be set when we finish this workload
         self.elapsed_time = None
 
+        # where the workload is displayed
+        self.stream = stdout
+
     def __str__(self):
         return self.format()
 
@@ -411,16 +592,6 @@ class Workload(object):
         self.status = format_status(status)
         self.elapsed_time = self.format_runtime()
 
-    def render(self):
-        """
-        Render a representation of this workload onto
-        the screen using stdout.
-
-        :return: number of lines written
-        """
-        stdout.write(self.format())
-        return 1
-
     def format(self):
         """
         Format a string containing:
@@ -594,38 +765,44 @@ class Failure(object):
 
     def __init__(self, result):
         self.identifier = 'FAILURE'
-        self.result = result._result
         self.host = result._host
 
+        # where the failure is displayed
+        self.stream = stderr
+
+        # the result may change after we return, and
+        # the formatted failure never changes, so we
+        # format it now, once, for the display to use
+        self.message = self.format_message(result._result)
+
     def __str__(self):
         return self.format()
 
-    def render(self):
+    def format(self):
         """
-        Render a representation of this failure
-        onto the terminal screen.
+        Format the failure result nicely.
 
-        :return: number of lines written
+        :return: the formatted error
         """
-        full_message = self.format()
-        stderr.write(full_message)
-        return full_message.count('\n')
+        return self.message
 
-    def format(self):
+    def format_message(self, result):
         """
         Format the failure result nicely.
 
+        :param result: result of the failed task
         :return: the formatted error
         """
         full_message = colorize('A task failed on host `{}`!\n'.format(self.host), color=COLOR_ERROR)
-        result = format_result(self.result)
+        result = format_result(result)
 
         if len(result.splitlines()) == 0:
             # we have not been able to get any use-able
             # messages from the result, so we should
             # tell the user to look at the logs
-            # TODO: better OS-agnostic filesystem code for this
-            log_location = join(environ.get('ANSIBLE_LOG_ROOT_PATH', join('tmp', 'ansible', 'log')), '/', '{}'.format(self.host))
+            log_location = join(environ.get('ANSIBLE_LOG_ROOT_PATH', join('tmp', 'ansible', 'log')), 'runs')
+            if 'ANSIBLE_RUN_ID' in environ:
+                log_location = join(log_location, '{}.log.gz'.format(environ['ANSIBLE_RUN_ID']))
             full_message += 'No useful error messages could be extracted, see full output at {}\n'.format(log_location)
         else:
             full_message += result
@@ -0,0 +1,177 @@
+# coding=utf-8
+"""
+A callback module that records how long every task took on
+every host, for runs that the user has asked to profile.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from os import environ
+from timeit import default_timer as timer
+
+from ansible.plugins.callback import CallbackBase
+
+from oct.util.log_index import new_run_id
+from oct.util.profile import profile_path, short_playbook_name, write_profile
+
+
+class CallbackModule(CallbackBase):
+    """
+    Record the wall-clock time every task took on every host,
+    along with the playbook, play and role the task is in, and
+    write the records out as the profile for the run when the
+    playbook is finished.
+    """
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'notification'
+    CALLBACK_NAME = 'record_profile'
+    CALLBACK_NEEDS_WHITELIST = True
+
+    def __init__(self, *args, **kwargs):
+        # profiles are written to this directory, which the
+        # CLI sets when the user asks for `--profile`
+        self.profile_directory = environ.get('ANSIBLE_PROFILE_DIR')
+        self.run_id = environ.get('ANSIBLE_RUN_ID') or new_run_id()
+
+        self.playbook_name = ''
+        self.playbook_start = timer()
+        self.play_name = ''
+
+        # track the currently executing task
+        self.current_task = None
+        self.current_task_start = None
+
+        self.records = []
+
+        super(CallbackModule, self).__init__(*args, **kwargs)
+
+    def start_task(self, task):
+        """
+        Record the start of a new task.
+
+        :param task: task that just started
+        """
+        self.current_task = task
+        self.current_task_start = timer()
+
+    def record_result(self, result, status):
+        """
+        Record the time the current task took on a host.
+
+        :param result: result of the task on the host
+        :param status: status the task finished with
+        """
+        if self.current_task is None:
+            return
+
+        role = self.current_task._role
+        self.records.append({
+            'playbook': self.playbook_name,
+            'play': self.play_name,
+            'role': role.get_name() if role else '',
+            # the name without the role, which we record apart
+            'task': self.current_task.name or self.current_task.action,
+            'location': self.current_task.get_path() or '',
+            'host': result._host.get_name(),
+            'status': status,
+            'start': self.current_task_start - self.playbook_start,
+            'duration': timer() - self.current_task_start,
+        })
+
+    def v2_playbook_on_start(self, playbook):
+        """
+        Implementation of the callback endpoint to be
+        fired when execution of a new playbook begins.
+
+        :param playbook: playbook which began execution
+        """
+        self.playbook_name = short_playbook_name(playbook._file_name)
+        self.playbook_start = timer()
+
+    def v2_playbook_on_play_start(self, play):
+        """
+        Implementation of the callback endpoint to be
+        fired when execution of a new play begins.
+
+        :param play: play that just started
+        """
+        self.play_name = play.get_name()
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        """
+        Implementation of the callback endpoint to be
+        fired when execution of a new task begins.
+
+        :param task: task that just started
+        :param is_conditional: if the task is conditional
+        """
+        self.start_task(task)
+
+    def v2_playbook_on_handler_task_start(self, task):
+        """
+        Implementation of the callback endpoint to be
+        fired when execution of a handler begins.
+
+        :param task: handler that just started
+        """
+        self.start_task(task)
+
+    def v2_playbook_on_cleanup_task_start(self, task):
+        """
+        Implementation of the callback endpoint to be
+        fired when execution of a cleanup task begins.
+
+        :param task: task that just started
+        """
+        self.start_task(task)
+
+    def v2_runner_on_ok(self, result):
+        """
+        Implementation of the callback endpoint to be
+        fired when a task finishes executing successfully.
+
+        :param result: result of the last task
+        """
+        self.record_result(result, 'changed' if result._result.get('changed') else 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        """
+        Implementation of the callback endpoint to be
+        fired when a task fails to execute successfully.
+
+        :param result: result of the last task
+        :param ignore_errors: if we should consider this a failure
+        """
+        self.record_result(result, 'ignored' if ignore_errors else 'failed')
+
+    def v2_runner_on_unreachable(self, result):
+        """
+        Implementation of the callback endpoint to be
+        fired when a task can't reach it's target host.
+
+        :param result: result of the last task
+        """
+        self.record_result(result, 'unreachable')
+
+    def v2_runner_on_skipped(self, result):
+        """
+        Implementation of the callback endpoint to be
+        fired when task execution is skipped.
+
+        :param result: result of the last task
+        """
+        self.record_result(result, 'skipped')
+
+    def v2_playbook_on_stats(self, stats):
+        """
+        Implementation of the callback endpoint to be
+        fired when a playbook is finished. We write the
+        profile for the run now that every task is done.
+
+        :param stats: statistics about the run
+        """
+        if not self.profile_directory:
+            # the callback was enabled without the CLI
+            # telling us where the profile should go
+            return
+
+        write_profile(profile_path(self.profile_directory, self.run_id), self.records)
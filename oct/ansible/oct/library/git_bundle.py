@@ -0,0 +1,283 @@
+# coding=utf-8
+"""
+git_bundle is an Ansible module that packs the state of a local
+repository once, so that it can be shipped to many remote hosts,
+leaving out all of the objects that every remote host already has.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from ansible.module_utils.basic import AnsibleModule
+
+DOCUMENTATION = '''
+---
+module: git_bundle
+short_description: Bundle a Git Repository for Many Hosts
+author: Steve Kuznetsov
+options:
+  repo:
+    description:
+      - The location of the local repository to bundle.
+    required: true
+  version:
+    description:
+      - The branch or tag to bundle, along with all tags.
+    required: true
+  known_refs:
+    description:
+      - For every remote host, the list of objects its refs
+        point to. Objects that every host knows are left out
+        of the bundle.
+    required: false
+    default: []
+  bundle:
+    description:
+      - Where to write the bundle. No bundle is written if
+        every remote host already has every object.
+    required: true
+  refs:
+    description:
+      - Where to write the list of refs the remote hosts
+        should be updated to, one `SHA REF` pair per line.
+    required: true
+  recorded_refs:
+    description:
+      - A list of refs written by an earlier run of this
+        module. If given, the objects those refs point to
+        are bundled instead of the current state of the
+        repository, so that a bundle can be rebuilt once
+        the repository has moved on.
+    required: false
+    default: null
+'''
+
+EXAMPLES = '''
+# Bundle the master branch of Origin for two hosts
+- git_bundle:
+    repo: '/home/origin/go/src/github.com/openshift/origin'
+    version: 'master'
+    known_refs:
+      - [ '2cbd73cbd5aacc965ecfa480fa90164a85191489', 'a7b6c5d4e3f2a1b0c9d8e7f6a5b4c3d2e1f0a9b8' ]
+      - [ '2cbd73cbd5aacc965ecfa480fa90164a85191489' ]
+    bundle: '/tmp/sync/origin.bundle'
+    refs: '/tmp/sync/origin.refs'
+
+# Rebuild that bundle for a host that has fewer objects
+- git_bundle:
+    repo: '/home/origin/go/src/github.com/openshift/origin'
+    version: 'master'
+    known_refs:
+      - [ 'f0e1d2c3b4a5968778695a4b3c2d1e0f9a8b7c6d' ]
+    recorded_refs: '/tmp/sync/origin.refs'
+    bundle: '/tmp/sync/host.bundle'
+    refs: '/tmp/sync/host.refs'
+'''
+
+
+def main():
+    """
+    Bundle the objects for a branch or tag and all tags in a local
+    repository that the remote hosts do not yet have, and record
+    the refs the remote hosts should point to once they have them.
+    """
+    module = AnsibleModule(
+        supports_check_mode=False,
+        argument_spec=dict(
+            repo=dict(
+                required=True,
+                default=None,
+                type='str',
+            ),
+            version=dict(
+                required=True,
+                default=None,
+                type='str',
+            ),
+            known_refs=dict(
+                required=False,
+                default=[],
+                type='list',
+            ),
+            bundle=dict(
+                required=True,
+                default=None,
+                type='str',
+            ),
+            refs=dict(
+                required=True,
+                default=None,
+                type='str',
+            ),
+            recorded_refs=dict(
+                required=False,
+                default=None,
+                type='str',
+            ),
+        ),
+    )
+
+    git = Git(module, module.get_bin_path('git', required=True), module.params['repo'])
+    version = module.params['version']
+    bundle_path = module.params['bundle']
+    refs_path = module.params['refs']
+
+    ref = git.run('rev-parse', '--symbolic-full-name', version).strip()
+    if not ref:
+        module.fail_json(msg='Version {} is not a branch or tag and cannot be synced.'.format(version))
+
+    if module.params['recorded_refs']:
+        local_refs = git.recorded_refs(module.params['recorded_refs'])
+        if ref not in local_refs:
+            module.fail_json(msg='Version {} was not recorded in {}.'.format(version, module.params['recorded_refs']))
+    else:
+        local_refs = git.refs(ref)
+    with open(refs_path, 'w') as refs_file:
+        for name in sorted(local_refs):
+            refs_file.write('{} {}\n'.format(local_refs[name][0], name))
+
+    prerequisites = git.existing_objects(common_objects(module.params['known_refs']))
+    bundle_arguments = determine_bundle_arguments(git, ref, local_refs, prerequisites)
+    if bundle_arguments:
+        git.run('bundle', 'create', bundle_path, *bundle_arguments)
+
+    module.exit_json(
+        changed=bool(bundle_arguments),
+        failed=False,
+        ref=ref,
+        bundled=bool(bundle_arguments),
+        bundle=bundle_path,
+        refs=refs_path,
+        prerequisites=len(prerequisites),
+    )
+
+
+def common_objects(known_refs):
+    """
+    Determine the objects that every remote host knows.
+
+    :param known_refs: for every host, the objects its refs point to
+    :return: objects known to every host
+    :rtype: set
+    """
+    if not known_refs:
+        return set()
+
+    common = set(known_refs[0])
+    for host_refs in known_refs[1:]:
+        common.intersection_update(host_refs)
+
+    return common
+
+
+def determine_bundle_arguments(git, ref, local_refs, prerequisites):
+    """
+    Determine the arguments to `git bundle create` that will carry
+    every object the remote hosts are missing, or nothing if they
+    are not missing any.
+
+    :param git: Git client for the local repository
+    :param ref: full name of the ref being synced
+    :param local_refs: map of ref name to object and object type
+    :param prerequisites: objects every remote host has
+    :return: arguments for `git bundle create`
+    :rtype: list
+    """
+    # the ref may no longer point to the object we are bundling
+    # for it, as when changes were committed only to be bundled
+    # and reset since, so we bundle that object explicitly; a
+    # bundle needs the name of a ref, so we give both
+    revisions = [ref, local_refs[ref][0], '--tags']
+    exclusions = ['^{}'.format(sha) for sha in sorted(prerequisites)]
+    if int(git.run('rev-list', '--count', *(revisions + exclusions))) > 0:
+        return revisions + exclusions
+
+    # no commits are missing, but annotated tags that point
+    # to commits the hosts already have may still be new; a
+    # bundle must carry at least one commit, so we send the
+    # tagged commits along with the tags, but nothing older
+    new_tags = [name for name in local_refs if local_refs[name][1] == 'tag' and local_refs[name][0] not in prerequisites]
+    if new_tags:
+        tagged_commits = [git.run('rev-parse', '{}^{{commit}}'.format(name)).strip() for name in new_tags]
+        return sorted(new_tags) + ['^{}^@'.format(commit) for commit in tagged_commits]
+
+    return []
+
+
+class Git(object):
+    """
+    A minimal client for a local Git repository.
+    """
+
+    def __init__(self, module, git_path, repo):
+        self.module = module
+        self.git_path = git_path
+        self.repo = repo
+
+    def run(self, *args, **kwargs):
+        """
+        Run a Git command in the repository, failing the
+        module if the command fails.
+
+        :param args: arguments to Git
+        :param kwargs: keyword arguments to `run_command`
+        :return: stdout of the command
+        """
+        rc, stdout, stderr = self.module.run_command([self.git_path] + list(args), cwd=self.repo, **kwargs)
+        if rc != 0:
+            self.module.fail_json(msg='Running `git {}` failed: {}'.format(' '.join(args[:3]), stderr), rc=rc)
+
+        return stdout
+
+    def refs(self, ref):
+        """
+        Determine the objects the ref and all tags point to.
+
+        :param ref: full name of the ref being synced
+        :return: map of ref name to object and object type
+        :rtype: dict
+        """
+        refs = {}
+        for line in self.run('for-each-ref', '--format=%(refname) %(objectname) %(objecttype)', ref, 'refs/tags').splitlines():
+            name, sha, object_type = line.split(' ')
+            refs[name] = (sha, object_type)
+
+        return refs
+
+    def recorded_refs(self, path):
+        """
+        Read the refs written by an earlier run, determining
+        the types of the objects they point to.
+
+        :param path: list of refs, one `SHA REF` pair per line
+        :return: map of ref name to object and object type
+        :rtype: dict
+        """
+        recorded = {}
+        with open(path) as refs_file:
+            for line in refs_file.read().splitlines():
+                sha, name = line.split(' ')
+                recorded[name] = sha
+
+        names = sorted(recorded)
+        output = self.run('cat-file', '--batch-check', data='\n'.join(recorded[name] for name in names))
+        return dict((name, (recorded[name], line.split(' ')[1])) for name, line in zip(names, output.splitlines()))
+
+    def existing_objects(self, objects):
+        """
+        Filter the objects down to those that exist in the
+        repository, as the bundle may only be built against
+        objects we have.
+
+        :param objects: objects to filter
+        :return: objects that exist locally
+        :rtype: set
+        """
+        if not objects:
+            return set()
+
+        ordered_objects = sorted(objects)
+        output = self.run('cat-file', '--batch-check', data='\n'.join(ordered_objects))
+        return set(sha for sha, line in zip(ordered_objects, output.splitlines()) if not line.endswith(' missing'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,467 @@
+# coding=utf-8
+"""
+parallel_make is an Ansible module that runs many make targets
+at once, respecting the order that dependencies between them
+require and writing the output of every target to its own file.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from os.path import join
+from re import compile as compile_regex
+from subprocess import STDOUT, Popen
+from threading import Condition, Thread
+from timeit import default_timer as timer
+
+from ansible.module_utils.basic import AnsibleModule
+
+DOCUMENTATION = '''
+---
+module: parallel_make
+short_description: Run Make Targets Concurrently
+author: Steve Kuznetsov
+options:
+  targets:
+    description:
+      - The make targets to run.
+    required: true
+  params:
+    description:
+      - Parameters to pass to every make invocation.
+    required: false
+    default: {}
+  chdir:
+    description:
+      - The directory containing the Makefile.
+    required: true
+  dependencies:
+    description:
+      - For every target, the other targets that must
+        succeed before it may start. If no dependencies
+        are given, they are determined from the Makefile,
+        and targets that share prerequisites with recipes
+        are never run at the same time.
+    required: false
+    default: {}
+  parallelism:
+    description:
+      - The maximum number of targets to run at once.
+    required: false
+    default: 2
+  log_dir:
+    description:
+      - The directory to write the output of each target to.
+    required: true
+'''
+
+EXAMPLES = '''
+# Run the Origin unit tests, verification and image build at once
+- parallel_make:
+    targets: [ 'test-unit', 'verify', 'build-images' ]
+    chdir: '/data/src/github.com/openshift/origin'
+    parallelism: 3
+    log_dir: '/tmp/make'
+
+# Build images only after the build has succeeded
+- parallel_make:
+    targets: [ 'build', 'build-images', 'verify' ]
+    dependencies:
+      build-images: [ 'build' ]
+    chdir: '/data/src/github.com/openshift/origin'
+    parallelism: 2
+    log_dir: '/tmp/make'
+'''
+
+# lines in the make database that declare the prerequisites
+# of a target, excluding variable assignments using `:=`
+_RULE_PATTERN = compile_regex(r'^([^#\s][^:=]*):(?![:=])(.*)$')
+
+_SUCCEEDED = 'succeeded'
+_FAILED = 'failed'
+_SKIPPED = 'skipped'
+
+
+def main():
+    """
+    Run the make targets, at most `parallelism` at once, and
+    report the outcome of each.
+    """
+    module = AnsibleModule(
+        supports_check_mode=False,
+        argument_spec=dict(
+            targets=dict(
+                required=True,
+                default=None,
+                type='list',
+            ),
+            params=dict(
+                required=False,
+                default={},
+                type='dict',
+            ),
+            chdir=dict(
+                required=True,
+                default=None,
+                type='path',
+            ),
+            dependencies=dict(
+                required=False,
+                default={},
+                type='dict',
+            ),
+            parallelism=dict(
+                required=False,
+                default=2,
+                type='int',
+            ),
+            log_dir=dict(
+                required=True,
+                default=None,
+                type='path',
+            ),
+        ),
+    )
+
+    make_path = module.get_bin_path('make', required=True)
+    targets = unique_targets(module.params['targets'])
+    params = ['{}={}'.format(key, value) for key, value in sorted(module.params['params'].items())]
+    chdir = module.params['chdir']
+
+    dependencies = module.params['dependencies']
+    conflicts = {}
+    if not dependencies:
+        prerequisites, with_recipes = read_make_database(module, make_path, params, chdir)
+        dependencies = detect_dependencies(prerequisites, targets)
+        conflicts = detect_conflicts(prerequisites, with_recipes, targets)
+
+    for index, target in enumerate(targets):
+        for other in targets[index + 1:]:
+            if other in conflicts.get(target, {}):
+                module.warn(
+                    'Targets {} and {} share prerequisites and will not run at the same time: {}.'.
+                    format(target, other, ', '.join(conflicts[target][other]))
+                )
+
+    unknown_targets = [target for target in dependencies if target not in targets]
+    for target in dependencies:
+        unknown_targets.extend(dependency for dependency in dependencies[target] if dependency not in targets)
+    if unknown_targets:
+        module.fail_json(
+            msg='Dependencies may only be declared between the targets being run: {}.'.format(', '.join(unknown_targets))
+        )
+
+    cycle = find_cycle(targets, dependencies)
+    if cycle:
+        module.fail_json(msg='The dependencies between targets form a cycle: {}.'.format(' -> '.join(cycle)))
+
+    scheduler = TargetScheduler(targets, dependencies, module.params['parallelism'], conflicts)
+    scheduler.run(lambda target: run_target(make_path, params, chdir, target, log_file(module.params['log_dir'], target)))
+
+    results = []
+    for target in targets:
+        results.append(
+            dict(
+                target=target,
+                status=scheduler.statuses[target],
+                elapsed_time=scheduler.elapsed_times.get(target, 0),
+                log=log_file(module.params['log_dir'], target),
+            )
+        )
+
+    failures = [result['target'] for result in results if result['status'] != _SUCCEEDED]
+    summary = [
+        '{} | {} - [{:.3f}s]'.format(result['status'].upper(), result['target'], result['elapsed_time']) for result in results
+    ]
+    module.exit_json(
+        changed=True,
+        failed=bool(failures),
+        failures=failures,
+        msg='Make targets did not succeed: {}.'.format(', '.join(failures)) if failures else 'All make targets succeeded.',
+        summary='\n'.join(summary),
+        dependencies=dependencies,
+        conflicts=conflicts,
+        results=results,
+    )
+
+
+def unique_targets(targets):
+    """
+    Drop repeated targets, as every target is only run once.
+
+    :param targets: make targets
+    :return: the targets in order, each only once
+    """
+    unique = []
+    for target in targets:
+        if target not in unique:
+            unique.append(target)
+
+    return unique
+
+
+def log_file(log_dir, target):
+    """
+    Determine the file that the output of a target is written to.
+
+    :param log_dir: directory holding the log files
+    :param target: make target
+    :return: path to the log file
+    """
+    return join(log_dir, '{}.log'.format(target.replace('/', '_')))
+
+
+def run_target(make_path, params, chdir, target, log_path):
+    """
+    Run one make target with all output sent to the log file.
+
+    :param make_path: path to the make binary
+    :param params: parameters to pass to make
+    :param chdir: directory containing the Makefile
+    :param target: make target
+    :param log_path: file to write output to
+    :return: whether or not the target succeeded
+    """
+    with open(log_path, 'w') as log:
+        process = Popen([make_path, target] + params, cwd=chdir, stdout=log, stderr=STDOUT)
+        return process.wait() == 0
+
+
+def read_make_database(module, make_path, params, chdir):
+    """
+    Read the rules in the Makefile from the database make prints.
+
+    :param module: AnsibleModule to run commands with
+    :param make_path: path to the make binary
+    :param params: parameters to pass to make
+    :param chdir: directory containing the Makefile
+    :return: for every rule, its direct prerequisites, and the rules that have a recipe
+    """
+    # asking make to print its database without running
+    # anything exits non-zero when targets are out of date,
+    # so we cannot rely on the return code here
+    _, stdout, _ = module.run_command([make_path, '--print-data-base', '--question', '--no-builtin-rules'] + params, cwd=chdir)
+
+    prerequisites = {}
+    with_recipes = set()
+    rule_targets = []
+    for line in stdout.splitlines():
+        # the recipe of a rule is printed after the rule,
+        # with every line of the recipe indented by a tab
+        if line.startswith('\t'):
+            with_recipes.update(rule_targets)
+            continue
+
+        match = _RULE_PATTERN.match(line)
+        if not match:
+            continue
+
+        rule_targets = match.group(1).split()
+        for rule_target in rule_targets:
+            prerequisites.setdefault(rule_target, set()).update(match.group(2).replace('|', ' ').split())
+
+    return prerequisites, with_recipes
+
+
+def detect_dependencies(prerequisites, targets):
+    """
+    Determine which of the targets are prerequisites of others
+    in the Makefile, directly or through other targets, so that
+    they are not run concurrently with the targets that need them.
+
+    :param prerequisites: for every rule, its direct prerequisites
+    :param targets: make targets being run
+    :return: for every target, the targets that must run before it
+    """
+    dependencies = {}
+    for target in targets:
+        reachable = reachable_prerequisites(prerequisites, target)
+        target_dependencies = [other for other in targets if other != target and other in reachable]
+        if target_dependencies:
+            dependencies[target] = target_dependencies
+
+    return dependencies
+
+
+def detect_conflicts(prerequisites, with_recipes, targets):
+    """
+    Determine which of the targets share prerequisites that do
+    any work, as two make processes running the same recipe at
+    once would race with each other. Prerequisites without a
+    recipe, like phony targets that only group others, do not
+    do anything themselves and are not shared in this sense.
+
+    :param prerequisites: for every rule, its direct prerequisites
+    :param with_recipes: rules that have a recipe
+    :param targets: make targets being run
+    :return: for every target, the targets it must not run at the same time as, and the prerequisites they share
+    """
+    reachable = dict((target, reachable_prerequisites(prerequisites, target)) for target in targets)
+
+    conflicts = {}
+    for target in targets:
+        for other in targets:
+            # targets that depend on one another never run at once
+            if other == target or other in reachable[target] or target in reachable[other]:
+                continue
+
+            shared = reachable[target] & reachable[other] & with_recipes
+            if shared:
+                conflicts.setdefault(target, {})[other] = sorted(shared)
+
+    return conflicts
+
+
+def reachable_prerequisites(prerequisites, target):
+    """
+    Determine every prerequisite a target has, transitively.
+
+    :param prerequisites: for every rule, its direct prerequisites
+    :param target: make target
+    :return: the set of transitive prerequisites
+    """
+    reachable = set()
+    pending = list(prerequisites.get(target, []))
+    while pending:
+        prerequisite = pending.pop()
+        if prerequisite in reachable:
+            continue
+
+        reachable.add(prerequisite)
+        pending.extend(prerequisites.get(prerequisite, []))
+
+    return reachable
+
+
+def find_cycle(targets, dependencies):
+    """
+    Find a cycle in the dependencies between targets, if any.
+
+    :param targets: make targets being run
+    :param dependencies: for every target, the targets that must run before it
+    :return: the targets forming a cycle, or an empty list
+    """
+    visiting, visited = [], set()
+
+    def visit(target):
+        if target in visiting:
+            return visiting[visiting.index(target):] + [target]
+        if target in visited:
+            return []
+
+        visiting.append(target)
+        for dependency in dependencies.get(target, []):
+            cycle = visit(dependency)
+            if cycle:
+                return cycle
+        visiting.pop()
+        visited.add(target)
+        return []
+
+    for target in targets:
+        cycle = visit(target)
+        if cycle:
+            return cycle
+
+    return []
+
+
+class TargetScheduler(object):
+    """
+    Runs targets as soon as all of the targets they depend
+    on have succeeded, with a bounded number running at once.
+    Targets whose dependencies fail are skipped. Targets that
+    conflict never run at the same time, in either order.
+    """
+
+    def __init__(self, targets, dependencies, parallelism, conflicts=None):
+        # outcomes are recorded by target, so a repeated
+        # target would never be seen to finish
+        self.targets = unique_targets(targets)
+        self.dependencies = dependencies
+        self.conflicts = conflicts or {}
+        self.parallelism = max(parallelism, 1)
+
+        # outcome of every target that has finished
+        self.statuses = {}
+        # wall-clock time taken by every target that ran
+        self.elapsed_times = {}
+
+        self._running = set()
+        self._condition = Condition()
+
+    def run(self, func):
+        """
+        Run every target, blocking until all have finished.
+
+        :param func: function running a target, returning success
+        """
+        with self._condition:
+            while len(self.statuses) < len(self.targets):
+                self._skip_blocked_targets()
+                for target in self._ready_targets():
+                    if len(self._running) >= self.parallelism:
+                        break
+                    if any(other in self._running for other in self.conflicts.get(target, [])):
+                        continue
+
+                    self._running.add(target)
+                    worker = Thread(target=self._run_target, args=(func, target))
+                    worker.daemon = True
+                    worker.start()
+
+                if len(self.statuses) < len(self.targets):
+                    self._condition.wait()
+
+    def _run_target(self, func, target):
+        """
+        Run a target and record its outcome.
+
+        :param func: function running a target, returning success
+        :param target: make target
+        """
+        start_time = timer()
+        try:
+            succeeded = func(target)
+        except Exception:
+            succeeded = False
+
+        with self._condition:
+            self.elapsed_times[target] = timer() - start_time
+            self.statuses[target] = _SUCCEEDED if succeeded else _FAILED
+            self._running.discard(target)
+            self._condition.notify()
+
+    def _ready_targets(self):
+        """
+        Determine the targets that may start now.
+
+        :return: targets with all dependencies succeeded
+        """
+        ready = []
+        for target in self.targets:
+            if target in self.statuses or target in self._running:
+                continue
+
+            if all(self.statuses.get(dependency) == _SUCCEEDED for dependency in self.dependencies.get(target, [])):
+                ready.append(target)
+
+        return ready
+
+    def _skip_blocked_targets(self):
+        """
+        Skip targets that depend on targets that did not succeed,
+        until no more targets can be skipped.
+        """
+        skipped = True
+        while skipped:
+            skipped = False
+            for target in self.targets:
+                if target in self.statuses:
+                    continue
+
+                if any(self.statuses.get(dependency) in [_FAILED, _SKIPPED] for dependency in self.dependencies.get(target, [])):
+                    self.statuses[target] = _SKIPPED
+                    skipped = True
+
+
+if __name__ == '__main__':
+    main()
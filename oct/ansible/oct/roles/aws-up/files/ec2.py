@@ -123,6 +123,9 @@ Security groups are comma-separated in 'ec2_security_group_ids' and
 import sys
 import os
 import argparse
+import errno
+import fcntl
+import hashlib
 import re
 from time import time
 import boto
@@ -183,9 +186,15 @@ class Ec2Inventory(object):
 
         # Cache
         if self.args.refresh_cache:
-            self.do_api_calls_update_cache()
+            self.refresh_cache()
         elif not self.is_cache_valid():
-            self.do_api_calls_update_cache()
+            if self.is_cache_usable():
+                # Serve the expired cache and refresh it in the background,
+                # so a sweep of the API does not hold up every process that
+                # loads the inventory
+                self.refresh_cache_in_background()
+            else:
+                self.refresh_cache(only_if_invalid=True)
 
         # Data to print
         if self.args.host:
@@ -201,17 +210,66 @@ class Ec2Inventory(object):
         print(data_to_print)
 
 
+    def cache_age(self):
+        ''' Determines how long ago the cache files were written, or None if
+        there are no cache files '''
+
+        if os.path.isfile(self.cache_path_cache) and os.path.isfile(self.cache_path_index):
+            return time() - os.path.getmtime(self.cache_path_cache)
+
+        return None
+
     def is_cache_valid(self):
         ''' Determines if the cache files have expired, or if it is still valid '''
 
-        if os.path.isfile(self.cache_path_cache):
-            mod_time = os.path.getmtime(self.cache_path_cache)
-            current_time = time()
-            if (mod_time + self.cache_max_age) > current_time:
-                if os.path.isfile(self.cache_path_index):
-                    return True
+        age = self.cache_age()
+        return age is not None and age < self.cache_max_age
 
-        return False
+    def is_cache_usable(self):
+        ''' Determines if expired cache files are recent enough to be served
+        while they are refreshed '''
+
+        age = self.cache_age()
+        return age is not None and age < self.cache_stale_max_age
+
+    def refresh_cache(self, only_if_invalid=False):
+        ''' Do API calls and update the cache files while holding the cache
+        lock, so only one process sweeps the API for the cache at a time '''
+
+        with open(self.cache_path_lock, 'w') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            # Another process may have refreshed the cache while we waited
+            if only_if_invalid and self.is_cache_valid():
+                return
+
+            self.do_api_calls_update_cache()
+
+    def refresh_cache_in_background(self):
+        ''' Refresh the cache files in a detached process, unless another
+        process is already refreshing them '''
+
+        lock_file = open(self.cache_path_lock, 'w')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as e:
+            lock_file.close()
+            if e.errno not in [errno.EAGAIN, errno.EACCES]:
+                raise
+            return
+
+        if os.fork() == 0:
+            # The child holds the lock we took until it exits. It must let go
+            # of the output Ansible reads, or Ansible would wait for it to exit
+            try:
+                os.setsid()
+                devnull = os.open(os.devnull, os.O_RDWR)
+                for fd in [0, 1, 2]:
+                    os.dup2(devnull, fd)
+                self.do_api_calls_update_cache()
+            finally:
+                os._exit(0)
+
+        lock_file.close()
 
 
     def read_settings(self):
@@ -380,10 +438,17 @@ class Ec2Inventory(object):
                                self.credentials.get('aws_access_key_id', None))
         if aws_profile():
             cache_name = '%s-%s' % (cache_name, aws_profile())
-        self.cache_path_cache = cache_dir + "/%s.cache" % cache_name
-        self.cache_path_index = cache_dir + "/%s.index" % cache_name
+        self.cache_dir = cache_dir
+        self.cache_name = cache_name
         self.cache_max_age = config.getint('ec2', 'cache_max_age')
 
+        # Expired cache files younger than this are served while they are
+        # refreshed in the background; by default they never are
+        if config.has_option('ec2', 'cache_stale_max_age'):
+            self.cache_stale_max_age = config.getint('ec2', 'cache_stale_max_age')
+        else:
+            self.cache_stale_max_age = self.cache_max_age
+
         if config.has_option('ec2', 'expand_csv_tags'):
             self.expand_csv_tags = config.getboolean('ec2', 'expand_csv_tags')
         else:
@@ -462,6 +527,16 @@ class Ec2Inventory(object):
                     continue
                 self.ec2_instance_filters[filter_key].append(filter_value)
 
+        # The API calls only return the instances in the regions we look at
+        # that match the filters, so there is a cache for every set of them.
+        # A refresh then only sweeps for the instances we are after and other
+        # configurations sharing the cache directory keep their own caches
+        cache_key = json.dumps([sorted(self.regions), sorted(self.ec2_instance_filters.items())])
+        cache_name = '%s-%s' % (self.cache_name, hashlib.sha1(cache_key.encode('utf-8')).hexdigest()[:12])
+        self.cache_path_cache = self.cache_dir + "/%s.cache" % cache_name
+        self.cache_path_index = self.cache_dir + "/%s.index" % cache_name
+        self.cache_path_lock = self.cache_dir + "/%s.lock" % cache_name
+
     def parse_cli_args(self):
         ''' Command line argument processing '''
 
@@ -493,8 +568,10 @@ class Ec2Inventory(object):
             if self.include_rds_clusters:
                 self.include_rds_clusters_by_region(region)
 
-        self.write_to_cache(self.inventory, self.cache_path_cache)
+        # The age of the cache is that of the inventory, so the index
+        # must be written first
         self.write_to_cache(self.index, self.cache_path_index)
+        self.write_to_cache(self.inventory, self.cache_path_cache)
 
     def connect(self, region):
         ''' create connection to api server'''
@@ -1481,9 +1558,13 @@ class Ec2Inventory(object):
         ''' Writes data in JSON format to a file '''
 
         json_data = self.json_format_dict(data, True)
-        cache = open(filename, 'w')
+        # Other processes read the cache while we write it, so we move
+        # complete files into place
+        temporary_filename = '%s.%d.tmp' % (filename, os.getpid())
+        cache = open(temporary_filename, 'w')
         cache.write(json_data)
         cache.close()
+        os.rename(temporary_filename, filename)
 
     def uncammelize(self, key):
         temp = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', key)
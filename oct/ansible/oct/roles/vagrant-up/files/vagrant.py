@@ -25,19 +25,31 @@ In each subdirectory, we expect to find:
  - optionally a `variables.yml` file specifying
    which Ansible host variables should be set for
    this host
+
+Asking Vagrant about a VM is slow, so we cache what
+we learn about every directory and only ask again
+when the group or variable files, or the machine
+state Vagrant keeps in `.vagrant', have changed.
 """
 from __future__ import absolute_import, division, print_function
 
-from json import dumps
+from json import dump, dumps, load as load_json
+from multiprocessing.pool import ThreadPool
 from optparse import OptionParser
 from subprocess import check_output
 from sys import exit
+from uuid import uuid4
 
-from os import getenv, listdir
-from os.path import abspath, exists, expanduser, isdir, join
+from os import getenv, listdir, rename, stat, walk
+from os.path import abspath, exists, expanduser, isdir, join, relpath
 from re import search
 from yaml import load
 
+# file under the base path holding the cached VM data
+_CACHE_FILE = '.inventory_cache.json'
+# most `vagrant' processes we run at once on a cold cache
+_MAX_PROBES = 8
+
 parser = OptionParser(usage='%prog --list | --host <machine>')
 parser.add_option(
     '--list',
@@ -52,6 +64,13 @@ parser.add_option(
     dest='host',
     help='Emit host metadata for a specific host as a JSON mapping of key-value pairs.',
 )
+parser.add_option(
+    '--refresh-cache',
+    default=False,
+    dest='refresh_cache',
+    action='store_true',
+    help='Ask Vagrant about every VM, ignoring any cached data.',
+)
 (options, args) = parser.parse_args()
 
 
@@ -86,7 +105,7 @@ def determine_vagrant_hostname(vm_directory):
     :param vm_directory: directory to issue `vagrant' commands in
     :return: the name of the running VM, or None
     """
-    for line in check_output(['vagrant', 'status'], cwd=vm_directory).splitlines():
+    for line in check_output(['vagrant', 'status'], cwd=vm_directory, universal_newlines=True).splitlines():
         matches = search(r'([^\s]+)[\s]+running \(.+', line)
         if matches:
             return matches.group(1)
@@ -180,8 +199,96 @@ def list_vagrant_directories():
     return vagrant_directories
 
 
-if options.list:
-    full_inventory = {
+def directory_fingerprint(vm_directory):
+    """
+    Identify the state of a Vagrant VM directory without
+    asking Vagrant, by the modification times of the files
+    we read and of the machine state that Vagrant records.
+
+    :param vm_directory: Vagrant VM directory
+    :return: list of file and modification time pairs
+    """
+    files = [join(vm_directory, 'groups.yml'), join(vm_directory, 'variables.yml')]
+    for root, _, file_names in walk(join(vm_directory, '.vagrant', 'machines')):
+        files.extend(join(root, file_name) for file_name in file_names)
+
+    fingerprint = []
+    for path in sorted(files):
+        try:
+            fingerprint.append([relpath(path, vm_directory), stat(path).st_mtime])
+        except OSError:
+            continue
+
+    return fingerprint
+
+
+def load_cache(cache_path):
+    """
+    Load the cached VM data, if any.
+
+    :param cache_path: path to the cache file
+    :return: map of directory to fingerprint and VM data
+    """
+    try:
+        with open(cache_path) as cache_file:
+            return load_json(cache_file)
+    except (IOError, ValueError):
+        return {}
+
+
+def write_cache(cache_path, cache):
+    """
+    Atomically write the cached VM data, so a concurrent
+    invocation never reads a partial cache.
+
+    :param cache_path: path to the cache file
+    :param cache: map of directory to fingerprint and VM data
+    """
+    temporary_path = '{}.{}.tmp'.format(cache_path, uuid4().hex)
+    try:
+        with open(temporary_path, 'w') as cache_file:
+            dump(cache, cache_file)
+        rename(temporary_path, cache_path)
+    except (IOError, OSError):
+        # the cache is only an optimization
+        pass
+
+
+def build_inventory(refresh=False):
+    """
+    Build the full inventory, asking Vagrant only about the
+    VM directories that have changed since we last asked,
+    or about all of them if we are refreshing the cache.
+    The directories we need to ask about are probed in
+    parallel, as every `vagrant' call is slow to start.
+
+    :param refresh: whether to ignore the cached VM data
+    :return: the inventory
+    """
+    cache_path = join(determine_base_path(), _CACHE_FILE)
+    cache = {} if refresh else load_cache(cache_path)
+
+    directories = list_vagrant_directories()
+    fingerprints = dict((directory, directory_fingerprint(directory)) for directory in directories)
+    stale = [directory for directory in directories if cache.get(directory, {}).get('fingerprint') != fingerprints[directory]]
+
+    if stale:
+        pool = ThreadPool(min(len(stale), _MAX_PROBES))
+        try:
+            for directory, info in zip(stale, pool.map(get_vagrant_info, stale)):
+                cache[directory] = {'fingerprint': fingerprints[directory], 'info': info}
+        finally:
+            pool.close()
+
+    # forget the VMs whose directories have been removed
+    removed = [directory for directory in cache if directory not in fingerprints]
+    for directory in removed:
+        del cache[directory]
+
+    if stale or removed:
+        write_cache(cache_path, cache)
+
+    inventory = {
         '_meta': {
             'hostvars': {},
         },
@@ -195,24 +302,21 @@ if options.list:
     }
 
     # load VM hosts
-    for directory in list_vagrant_directories():
-        current_hostname, host_groups, host_variables = get_vagrant_info(directory)
+    for directory in directories:
+        current_hostname, host_groups, host_variables = cache[directory]['info']
         if current_hostname:
-            add_host_to_inventory(full_inventory, current_hostname, host_groups, host_variables)
+            add_host_to_inventory(inventory, current_hostname, host_groups, host_variables)
 
-    print(dumps(full_inventory))
+    return inventory
+
+
+if options.list:
+    print(dumps(build_inventory(options.refresh_cache)))
 
 elif options.host:
-    # terribly inefficient implementation, only useful
-    # if someone manages to make this run with an old
-    # version of Ansible
-    for directory in list_vagrant_directories():
-        current_hostname, host_groups, host_variables = get_vagrant_info(directory)
-        if current_hostname == options.host:
-            print(dumps(host_variables))
-            exit(0)
-
-    print(dumps({}))
+    # we cache the variables for every host, so we
+    # can answer this from the full inventory
+    print(dumps(build_inventory(options.refresh_cache)['_meta']['hostvars'].get(options.host, {})))
 
 else:
     parser.print_help()
@@ -12,6 +12,12 @@ import ConfigParser
 import datetime
 # File path stuff
 import os
+# Result cache
+import hashlib
+import json
+# Parallel parsing
+import multiprocessing
+import time
 # Config file parsing
 import yaml
 # Certificate loading
@@ -54,6 +60,12 @@ options:
       - By default only certificates which have expired, or will expire within the C(warning_days) window will be reported.
     required: false
     default: false
+  cache_path:
+    description:
+      - File to cache parsed certificates in between runs, so only changed certificates are parsed again.
+      - Set to an empty string to parse every certificate on every run.
+    required: false
+    default: /var/cache/openshift_cert_expiry.json
 
 author: "Tim Bielawa (@tbielawa) <tbielawa@redhat.com>"
 '''
@@ -96,6 +108,12 @@ Source: Alex Martelli - http://stackoverflow.com/a/2819788/6490583
             return self.fp.readline()
 
 
+# Certificates are parsed in a pool of processes when there is more
+# than one CPU and at least this many of them to parse, as starting
+# the pool costs more than it saves for fewer
+PARALLEL_PARSE_THRESHOLD = 64
+
+
 ######################################################################
 def filter_paths(path_list):
     """`path_list` - A list of file paths to check. Only files which exist
@@ -117,6 +135,35 @@ Params:
 Returns:
 A 3-tuple of the form: (certificate_common_name, certificate_expiry_date, certificate_time_remaining)
 
+    """
+    cert_subject, cert_expiry = parse_cert(cert_string, base64decode)
+    cert_expiry_date = parse_cert_expiry(cert_expiry)
+    time_remaining = cert_expiry_date - now
+
+    return (cert_subject, cert_expiry_date, time_remaining)
+
+
+def parse_cert_expiry(cert_expiry):
+    """Parse the expiration date of a certificate, as given by
+`get_notAfter()`, into a datetime object"""
+    return datetime.datetime.strptime(
+        cert_expiry,
+        # example get_notAfter() => 20180922170439Z
+        '%Y%m%d%H%M%SZ')
+
+
+def parse_cert(cert_string, base64decode=False):
+    """Load a certificate and read its subject and expiration date
+
+Params:
+
+- `cert_string` (string) - a certificate loaded into a string object
+- `base64decode` (bool) - run .decode('base64') on the input?
+
+Returns:
+A 2-tuple of the form: (certificate_common_name, certificate_expiry)
+where the expiry is as given by `get_notAfter()`
+
     """
     if base64decode:
         _cert_string = cert_string.decode('base-64')
@@ -133,35 +180,17 @@ A 3-tuple of the form: (certificate_common_name, certificate_expiry_date, certif
         cert_subjects.append('{}:{}'.format(name, value))
 
     # To read SANs from a cert we must read the subjectAltName
-    # extension from the X509 Object. What makes this more difficult
-    # is that pyOpenSSL does not give extensions as a list, nor does
-    # it provide a count of all loaded extensions.
-    #
-    # Rather, extensions are REQUESTED by index. We must iterate over
-    # all extensions until we find the one called 'subjectAltName'. If
-    # we don't find that extension we'll eventually request an
-    # extension at an index where no extension exists (IndexError is
-    # raised). When that happens we know that the cert has no SANs so
-    # we break out of the loop.
-    i = 0
-    checked_all_extensions = False
-    while not checked_all_extensions:
-        try:
-            # Read the extension at index 'i'
-            ext = cert_loaded.get_extension(i)
-        except IndexError:
-            # We tried to read an extension but it isn't there, that
-            # means we ran out of extensions to check. Abort
-            san = None
-            checked_all_extensions = True
-        else:
-            # We were able to load the extension at index 'i'
-            if ext.get_short_name() == 'subjectAltName':
-                san = ext
-                checked_all_extensions = True
-            else:
-                # Try reading the next extension
-                i += 1
+    # extension from the X509 Object. pyOpenSSL does not give
+    # extensions as a list; rather, extensions are REQUESTED by
+    # index, so we look at each of them in turn until we find the
+    # one called 'subjectAltName'. If there is none, the cert has
+    # no SANs.
+    san = None
+    for i in range(cert_loaded.get_extension_count()):
+        ext = cert_loaded.get_extension(i)
+        if ext.get_short_name() == 'subjectAltName':
+            san = ext
+            break
 
     if san is not None:
         # The X509Extension object for subjectAltName prints as a
@@ -174,15 +203,188 @@ A 3-tuple of the form: (certificate_common_name, certificate_expiry_date, certif
     ######################################################################
 
     # Grab the expiration date
-    cert_expiry = cert_loaded.get_notAfter()
-    cert_expiry_date = datetime.datetime.strptime(
-        cert_expiry,
-        # example get_notAfter() => 20180922170439Z
-        '%Y%m%d%H%M%SZ')
+    return (cert_subject, cert_loaded.get_notAfter())
 
-    time_remaining = cert_expiry_date - now
 
-    return (cert_subject, cert_expiry_date, time_remaining)
+def read_cert_source(path, kind='pem'):
+    """Read a file holding a certificate
+
+Params:
+
+- `path` (string) - path to the file
+- `kind` (string) - how the certificate is held in the file: 'pem' for
+  a PEM certificate, or 'kubeconfig' for the client certificate of
+  the first user in a kubeconfig
+
+Return:
+- `source` (dict) - the certificate source, to be parsed with `parse_cert_sources`
+    """
+    with open(path, 'r') as fp:
+        stat = os.fstat(fp.fileno())
+        return {
+            'kind': kind,
+            'path': fp.name,
+            'data': fp.read(),
+            'inode': stat.st_ino,
+            'mtime': stat.st_mtime,
+        }
+
+
+def parse_cert_source(source):
+    """Parse the certificate held in a certificate source
+
+Params:
+
+- `source` (tuple) - the kind and data of the certificate source
+
+Return:
+A 2-tuple of the form: ((certificate_common_name, certificate_expiry), seconds_spent_parsing)
+    """
+    start = time.time()
+    kind, data = source
+    if kind == 'kubeconfig':
+        # Per conversation, "the kubeconfigs you care about:
+        # admin, router, registry should all be single
+        # value". Following that advice we only grab the data for
+        # the user at index 0 in the 'users' list. There should
+        # not be more than one user.
+        data = yaml.load(data)['users'][0]['user']['client-certificate-data']
+    parsed = parse_cert(data, base64decode=kind in ['kubeconfig', 'base64'])
+    return parsed, time.time() - start
+
+
+class CertificateCache(object):
+    """Certificates parsed in earlier runs. Every certificate is cached
+under the path, inode and modification time of the file it was read
+from along with the SHA-256 of what was read, so a certificate is
+parsed again whenever its file is replaced, changed or moved.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.used = {}
+        if not path:
+            return
+        try:
+            with open(path, 'r') as fp:
+                self.entries = json.load(fp)
+        except (IOError, ValueError):
+            pass
+
+    @staticmethod
+    def key(source):
+        """Key a certificate source is cached under"""
+        return '{}:{}:{}:{}'.format(source['path'], source.get('inode', ''), source.get('mtime', ''),
+                                    hashlib.sha256(source['data']).hexdigest())
+
+    def get(self, source):
+        """Get the cached certificate subject and expiry for a source, or None"""
+        key = self.key(source)
+        if key in self.entries:
+            self.used[key] = self.entries[key]
+        return self.used.get(key)
+
+    def put(self, source, parsed):
+        """Cache the certificate subject and expiry for a source"""
+        self.used[self.key(source)] = list(parsed)
+
+    def save(self):
+        """Save the certificates used in this run, dropping the rest"""
+        if not self.path or self.used == self.entries:
+            return
+        temporary_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            with open(temporary_path, 'w') as fp:
+                json.dump(self.used, fp)
+            os.rename(temporary_path, self.path)
+        except (IOError, OSError):
+            # We only lose time by not caching
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+
+def parse_cert_sources(sources, cache):
+    """Parse the certificates in certificate sources, unless they are
+cached. Certificates are parsed in parallel when there are enough of
+them.
+
+Params:
+
+- `sources` (list of dicts) - certificate sources to parse, which
+  are updated with the certificate `subject` and `expiry`, whether
+  they were `cached` and how many seconds were spent parsing them
+- `cache` (CertificateCache) - certificates parsed in earlier runs
+    """
+    to_parse = []
+    for source in sources:
+        parsed = cache.get(source)
+        source['cached'] = parsed is not None
+        source['parse_seconds'] = 0.0
+        if parsed is None:
+            to_parse.append(source)
+        else:
+            source['subject'], source['expiry'] = parsed
+
+    jobs = [(source['kind'], source['data']) for source in to_parse]
+    if len(jobs) >= PARALLEL_PARSE_THRESHOLD and multiprocessing.cpu_count() > 1:
+        pool = multiprocessing.Pool()
+        try:
+            results = pool.map(parse_cert_source, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [parse_cert_source(job) for job in jobs]
+
+    for source, (parsed, seconds) in zip(to_parse, results):
+        source['subject'], source['expiry'] = parsed
+        source['parse_seconds'] = seconds
+        cache.put(source, parsed)
+
+
+def classify_cert_sources(sources, now, expire_window, cert_list):
+    """Classify parsed certificate sources into a list of certificates
+
+Params:
+
+- `sources` (list of dicts) - certificate sources parsed by `parse_cert_sources`
+- `now` (datetime) - a datetime object of the time to calculate the certificate 'time_remaining' against
+- `expire_window` (datetime.timedelta) - a timedelta for how long the warning window is
+- `cert_list` list - A list to shove the classified certs into
+    """
+    for source in sources:
+        cert_expiry_date = parse_cert_expiry(source['expiry'])
+        time_remaining = cert_expiry_date - now
+
+        expire_check_result = {
+            'cert_cn': source['subject'],
+            'path': source['path'],
+            'expiry': cert_expiry_date,
+            'days_remaining': time_remaining.days,
+            'health': None,
+        }
+
+        classify_cert(expire_check_result, now, time_remaining, expire_window, cert_list)
+
+
+def source_timing(sources, read_seconds):
+    """Summarize the time spent on the certificates from one source
+
+Params:
+
+- `sources` (list of dicts) - certificate sources parsed by `parse_cert_sources`
+- `read_seconds` (float) - seconds spent finding and reading the sources
+
+Return:
+- `timing` (dict) - counts of certificates and cached certificates and
+  the seconds spent reading and parsing them
+    """
+    return {
+        'certificates': len(sources),
+        'cached': len([s for s in sources if s['cached']]),
+        'read_seconds': round(read_seconds, 6),
+        'parse_seconds': round(sum(s['parse_seconds'] for s in sources), 6),
+    }
 
 
 def classify_cert(cert_meta, now, time_remaining, expire_window, cert_list):
@@ -279,7 +481,11 @@ an OpenShift Container Platform cluster
             show_all=dict(
                 required=False,
                 default=False,
-                type='bool')
+                type='bool'),
+            cache_path=dict(
+                required=False,
+                default="/var/cache/openshift_cert_expiry.json",
+                type='str')
         ),
         supports_check_mode=True,
     )
@@ -338,8 +544,6 @@ an OpenShift Container Platform cluster
     check_results['meta']['checked_at_time'] = str(now)
     check_results['meta']['warn_before_date'] = str(now + expire_window)
     check_results['meta']['show_all'] = str(module.params['show_all'])
-    # All the analyzed certs accumulate here
-    ocp_certs = []
 
     ######################################################################
     # Sure, why not? Let's enable check mode.
@@ -352,9 +556,17 @@ an OpenShift Container Platform cluster
             changed=False
         )
 
+    # Certificates are found and read source by source, then parsed
+    # all at once so those which are not cached can be parsed in
+    # parallel, then classified source by source again
+    cert_sources = {}
+    read_seconds = {}
+
     ######################################################################
     # Check for OpenShift Container Platform specific certs
     ######################################################################
+    start = time.time()
+    cert_sources['ocp_certs'] = []
     for os_cert in filter_paths(openshift_cert_check_paths):
         # Open up that config file and locate the cert and CA
         with open(os_cert, 'r') as fp:
@@ -369,22 +581,11 @@ an OpenShift Container Platform cluster
             cert_meta['clientCA'] = os.path.join(cfg_path, cfg['servingInfo']['clientCA'])
 
         ######################################################################
-        # Load the certificate and the CA, parse their expiration dates into
-        # datetime objects so we can manipulate them later
+        # Read the certificate and the CA, their expiration dates are parsed
+        # into datetime objects once every certificate has been read
         for _, v in cert_meta.iteritems():
-            with open(v, 'r') as fp:
-                cert = fp.read()
-                cert_subject, cert_expiry_date, time_remaining = load_and_handle_cert(cert, now)
-
-                expire_check_result = {
-                    'cert_cn': cert_subject,
-                    'path': fp.name,
-                    'expiry': cert_expiry_date,
-                    'days_remaining': time_remaining.days,
-                    'health': None,
-                }
-
-                classify_cert(expire_check_result, now, time_remaining, expire_window, ocp_certs)
+            cert_sources['ocp_certs'].append(read_cert_source(v))
+    read_seconds['ocp_certs'] = time.time() - start
 
     ######################################################################
     # /Check for OpenShift Container Platform specific certs
@@ -393,7 +594,8 @@ an OpenShift Container Platform cluster
     ######################################################################
     # Check service Kubeconfigs
     ######################################################################
-    kubeconfigs = []
+    start = time.time()
+    cert_sources['kubeconfigs'] = []
 
     # There may be additional kubeconfigs to check, but their naming
     # is less predictable than the ones we've already assembled.
@@ -414,52 +616,17 @@ an OpenShift Container Platform cluster
         cfg_path = os.path.dirname(fp.name)
         node_kubeconfig = os.path.join(cfg_path, node_masterKubeConfig)
 
-        with open(node_kubeconfig, 'r') as fp:
-            # Read in the nodes kubeconfig file and grab the good stuff
-            cfg = yaml.load(fp)
-
-        c = cfg['users'][0]['user']['client-certificate-data']
-        (cert_subject,
-         cert_expiry_date,
-         time_remaining) = load_and_handle_cert(c, now, base64decode=True)
-
-        expire_check_result = {
-            'cert_cn': cert_subject,
-            'path': fp.name,
-            'expiry': cert_expiry_date,
-            'days_remaining': time_remaining.days,
-            'health': None,
-        }
-
-        classify_cert(expire_check_result, now, time_remaining, expire_window, kubeconfigs)
+        # Read in the nodes kubeconfig file, the good stuff is
+        # grabbed from it when it is parsed
+        cert_sources['kubeconfigs'].append(read_cert_source(node_kubeconfig, kind='kubeconfig'))
     except IOError:
         # This is not a node
         pass
 
     for kube in filter_paths(kubeconfig_paths):
-        with open(kube, 'r') as fp:
-            # TODO: Maybe consider catching exceptions here?
-            cfg = yaml.load(fp)
-
-        # Per conversation, "the kubeconfigs you care about:
-        # admin, router, registry should all be single
-        # value". Following that advice we only grab the data for
-        # the user at index 0 in the 'users' list. There should
-        # not be more than one user.
-        c = cfg['users'][0]['user']['client-certificate-data']
-        (cert_subject,
-         cert_expiry_date,
-         time_remaining) = load_and_handle_cert(c, now, base64decode=True)
-
-        expire_check_result = {
-            'cert_cn': cert_subject,
-            'path': fp.name,
-            'expiry': cert_expiry_date,
-            'days_remaining': time_remaining.days,
-            'health': None,
-        }
-
-        classify_cert(expire_check_result, now, time_remaining, expire_window, kubeconfigs)
+        # TODO: Maybe consider catching exceptions here?
+        cert_sources['kubeconfigs'].append(read_cert_source(kube, kind='kubeconfig'))
+    read_seconds['kubeconfigs'] = time.time() - start
 
     ######################################################################
     # /Check service Kubeconfigs
@@ -468,10 +635,11 @@ an OpenShift Container Platform cluster
     ######################################################################
     # Check etcd certs
     ######################################################################
+    start = time.time()
     # Some values may be duplicated, make this a set for now so we
     # unique them all
     etcd_certs_to_check = set([])
-    etcd_certs = []
+    cert_sources['etcd'] = []
     etcd_cert_params.append('dne')
     try:
         with open('/etc/etcd/etcd.conf', 'r') as fp:
@@ -489,21 +657,8 @@ an OpenShift Container Platform cluster
         pass
 
     for etcd_cert in filter_paths(etcd_certs_to_check):
-        with open(etcd_cert, 'r') as fp:
-            c = fp.read()
-            (cert_subject,
-             cert_expiry_date,
-             time_remaining) = load_and_handle_cert(c, now)
-
-            expire_check_result = {
-                'cert_cn': cert_subject,
-                'path': fp.name,
-                'expiry': cert_expiry_date,
-                'days_remaining': time_remaining.days,
-                'health': None,
-            }
-
-            classify_cert(expire_check_result, now, time_remaining, expire_window, etcd_certs)
+        cert_sources['etcd'].append(read_cert_source(etcd_cert))
+    read_seconds['etcd'] = time.time() - start
 
     ######################################################################
     # /Check etcd certs
@@ -517,11 +672,11 @@ an OpenShift Container Platform cluster
     # subprocess out to the 'oc get' command. On non-masters this
     # command will fail, that is expected so we catch that exception.
     ######################################################################
-    router_certs = []
-    registry_certs = []
 
     ######################################################################
     # First the router certs
+    start = time.time()
+    cert_sources['router'] = []
     try:
         router_secrets_raw = subprocess.Popen('oc get secret router-certs -o yaml'.split(),
                                               stdout=subprocess.PIPE)
@@ -535,22 +690,13 @@ an OpenShift Container Platform cluster
         # The OC command doesn't exist here. Move along.
         pass
     else:
-        (cert_subject,
-         cert_expiry_date,
-         time_remaining) = load_and_handle_cert(router_c, now, base64decode=True)
-
-        expire_check_result = {
-            'cert_cn': cert_subject,
-            'path': router_path,
-            'expiry': cert_expiry_date,
-            'days_remaining': time_remaining.days,
-            'health': None,
-        }
-
-        classify_cert(expire_check_result, now, time_remaining, expire_window, router_certs)
+        cert_sources['router'].append({'kind': 'base64', 'path': router_path, 'data': router_c})
+    read_seconds['router'] = time.time() - start
 
     ######################################################################
     # Now for registry
+    start = time.time()
+    cert_sources['registry'] = []
     try:
         registry_secrets_raw = subprocess.Popen('oc get secret registry-certificates -o yaml'.split(),
                                                 stdout=subprocess.PIPE)
@@ -564,24 +710,34 @@ an OpenShift Container Platform cluster
         # The OC command doesn't exist here. Move along.
         pass
     else:
-        (cert_subject,
-         cert_expiry_date,
-         time_remaining) = load_and_handle_cert(registry_c, now, base64decode=True)
-
-        expire_check_result = {
-            'cert_cn': cert_subject,
-            'path': registry_path,
-            'expiry': cert_expiry_date,
-            'days_remaining': time_remaining.days,
-            'health': None,
-        }
-
-        classify_cert(expire_check_result, now, time_remaining, expire_window, registry_certs)
+        cert_sources['registry'].append({'kind': 'base64', 'path': registry_path, 'data': registry_c})
+    read_seconds['registry'] = time.time() - start
 
     ######################################################################
     # /Check router/registry certs
     ######################################################################
 
+    ######################################################################
+    # Parse every certificate which is not cached, then classify them
+    ######################################################################
+    cert_cache = CertificateCache(module.params['cache_path'])
+    parse_cert_sources([source for sources in cert_sources.values() for source in sources], cert_cache)
+    cert_cache.save()
+
+    # All the analyzed certs accumulate here
+    ocp_certs = []
+    kubeconfigs = []
+    etcd_certs = []
+    router_certs = []
+    registry_certs = []
+    for name, cert_list in [('ocp_certs', ocp_certs), ('kubeconfigs', kubeconfigs), ('etcd', etcd_certs),
+                            ('router', router_certs), ('registry', registry_certs)]:
+        classify_cert_sources(cert_sources[name], now, expire_window, cert_list)
+
+    check_results['meta']['timings'] = dict(
+        (name, source_timing(sources, read_seconds[name])) for name, sources in cert_sources.iteritems()
+    )
+
     res = tabulate_summary(ocp_certs, kubeconfigs, etcd_certs, router_certs, registry_certs)
 
     msg = "Checked {count} total certificates. Expired/Warning/OK: {exp}/{warn}/{ok}. Warning window: {window} days".format(
@@ -0,0 +1,286 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# pylint: disable=line-too-long,invalid-name
+
+"""For details on this module see DOCUMENTATION (below)"""
+
+# Index ordering
+import bisect
+import heapq
+# Expiration parsing
+import datetime
+# Index storage
+import fcntl
+import json
+import os
+
+DOCUMENTATION = '''
+---
+module: openshift_cert_expiry_index
+short_description: Keep an index of certificate expirations across every checked host and cluster
+description:
+  - The M(openshift_cert_expiry_index) module keeps the results of M(openshift_cert_expiry) checks for a whole fleet in one compact JSON index, sorted by the date the certificates expire on.
+  - Hosts are added to the index one at a time, as they report. Adding a host replaces everything the index held for that host before, so the index never has to be rebuilt from the results of every host.
+  - The index answers which certificates expire within a number of days across every cluster by reading only the start of the sorted index.
+  - Only the certificates a host reported are indexed. Run M(openshift_cert_expiry) with C(show_all) to index every certificate, not only those which have expired or will expire within its C(warning_days) window.
+  - Changes to the index are made while holding a lock next to it and written atomically, so every host of a play may update the same index at once.
+version_added: "1.0"
+options:
+  path:
+    description:
+      - Path to the index on the host running the module.
+    required: true
+  cluster:
+    description:
+      - Cluster the host belongs to. Required to add or remove a host.
+      - When querying, only report certificates in this cluster.
+    required: false
+    default: null
+  host:
+    description:
+      - Host to add to or remove from the index.
+    required: false
+    default: null
+  check_results:
+    description:
+      - The C(check_results) returned by M(openshift_cert_expiry) for C(host).
+    required: false
+    default: null
+  state:
+    description:
+      - Whether C(host) should be in the index.
+    required: false
+    default: present
+    choices: [present, absent]
+  days:
+    description:
+      - Report the certificates which have expired or will expire within this many days from now.
+    required: false
+    default: null
+'''
+
+EXAMPLES = '''
+# Add the results of a check on this host to the index for the fleet
+- openshift_cert_expiry:
+  register: check_results
+- openshift_cert_expiry_index:
+    path: /var/lib/openshift/cert-expiry-index.json
+    cluster: "{{ openshift_cluster_id }}"
+    host: "{{ inventory_hostname }}"
+    check_results: "{{ check_results.check_results }}"
+  delegate_to: localhost
+
+# Stop reporting on a host which has been retired
+- openshift_cert_expiry_index: path=/var/lib/openshift/cert-expiry-index.json cluster=prod host=node1.example.com state=absent
+
+# Report the certificates across every cluster which expire within two weeks
+- openshift_cert_expiry_index: path=/var/lib/openshift/cert-expiry-index.json days=14
+'''
+
+# The kinds of certificates reported by openshift_cert_expiry
+CERT_SOURCES = ['ocp_certs', 'kubeconfigs', 'etcd', 'router', 'registry']
+
+# Entries in the index are lists of these fields, so the index sorts
+# by expiry date first. Expiry dates are kept as they are reported,
+# e.g. "2018-09-22 17:04:39", which sorts like the dates do.
+ENTRY_FIELDS = ['expiry', 'cluster', 'host', 'source', 'path', 'cert_cn']
+
+EXPIRY_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def new_index():
+    """Return an empty index
+
+The index is a dict of:
+
+- `hosts` (dict) - for each indexed host, keyed by `host_key`, the
+  cluster and host name, when it was checked and how many of its
+  certificates are indexed
+- `entries` (list of lists) - the indexed certificates, sorted, with
+  the fields in `ENTRY_FIELDS`
+    """
+    return {'hosts': {}, 'entries': []}
+
+
+def host_key(cluster, host):
+    """The key a host is kept under in the index"""
+    return '{}/{}'.format(cluster, host)
+
+
+def load_index(path):
+    """Load the index at `path`, or an empty index if there is none"""
+    try:
+        with open(path, 'r') as fp:
+            return json.load(fp)
+    except IOError:
+        return new_index()
+
+
+def save_index(path, index):
+    """Atomically replace the index at `path` with `index`"""
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'w') as fp:
+        # The index is for machines, so keep it compact
+        json.dump(index, fp, separators=(',', ':'))
+    os.rename(temporary_path, path)
+
+
+def host_entries(cluster, host, check_results):
+    """Return the sorted index entries for the certificates in the
+`check_results` of a host"""
+    entries = []
+    for source in CERT_SOURCES:
+        for cert in check_results.get(source, []):
+            entries.append([str(cert['expiry']), cluster, host, source, cert['path'], cert['cert_cn']])
+    return sorted(entries)
+
+
+def remove_host(index, cluster, host):
+    """Remove a host and its certificates from the index
+
+Return:
+- `changed` (bool) - whether the host was in the index
+    """
+    if index['hosts'].pop(host_key(cluster, host), None) is None:
+        return False
+    index['entries'] = [e for e in index['entries'] if e[1] != cluster or e[2] != host]
+    return True
+
+
+def update_host(index, cluster, host, check_results):
+    """Replace what the index holds for a host with the certificates
+in the `check_results` it reported. The new entries are merged into
+the sorted entries of the index, so it never needs sorting as a whole.
+
+Return:
+- `changed` (bool) - whether the index changed
+    """
+    entries = host_entries(cluster, host, check_results)
+    record = {
+        'cluster': cluster,
+        'host': host,
+        'checked_at_time': check_results.get('meta', {}).get('checked_at_time'),
+        'certificates': len(entries),
+    }
+
+    key = host_key(cluster, host)
+    if index['hosts'].get(key) == record:
+        return False
+
+    remove_host(index, cluster, host)
+    index['hosts'][key] = record
+    index['entries'] = list(heapq.merge(index['entries'], entries))
+    return True
+
+
+def expiring(index, now, days, cluster=None):
+    """Find the certificates which have expired or will expire within
+`days` days from `now`. The entries of the index are sorted by expiry
+date, so only the certificates returned are looked at.
+
+Params:
+
+- `index` (dict) - the index
+- `now` (datetime) - a datetime object of the time to calculate the certificate 'days_remaining' against
+- `days` (int) - how many days from now to look
+- `cluster` (string) - only return certificates in this cluster
+
+Return:
+- `certs` (list of dicts) - the certificates, soonest to expire first
+    """
+    cutoff = (now + datetime.timedelta(days=days)).strftime(EXPIRY_FORMAT)
+    # Sorts after every entry expiring at the cutoff, and before those
+    # expiring later
+    after_cutoff = [cutoff + '\x7f']
+    certs = []
+    for entry in index['entries'][:bisect.bisect_left(index['entries'], after_cutoff)]:
+        cert = dict(zip(ENTRY_FIELDS, entry))
+        if cluster is not None and cert['cluster'] != cluster:
+            continue
+        expiry_date = datetime.datetime.strptime(cert['expiry'], EXPIRY_FORMAT)
+        cert['days_remaining'] = (expiry_date - now).days
+        certs.append(cert)
+    return certs
+
+
+def main():
+    """This module keeps the results of certificate expiry checks of
+every host in a fleet in one index sorted by expiry date
+    """
+
+    module = AnsibleModule(
+        argument_spec=dict(
+            path=dict(
+                required=True,
+                type='str'),
+            cluster=dict(
+                required=False,
+                default=None,
+                type='str'),
+            host=dict(
+                required=False,
+                default=None,
+                type='str'),
+            check_results=dict(
+                required=False,
+                default=None,
+                type='dict'),
+            state=dict(
+                required=False,
+                default='present',
+                choices=['present', 'absent']),
+            days=dict(
+                required=False,
+                default=None,
+                type='int')
+        ),
+        supports_check_mode=True,
+    )
+
+    path = os.path.expanduser(module.params['path'])
+    cluster = module.params['cluster']
+    host = module.params['host']
+    if host is not None and cluster is None:
+        module.fail_json(msg="cluster is required to add or remove a host")
+    if host is not None and module.params['state'] == 'present' and module.params['check_results'] is None:
+        module.fail_json(msg="check_results is required to add a host to the index")
+
+    changed = False
+    if host is None:
+        index = load_index(path)
+    else:
+        with open(path + '.lock', 'w') as lock:
+            # Every host of a play may report at once
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            index = load_index(path)
+            if module.params['state'] == 'present':
+                changed = update_host(index, cluster, host, module.params['check_results'])
+            else:
+                changed = remove_host(index, cluster, host)
+            if changed and not module.check_mode:
+                save_index(path, index)
+
+    result = {
+        'changed': changed,
+        'hosts': len(index['hosts']),
+        'certificates': len(index['entries']),
+    }
+    if module.params['days'] is not None:
+        certs = expiring(index, datetime.datetime.now(), module.params['days'], cluster)
+        result['expiring'] = certs
+        result['msg'] = "{count} certificates on {hosts} hosts have expired or will expire within {days} days".format(
+            count=len(certs),
+            hosts=len(set((c['cluster'], c['host']) for c in certs)),
+            days=module.params['days'],
+        )
+
+    module.exit_json(**result)
+
+
+######################################################################
+# It's just the way we do things in Ansible. So disable this warning
+#
+# pylint: disable=wrong-import-position,import-error
+from ansible.module_utils.basic import AnsibleModule
+if __name__ == '__main__':
+    main()
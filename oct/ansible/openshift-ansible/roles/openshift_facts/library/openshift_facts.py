@@ -22,6 +22,8 @@ from distutils.util import strtobool
 from distutils.version import LooseVersion
 import struct
 import socket
+import time
+from multiprocessing.pool import ThreadPool
 from dbus import SystemBus, Interface
 from dbus.exceptions import DBusException
 
@@ -36,6 +38,33 @@ requirements: [ ]
 EXAMPLES = '''
 '''
 
+# Number of metadata requests to have in flight at once
+METADATA_WALK_THREADS = 8
+
+# Seconds for which provider facts cached on the host are used
+# instead of querying the provider metadata service again
+PROVIDER_FACTS_CACHE_TTL = 3600
+
+# Subsets of the Ansible facts this module reads; the product name and
+# version are all it needs of the hardware facts, so it reads them itself
+# instead of probing every mount, volume and device on the host for them
+SYSTEM_FACT_SUBSETS = ['network', 'virtual']
+
+# Files that change whenever packages are installed or removed
+RPM_DATABASE_FILES = ['/var/lib/rpm/Packages', '/var/lib/rpm/rpmdb.sqlite']
+
+# Packages the facts depend on being installed
+VARIANT_RPMS = ['openshift', 'openshift-master', 'openshift-node',
+                'openshift-clients', 'openshift-sdn-ovs',
+                'tuned-profiles-openshift-node',
+                'atomic-openshift', 'atomic-openshift-master', 'atomic-openshift-node',
+                'atomic-openshift-clients', 'atomic-openshift-sdn-ovs',
+                'tuned-profiles-atomic-openshift-node',
+                'origin', 'origin-master', 'origin-node',
+                'origin-clients', 'origin-sdn-ovs',
+                'tuned-profiles-origin-node']
+PROBED_RPMS = VARIANT_RPMS + ['chrony']
+
 
 def migrate_docker_facts(facts):
     """ Apply migrations for docker facts """
@@ -216,6 +245,9 @@ def query_metadata(metadata_url, headers=None, expect_json=False):
 def walk_metadata(metadata_url, headers=None, expect_json=False):
     """ Walk the metadata tree and return a dictionary of the entire tree
 
+        The tree is walked a level at a time, fetching every listing and
+        value on a level concurrently.
+
         Args:
             metadata_url (str): metadata url
             headers (dict): headers to set for metadata request
@@ -225,22 +257,37 @@ def walk_metadata(metadata_url, headers=None, expect_json=False):
     """
     metadata = dict()
 
-    for line in query_metadata(metadata_url, headers, expect_json):
-        if line.endswith('/') and not line == 'public-keys/':
-            key = line[:-1]
-            metadata[key] = walk_metadata(metadata_url + line,
-                                          headers, expect_json)
-        else:
-            results = query_metadata(metadata_url + line, headers,
-                                     expect_json)
-            if len(results) == 1:
-                # disable pylint maybe-no-member because overloaded use of
-                # the module name causes pylint to not detect that results
-                # is an array or hash
-                # pylint: disable=maybe-no-member
-                metadata[line] = results.pop()
-            else:
-                metadata[line] = results
+    def query(url):
+        """ Query metadata on a worker thread """
+        return query_metadata(url, headers, expect_json)
+
+    # every request on the current level, as the url to fetch, the tree
+    # the result goes in and its key there, or None for a listing
+    requests = [(metadata_url, metadata, None)]
+    pool = ThreadPool(METADATA_WALK_THREADS)
+    try:
+        while requests:
+            responses = pool.map(query, [url for url, _, _ in requests])
+            next_requests = []
+            for (url, tree, key), results in zip(requests, responses):
+                if key is None:
+                    for line in results:
+                        if line.endswith('/') and not line == 'public-keys/':
+                            tree[line[:-1]] = dict()
+                            next_requests.append((url + line, tree[line[:-1]], None))
+                        else:
+                            next_requests.append((url + line, tree, line))
+                elif len(results) == 1:
+                    # disable pylint maybe-no-member because overloaded use of
+                    # the module name causes pylint to not detect that results
+                    # is an array or hash
+                    # pylint: disable=maybe-no-member
+                    tree[key] = results.pop()
+                else:
+                    tree[key] = results
+            requests = next_requests
+    finally:
+        pool.terminate()
     return metadata
 
 
@@ -269,6 +316,138 @@ def get_provider_metadata(metadata_url, supports_recursive=False,
     return metadata
 
 
+def get_mtime(filename):
+    """ Return the modification time of a file, or None if it does not exist """
+    try:
+        return os.stat(filename).st_mtime
+    except OSError:
+        return None
+
+
+class ProbeCache(object):
+    """ Results of probing the host, such as running version commands or
+        querying the rpm database, cached on the host between runs
+
+        Every result is kept with the modification times of the files it
+        depends on and the host is probed again once any of them change.
+        All results are dropped when the host is rebooted.
+
+        Args:
+            filename (str): cache file, or None to only keep results in memory
+    """
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.boot_id = None
+        self.results = dict()
+        self.changed = False
+
+        if filename is None:
+            return
+
+        self.boot_id = get_file_content('/proc/sys/kernel/random/boot_id')
+        try:
+            with open(filename, 'r') as cache_file:
+                cache = json.load(cache_file)
+        except (ValueError, IOError):
+            return
+        if isinstance(cache, dict) and cache.get('boot_id') == self.boot_id:
+            self.results = cache.get('results', dict())
+
+    def get(self, name, dependencies, probe):
+        """ Return the result of a probe, probing the host if the cached
+            result is out of date
+
+            Args:
+                name (str): name of the probe
+                dependencies (list): files that change whenever the result may
+                probe (callable): probes the host; None results are not cached
+            Returns:
+                the result of the probe
+        """
+        mtimes = [get_mtime(dependency) for dependency in dependencies]
+        cached = self.results.get(name)
+        if cached is not None and cached['mtimes'] == mtimes:
+            return cached['result']
+
+        result = probe()
+        if result is not None:
+            self.results[name] = dict(mtimes=mtimes, result=result)
+            self.changed = True
+        return result
+
+    def save(self):
+        """ Save the results to the cache file if there are new ones """
+        if self.filename is None or not self.changed or module.check_mode:
+            return
+        save_cache_file(self.filename, dict(boot_id=self.boot_id, results=self.results))
+
+
+# Probes of the host for the current run, set up by main()
+probe_cache = ProbeCache()
+
+
+def save_cache_file(filename, data):
+    """ Save a cache file atomically
+
+        The provider metadata may hold credentials, so cache files are
+        only readable by their owner. The cache only saves time, so
+        failing to write it is not worth failing the host over.
+
+        Args:
+            filename (str): cache file
+            data (dict): data to cache
+    """
+    temporary_filename = '%s.%d.tmp' % (filename, os.getpid())
+    try:
+        fact_dir = os.path.dirname(filename)
+        try:
+            os.makedirs(fact_dir)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+        cache_fd = os.open(temporary_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(cache_fd, 'w') as cache_file:
+            cache_file.write(module.jsonify(data))
+        os.rename(temporary_filename, filename)
+    except (IOError, OSError):
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+
+
+def get_cached_provider_facts(filename, cache_key):
+    """ Retrieve provider facts cached on the host
+
+        Args:
+            filename (str): provider facts cache file
+            cache_key (dict): describes the host the facts must be for
+        Returns:
+            dict: the cached provider facts, or None if there are none
+                  that are recent enough and for this host
+    """
+    try:
+        with open(filename, 'r') as cache_file:
+            cache = json.load(cache_file)
+    except (ValueError, IOError):
+        return None
+
+    if not isinstance(cache, dict) or cache.get('key') != cache_key:
+        return None
+    if not 0 <= time.time() - cache.get('timestamp', 0) < PROVIDER_FACTS_CACHE_TTL:
+        return None
+    return cache.get('facts')
+
+
+def save_provider_facts_cache(filename, cache_key, provider_facts):
+    """ Cache provider facts on the host
+
+        Args:
+            filename (str): provider facts cache file
+            cache_key (dict): describes the host the facts are for
+            provider_facts (dict): provider facts to cache
+    """
+    save_cache_file(filename, dict(key=cache_key, timestamp=time.time(), facts=provider_facts))
+
+
 def normalize_gce_facts(metadata, facts):
     """ Normalize gce facts
 
@@ -1194,14 +1373,19 @@ def get_version_output(binary, version_cmd):
 
 def get_docker_version_info():
     """ Parses and returns the docker version info """
-    result = None
-    if is_service_running('docker'):
+    def probe():
+        """ Query the docker daemon for its version """
         version_info = yaml.safe_load(get_version_output('/usr/bin/docker', 'version'))
         if 'Server' in version_info:
-            result = {
+            return {
                 'api_version': version_info['Server']['API version'],
                 'version': version_info['Server']['Version']
             }
+        return None
+
+    result = None
+    if is_service_running('docker'):
+        result = probe_cache.get('docker version', ['/usr/bin/docker'] + RPM_DATABASE_FILES, probe)
     return result
 
 def get_hosted_registry_insecure():
@@ -1243,8 +1427,7 @@ def get_openshift_version(facts):
             return chomp_commit_offset(facts['common']['version'])
 
     if os.path.isfile('/usr/bin/openshift'):
-        _, output, _ = module.run_command(['/usr/bin/openshift', 'version'])
-        version = parse_openshift_version(output)
+        version = get_binary_openshift_version('/usr/bin/openshift')
     elif 'common' in facts and 'is_containerized' in facts['common']:
         version = get_container_openshift_version(facts)
 
@@ -1252,12 +1435,28 @@ def get_openshift_version(facts):
     # This can be very slow and may get re-run multiple times, so we only use this
     # if other methods failed to find a version.
     if not version and os.path.isfile('/usr/local/bin/openshift'):
-        _, output, _ = module.run_command(['/usr/local/bin/openshift', 'version'])
-        version = parse_openshift_version(output)
+        version = get_binary_openshift_version('/usr/local/bin/openshift')
 
     return chomp_commit_offset(version)
 
 
+def get_binary_openshift_version(binary):
+    """ Get the version of an openshift binary, which only changes
+        when the binary does
+
+        Args:
+            binary (str): path to the openshift binary
+        Returns:
+            string: the version number
+    """
+    def probe():
+        """ Ask the binary for its version """
+        _, output, _ = module.run_command([binary, 'version'])
+        return parse_openshift_version(output)
+
+    return probe_cache.get('%s version' % binary, [binary], probe)
+
+
 def chomp_commit_offset(version):
     """Chomp any "+git.foo" commit offset string from the given `version`
     and return the modified version string.
@@ -1348,6 +1547,11 @@ def apply_provider_facts(facts, provider_facts):
 def merge_facts(orig, new, additive_facts_to_overwrite, protected_facts_to_overwrite):
     """ Recursively merge facts dicts
 
+        The merged facts share the values of the facts they are merged from
+        wherever those are not changed by the merge, rather than copies of
+        them, so neither should be changed afterwards by callers that use
+        them again.
+
         Args:
             orig (dict): existing facts
             new (dict): facts to update
@@ -1369,6 +1573,14 @@ def merge_facts(orig, new, additive_facts_to_overwrite, protected_facts_to_overw
                             'kube_admission_plugin_config',
                             'image_policy_config']
 
+    # Index the facts to overwrite once for every level rather than once
+    # for every key on it: by the key of the fact to overwrite, and by the
+    # key the subset of them to pass on to the next level is chosen by
+    additive_facts_overwritten = set(x.split('.')[-1] for x in additive_facts_to_overwrite)
+    protected_facts_overwritten = set(x.split('.')[-1] for x in protected_facts_to_overwrite)
+    relevant_additive_facts = index_fact_paths(additive_facts_to_overwrite)
+    relevant_protected_facts = index_fact_paths(protected_facts_to_overwrite)
+
     facts = dict()
     for key, value in iteritems(orig):
         # Key exists in both old and new facts.
@@ -1379,43 +1591,28 @@ def merge_facts(orig, new, additive_facts_to_overwrite, protected_facts_to_overw
                 if isinstance(new[key], basestring):
                     facts[key] = yaml.safe_load(new[key])
                 else:
-                    facts[key] = copy.deepcopy(new[key])
+                    facts[key] = new[key]
             # Continue to recurse if old and new fact is a dictionary.
             elif isinstance(value, dict) and isinstance(new[key], dict):
-                # Collect the subset of additive facts to overwrite if
-                # key matches. These will be passed to the subsequent
-                # merge_facts call.
-                relevant_additive_facts = []
-                for item in additive_facts_to_overwrite:
-                    if '.' in item and item.startswith(key + '.'):
-                        relevant_additive_facts.append(item)
-
-                # Collect the subset of protected facts to overwrite
-                # if key matches. These will be passed to the
-                # subsequent merge_facts call.
-                relevant_protected_facts = []
-                for item in protected_facts_to_overwrite:
-                    if '.' in item and item.startswith(key + '.'):
-                        relevant_protected_facts.append(item)
-                facts[key] = merge_facts(value, new[key], relevant_additive_facts, relevant_protected_facts)
+                # Pass on the subsets of additive and protected facts
+                # to overwrite whose key matches.
+                facts[key] = merge_facts(value, new[key],
+                                         relevant_additive_facts.get(key, []),
+                                         relevant_protected_facts.get(key, []))
             # Key matches an additive fact and we are not overwriting
             # it so we will append the new value to the existing value.
-            elif key in additive_facts and key not in [x.split('.')[-1] for x in additive_facts_to_overwrite]:
+            elif key in additive_facts and key not in additive_facts_overwritten:
                 if isinstance(value, list) and isinstance(new[key], list):
-                    new_fact = []
-                    for item in copy.deepcopy(value) + copy.deepcopy(new[key]):
-                        if item not in new_fact:
-                            new_fact.append(item)
-                    facts[key] = new_fact
+                    facts[key] = unique_facts(value + new[key])
             # Key matches a protected fact and we are not overwriting
             # it so we will determine if it is okay to change this
             # fact.
-            elif key in protected_facts and key not in [x.split('.')[-1] for x in protected_facts_to_overwrite]:
+            elif key in protected_facts and key not in protected_facts_overwritten:
                 # The master count (int) can only increase unless it
                 # has been passed as a protected fact to overwrite.
                 if key == 'master_count':
                     if int(value) <= int(new[key]):
-                        facts[key] = copy.deepcopy(new[key])
+                        facts[key] = new[key]
                     else:
                         module.fail_json(msg='openshift_facts received a lower value for openshift.master.master_count')
                 # ha (bool) can not change unless it has been passed
@@ -1428,20 +1625,79 @@ def merge_facts(orig, new, additive_facts_to_overwrite, protected_facts_to_overw
             # No other condition has been met. Overwrite the old fact
             # with the new value.
             else:
-                facts[key] = copy.deepcopy(new[key])
+                facts[key] = new[key]
         # Key isn't in new so add it to facts to keep it.
         else:
-            facts[key] = copy.deepcopy(value)
-    new_keys = set(new.keys()) - set(orig.keys())
-    for key in new_keys:
+            facts[key] = value
+    for key, value in iteritems(new):
+        if key in orig:
+            continue
         # Watchout for JSON facts that sometimes load as strings.
         # (can happen if the JSON contains a boolean)
-        if key in inventory_json_facts and isinstance(new[key], basestring):
-            facts[key] = yaml.safe_load(new[key])
+        if key in inventory_json_facts and isinstance(value, basestring):
+            facts[key] = yaml.safe_load(value)
         else:
-            facts[key] = copy.deepcopy(new[key])
+            facts[key] = value
     return facts
 
+
+def index_fact_paths(fact_paths):
+    """ Index facts in jinja '.' notation by their first key
+
+        Args:
+            fact_paths (list): facts in '.' notation ex: ['master.named_certificates']
+        Returns:
+            dict: the facts with a '.' in them, by their first key
+    """
+    index = dict()
+    for fact_path in fact_paths:
+        if '.' in fact_path:
+            index.setdefault(fact_path.split('.', 1)[0], []).append(fact_path)
+    return index
+
+
+def canonical_fact(value):
+    """ Return a hashable value that is equal to the canonical value of
+        another fact exactly when the facts are equal
+
+        Args:
+            value: fact value
+        Returns:
+            the canonical value
+        Raises:
+            TypeError: if the fact holds a value that can not be hashed
+    """
+    if isinstance(value, dict):
+        return dict, frozenset((key, canonical_fact(item)) for key, item in iteritems(value))
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(canonical_fact(item) for item in value)
+    hash(value)
+    return value
+
+
+def unique_facts(values):
+    """ Remove duplicates from a list of facts, keeping the first of them
+
+        Args:
+            values (list): fact values
+        Returns:
+            list: the unique fact values, in the order they first appear
+    """
+    unique_values = []
+    seen = set()
+    for value in values:
+        try:
+            canonical_value = canonical_fact(value)
+        except TypeError:
+            # fall back to comparing the value with every unique value
+            if value not in unique_values:
+                unique_values.append(value)
+            continue
+        if canonical_value not in seen:
+            seen.add(canonical_value)
+            unique_values.append(value)
+    return unique_values
+
 def save_local_facts(filename, facts):
     """ Save local facts
 
@@ -1657,21 +1913,32 @@ def set_installed_variant_rpm_facts(facts):
         Returns:
             dict: the facts dict updated with installed_variant_rpms
                           """
-    installed_rpms = []
-    for base_rpm in ['openshift', 'atomic-openshift', 'origin']:
-        optional_rpms = ['master', 'node', 'clients', 'sdn-ovs']
-        variant_rpms = [base_rpm] + \
-                       ['{0}-{1}'.format(base_rpm, r) for r in optional_rpms] + \
-                       ['tuned-profiles-%s-node' % base_rpm]
-        for rpm in variant_rpms:
-            exit_code, _, _ = module.run_command(['rpm', '-q', rpm])
-            if exit_code == 0:
-                installed_rpms.append(rpm)
-
-    facts['common']['installed_variant_rpms'] = installed_rpms
+    installed_rpms = get_installed_rpms()
+    facts['common']['installed_variant_rpms'] = [rpm for rpm in VARIANT_RPMS if rpm in installed_rpms]
     return facts
 
 
+def get_installed_rpms():
+    """ Determine which of the packages the facts depend on are installed
+
+        Every rpm query pays for opening the rpm database, so all of the
+        packages are queried at once, and only again once packages are
+        installed or removed.
+
+        Returns:
+            list: the installed packages out of PROBED_RPMS
+    """
+    def probe():
+        """ Query the rpm database """
+        # packages that are not installed are reported as such, which
+        # is never the name of a package
+        _, output, _ = module.run_command(['rpm', '-q', '--queryformat', '%{NAME}\\n'] + PROBED_RPMS)
+        names = output.splitlines()
+        return [rpm for rpm in PROBED_RPMS if rpm in names]
+
+    return probe_cache.get('rpm -q', RPM_DATABASE_FILES, probe)
+
+
 
 class OpenShiftFactsInternalError(Exception):
     """Origin Facts Error"""
@@ -1740,12 +2007,17 @@ class OpenShiftFacts(object):
         try:
             # ansible-2.1
             # pylint: disable=too-many-function-args,invalid-name
-            self.system_facts = ansible_facts(module, ['hardware', 'network', 'virtual', 'facter'])
+            self.system_facts = ansible_facts(module, SYSTEM_FACT_SUBSETS)
             for (k, v) in self.system_facts.items():
                 self.system_facts["ansible_%s" % k.replace('-', '_')] = v
         except UnboundLocalError:
             # ansible-2.2
             self.system_facts = get_all_facts(module)['ansible_facts']
+        for fact in ['product_name', 'product_version']:
+            self.system_facts.setdefault(
+                'ansible_%s' % fact,
+                get_file_content('/sys/devices/virtual/dmi/id/%s' % fact, 'NA')
+            )
 
         self.facts = self.generate_facts(local_facts,
                                          additive_facts_to_overwrite,
@@ -1833,8 +2105,7 @@ class OpenShiftFacts(object):
         """
         defaults = {}
         ip_addr = self.system_facts['ansible_default_ipv4']['address']
-        exit_code, output, _ = module.run_command(['hostname', '-f'])
-        hostname_f = output.strip() if exit_code == 0 else ''
+        hostname_f = self.get_hostname_f() or ''
         hostname_values = [hostname_f, self.system_facts['ansible_nodename'],
                            self.system_facts['ansible_fqdn']]
         hostname = choose_hostname(hostname_values, ip_addr)
@@ -1909,8 +2180,7 @@ class OpenShiftFacts(object):
             defaults['docker'] = docker
 
         if 'clock' in roles:
-            exit_code, _, _ = module.run_command(['rpm', '-q', 'chrony'])
-            chrony_installed = bool(exit_code == 0)
+            chrony_installed = 'chrony' in get_installed_rpms()
             defaults['clock'] = dict(
                 enabled=True,
                 chrony_installed=chrony_installed)
@@ -1978,6 +2248,20 @@ class OpenShiftFacts(object):
 
         return defaults
 
+    @staticmethod
+    def get_hostname_f():
+        """ Get the fully qualified hostname of the host
+
+            Returns:
+                str: output of `hostname -f`, or None if it failed
+        """
+        def probe():
+            """ Resolve the hostname """
+            exit_code, output, _ = module.run_command(['hostname', '-f'])
+            return output.strip() if exit_code == 0 else None
+
+        return probe_cache.get('hostname -f', ['/etc/hostname', '/etc/hosts', '/etc/resolv.conf'], probe)
+
     def guess_host_provider(self):
         """ Guess the host provider
 
@@ -2040,17 +2324,51 @@ class OpenShiftFacts(object):
 
         return dict(name=provider, metadata=metadata)
 
+    def provider_facts_cache_key(self):
+        """ Describe the host for the provider facts cache
+
+            The provider is guessed from these, and the metadata of an
+            instance may change when it is restarted, so cached facts
+            are only used for the boot they were gathered in.
+
+            Returns:
+                dict: the cache key
+        """
+        key = dict(boot_id=get_file_content('/proc/sys/kernel/random/boot_id'),
+                   bios_vendor=get_file_content('/sys/devices/virtual/dmi/id/bios_vendor'))
+        for fact in ['ansible_product_name', 'ansible_product_version',
+                     'ansible_virtualization_type', 'ansible_virtualization_role']:
+            key[fact] = self.system_facts.get(fact)
+        # compare keys with what a cache file holds after a round-trip
+        return module.from_json(module.jsonify(key))
+
     def init_provider_facts(self):
         """ Initialize the provider facts
 
+            Provider facts are cached next to the local facts file, so
+            the provider metadata is only walked on the first run for
+            a host rather than on every run.
+
             Returns:
                 dict: The normalized provider facts
         """
+        cache_filename = os.path.join(os.path.dirname(self.filename),
+                                      'openshift_provider_facts.cache')
+        cache_key = self.provider_facts_cache_key()
+        provider_facts = get_cached_provider_facts(cache_filename, cache_key)
+        if provider_facts is not None:
+            return provider_facts
+
         provider_info = self.guess_host_provider()
         provider_facts = normalize_provider_facts(
             provider_info.get('name'),
             provider_info.get('metadata')
         )
+        # a provider whose metadata was unavailable may only have been
+        # unavailable for the moment, so we look again next time
+        metadata_unavailable = provider_info.get('name') and not provider_facts
+        if not module.check_mode and not metadata_unavailable:
+            save_provider_facts_cache(cache_filename, cache_key, provider_facts)
         return provider_facts
 
     @staticmethod
@@ -2263,6 +2581,7 @@ def main():
     # for 'global module' usage, since it is required to use ansible_facts
     # pylint: disable=global-variable-undefined, invalid-name
     global module
+    global probe_cache
     module = AnsibleModule(
         argument_spec=dict(
             role=dict(default='common', required=False,
@@ -2277,7 +2596,7 @@ def main():
         add_file_common_args=True,
     )
 
-    module.params['gather_subset'] = ['hardware', 'network', 'virtual', 'facter']
+    module.params['gather_subset'] = SYSTEM_FACT_SUBSETS
     module.params['gather_timeout'] = 10
     module.params['filter'] = '*'
 
@@ -2290,6 +2609,8 @@ def main():
 
     fact_file = '/etc/ansible/facts.d/openshift.fact'
 
+    probe_cache = ProbeCache(os.path.join(os.path.dirname(fact_file), 'openshift_probes.cache'))
+
     openshift_facts = OpenShiftFacts(role,
                                      fact_file,
                                      local_facts,
@@ -2297,6 +2618,7 @@ def main():
                                      openshift_env,
                                      openshift_env_structures,
                                      protected_facts_to_overwrite)
+    probe_cache.save()
 
     file_params = module.params.copy()
     file_params['path'] = fact_file
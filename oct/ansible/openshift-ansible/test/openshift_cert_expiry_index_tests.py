@@ -0,0 +1,105 @@
+""" Tests for the openshift_cert_expiry_index Ansible module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) +
+                            "/../roles/openshift_certificate_expiry/library/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+from openshift_cert_expiry_index import (expiring, load_index, new_index, remove_host, save_index,
+                                         update_host)
+
+
+def check_results(checked_at_time, **sources):
+    results = {'meta': {'checked_at_time': checked_at_time}}
+    for source, certs in sources.items():
+        results[source] = [{'cert_cn': 'CN:%s' % path, 'path': path, 'expiry': expiry, 'health': 'ok',
+                            'days_remaining': 0} for path, expiry in certs]
+    return results
+
+
+class CertExpiryIndexTests(unittest.TestCase):
+
+    now = datetime.datetime(2017, 1, 1, 12, 0, 0)
+
+    def setUp(self):
+        self.index = new_index()
+        update_host(self.index, 'prod', 'master', check_results(
+            '2017-01-01 11:00:00', ocp_certs=[('/etc/origin/master/ca.crt', '2019-01-01 00:00:00'),
+                                              ('/etc/origin/master/master.server.crt', '2017-01-05 00:00:00')]))
+        update_host(self.index, 'prod', 'node', check_results(
+            '2017-01-01 11:00:00', kubeconfigs=[('/etc/origin/node/system.kubeconfig', '2017-01-03 00:00:00')]))
+        update_host(self.index, 'test', 'master', check_results(
+            '2017-01-01 11:00:00', etcd=[('/etc/etcd/server.crt', '2016-12-01 00:00:00')]))
+
+    def paths(self, days, cluster=None):
+        return [(c['cluster'], c['path']) for c in expiring(self.index, self.now, days, cluster)]
+
+    def test_entries_are_sorted_by_expiry(self):
+        expiries = [entry[0] for entry in self.index['entries']]
+        self.assertEquals(sorted(expiries), expiries)
+        self.assertEquals(3, len(self.index['hosts']))
+
+    def test_expiring_across_clusters(self):
+        self.assertEquals([('test', '/etc/etcd/server.crt'),
+                           ('prod', '/etc/origin/node/system.kubeconfig'),
+                           ('prod', '/etc/origin/master/master.server.crt')], self.paths(7))
+        self.assertEquals([('test', '/etc/etcd/server.crt')], self.paths(0))
+
+    def test_expiring_in_one_cluster(self):
+        self.assertEquals([('prod', '/etc/origin/node/system.kubeconfig'),
+                           ('prod', '/etc/origin/master/master.server.crt')], self.paths(7, cluster='prod'))
+
+    def test_expiring_includes_the_cutoff(self):
+        # master.server.crt expires 3 days and 12 hours from now
+        self.assertNotIn(('prod', '/etc/origin/master/master.server.crt'), self.paths(3))
+        self.now = datetime.datetime(2017, 1, 2, 0, 0, 0)
+        self.assertIn(('prod', '/etc/origin/master/master.server.crt'), self.paths(3))
+
+    def test_days_remaining(self):
+        certs = expiring(self.index, self.now, 7)
+        self.assertEquals([-32, 1, 3], [c['days_remaining'] for c in certs])
+
+    def test_update_replaces_host(self):
+        changed = update_host(self.index, 'prod', 'master', check_results(
+            '2017-01-02 11:00:00', ocp_certs=[('/etc/origin/master/ca.crt', '2019-01-01 00:00:00'),
+                                              ('/etc/origin/master/master.server.crt', '2018-01-05 00:00:00')]))
+        self.assertTrue(changed)
+        self.assertEquals([('test', '/etc/etcd/server.crt'),
+                           ('prod', '/etc/origin/node/system.kubeconfig')], self.paths(7))
+        self.assertEquals(4, len(self.index['entries']))
+
+    def test_unchanged_results(self):
+        self.assertFalse(update_host(self.index, 'prod', 'node', check_results(
+            '2017-01-01 11:00:00', kubeconfigs=[('/etc/origin/node/system.kubeconfig', '2017-01-03 00:00:00')])))
+
+    def test_remove_host(self):
+        self.assertTrue(remove_host(self.index, 'test', 'master'))
+        self.assertFalse(remove_host(self.index, 'test', 'master'))
+        self.assertEquals(['prod/master', 'prod/node'], sorted(self.index['hosts']))
+        self.assertEquals(3, len(self.index['entries']))
+        # the host of the same name in another cluster is kept
+        self.assertEquals(2, len([e for e in self.index['entries'] if e[2] == 'master']))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'index.json')
+
+        self.assertEquals(new_index(), load_index(path))
+        save_index(path, self.index)
+        self.index = load_index(path)
+        self.assertEquals(['index.json'], os.listdir(directory))
+        self.assertEquals(3, len(self.paths(7)))
+        self.assertFalse(update_host(self.index, 'prod', 'node', check_results(
+            '2017-01-01 11:00:00', kubeconfigs=[('/etc/origin/node/system.kubeconfig', '2017-01-03 00:00:00')])))
+
+
+if __name__ == '__main__':
+    unittest.main()
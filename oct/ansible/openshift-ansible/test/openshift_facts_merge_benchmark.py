@@ -0,0 +1,152 @@
+""" Micro-benchmark for merge_facts in the openshift_facts Ansible module.
+
+Merges fact trees shaped like those of a large cluster with the current
+merge_facts and with the implementation it replaced, checks that both
+give the same facts and reports how long each takes.
+
+    python test/openshift_facts_merge_benchmark.py [--certificates N] [--repeat N]
+
+Needs what the module needs to be imported: Ansible and dbus-python.
+"""
+# pylint: disable=missing-docstring,invalid-name
+
+import argparse
+import copy
+import os
+import sys
+import timeit
+
+sys.path = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "../roles/openshift_facts/library/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_facts
+from openshift_facts import iteritems, safe_get_bool, yaml
+
+try:
+    # python2
+    basestring
+except NameError:
+    # python3
+    basestring = str  # pylint: disable=redefined-builtin
+
+
+# pylint: disable=too-many-branches
+def legacy_merge_facts(orig, new, additive_facts_to_overwrite, protected_facts_to_overwrite):
+    """ merge_facts as it was before it shared unchanged facts """
+    additive_facts = ['named_certificates']
+    protected_facts = ['ha', 'master_count']
+    inventory_json_facts = ['admission_plugin_config',
+                            'kube_admission_plugin_config',
+                            'image_policy_config']
+
+    facts = dict()
+    for key, value in iteritems(orig):
+        if key in new:
+            if key in inventory_json_facts:
+                if isinstance(new[key], basestring):
+                    facts[key] = yaml.safe_load(new[key])
+                else:
+                    facts[key] = copy.deepcopy(new[key])
+            elif isinstance(value, dict) and isinstance(new[key], dict):
+                relevant_additive_facts = []
+                for item in additive_facts_to_overwrite:
+                    if '.' in item and item.startswith(key + '.'):
+                        relevant_additive_facts.append(item)
+                relevant_protected_facts = []
+                for item in protected_facts_to_overwrite:
+                    if '.' in item and item.startswith(key + '.'):
+                        relevant_protected_facts.append(item)
+                facts[key] = legacy_merge_facts(value, new[key], relevant_additive_facts, relevant_protected_facts)
+            elif key in additive_facts and key not in [x.split('.')[-1] for x in additive_facts_to_overwrite]:
+                if isinstance(value, list) and isinstance(new[key], list):
+                    new_fact = []
+                    for item in copy.deepcopy(value) + copy.deepcopy(new[key]):
+                        if item not in new_fact:
+                            new_fact.append(item)
+                    facts[key] = new_fact
+            elif key in protected_facts and key not in [x.split('.')[-1] for x in protected_facts_to_overwrite]:
+                if key == 'master_count':
+                    if int(value) <= int(new[key]):
+                        facts[key] = copy.deepcopy(new[key])
+                    else:
+                        raise ValueError('lower master_count')
+                if key == 'ha':
+                    if safe_get_bool(value) != safe_get_bool(new[key]):
+                        raise ValueError('different ha')
+                    else:
+                        facts[key] = value
+            else:
+                facts[key] = copy.deepcopy(new[key])
+        else:
+            facts[key] = copy.deepcopy(value)
+    new_keys = set(new.keys()) - set(orig.keys())
+    for key in new_keys:
+        if key in inventory_json_facts and isinstance(new[key], basestring):
+            facts[key] = yaml.safe_load(new[key])
+        else:
+            facts[key] = copy.deepcopy(new[key])
+    return facts
+
+
+def named_certificates(start, count):
+    return [{'certfile': '/etc/origin/master/named_certificates/cert%d.crt' % i,
+             'keyfile': '/etc/origin/master/named_certificates/cert%d.key' % i,
+             'names': ['app%d.example.com' % i, 'www.app%d.example.com' % i],
+             'cafile': '/etc/origin/master/named_certificates/ca.crt'}
+            for i in range(start, start + count)]
+
+
+def admission_plugin_config(plugins):
+    return dict(('plugin%d' % i, {'configuration': {'apiVersion': 'v1',
+                                                    'kind': 'Plugin%dConfig' % i,
+                                                    'rules': [{'selector': {'label%d' % j: 'value%d' % j},
+                                                               'limit': j}
+                                                              for j in range(20)]}})
+                for i in range(plugins))
+
+
+def fact_trees(certificates):
+    """ Return existing facts and facts to merge into them for a large
+        master, where half of the named certificates are already known """
+    defaults = {
+        'common': {'hostname': 'master.example.com', 'ip': '10.0.0.1', 'public_ip': '10.0.0.1',
+                   'deployment_type': 'origin', 'portal_net': '172.30.0.0/16', 'debug_level': 2},
+        'master': {'api_port': '8443', 'console_port': '8443', 'master_count': 3, 'ha': True,
+                   'scheduler_predicates': [{'name': 'Predicate%d' % i} for i in range(10)],
+                   'named_certificates': named_certificates(0, certificates),
+                   'admission_plugin_config': admission_plugin_config(5)},
+        'node': {'labels': dict(('label%d' % i, 'value%d' % i) for i in range(50)),
+                 'kubelet_args': dict(('arg%d' % i, ['value%d' % i]) for i in range(50))},
+        'provider': {'metadata': dict(('key%d' % i, {'value': 'x' * 100}) for i in range(200))},
+    }
+    local_facts = {
+        'common': {'hostname': 'master.example.com', 'debug_level': 4},
+        'master': {'master_count': 3, 'ha': True,
+                   'named_certificates': named_certificates(certificates // 2, certificates),
+                   'admission_plugin_config': admission_plugin_config(50)},
+        'node': {'labels': {'region': 'infra'}},
+    }
+    return defaults, local_facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--certificates', type=int, default=200, help='named certificates in the facts')
+    parser.add_argument('--repeat', type=int, default=20, help='merges to time')
+    args = parser.parse_args()
+
+    orig, new = fact_trees(args.certificates)
+    merged = openshift_facts.merge_facts(orig, new, [], [])
+    assert merged == legacy_merge_facts(orig, new, [], []), 'merge_facts does not merge like it used to'
+    assert len(merged['master']['named_certificates']) == args.certificates * 3 // 2
+
+    timings = []
+    for name, merge in [('legacy', legacy_merge_facts), ('current', openshift_facts.merge_facts)]:
+        seconds = min(timeit.repeat(lambda: merge(orig, new, [], []), number=args.repeat, repeat=3)) / args.repeat
+        timings.append(seconds)
+        print('%-8s %8.3f ms per merge' % (name, seconds * 1000))
+    print('speedup  %8.1fx' % (timings[0] / timings[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from click import group
+
+from .start import start
+from .stop import stop
+
+_SHORT_HELP = 'Manage a daemon that keeps the Ansible core warm.'
+
+
+@group(
+    short_help=_SHORT_HELP,
+    help=_SHORT_HELP + '''
+
+Every invocation of this tool pays the cost of importing the
+Ansible core, parsing playbooks and loading the inventory before
+any work is done. When many commands are run in sequence, that
+cost can be paid once by a long-lived daemon instead: while the
+daemon is running, every other command sends its playbook to the
+daemon over a local socket and streams the output back.
+''',
+)
+def daemon():
+    """
+    Do nothing -- this group should never be called without a sub-command.
+    """
+
+    pass
+
+
+daemon.add_command(start)
+daemon.add_command(stop)
@@ -0,0 +1,64 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from os import makedirs, remove
+from os.path import abspath, dirname, exists, join
+
+from click import ClickException, command, echo, pass_context
+
+from ...config.ansible_daemon import AnsibleDaemon, daemon_available
+
+_SHORT_HELP = 'Start the daemon in the foreground.'
+
+
+@command(
+    short_help=_SHORT_HELP,
+    help=_SHORT_HELP + '''
+
+The daemon parses all of the playbooks and roles bundled with
+this tool when it starts and keeps the inventory loaded until
+it changes on disk. The daemon runs until it is stopped, so it
+should be started in the background. If the playbooks bundled
+with this tool are updated, the daemon must be restarted.
+
+\b
+Examples:
+  Start the daemon in the background
+  $ oct daemon start &
+''',
+)
+@pass_context
+def start(context):
+    """
+    Start the daemon in the foreground.
+
+    :param context: Click context
+    """
+    configuration = context.obj
+    socket_path = configuration.daemon_socket_path
+    if daemon_available(socket_path):
+        raise ClickException('A daemon is already listening on {}.'.format(socket_path))
+
+    if exists(socket_path):
+        # a daemon that was killed will leave its socket behind
+        remove(socket_path)
+
+    if not exists(dirname(socket_path)):
+        makedirs(dirname(socket_path))
+
+    from ...oct import __file__ as root_path
+    ansible_root = join(abspath(dirname(root_path)), 'ansible')
+
+    ansible_daemon = AnsibleDaemon(
+        socket_path=socket_path,
+        playbook_directories=[
+            join(ansible_root, 'oct'),
+            join(ansible_root, 'openshift-ansible', 'playbooks'),
+            join(ansible_root, 'openshift-ansible', 'roles'),
+        ],
+        vagrant_directory_root=configuration.vagrant_directory_root,
+    )
+    ansible_daemon.warm()
+
+    echo('Listening on {}.'.format(socket_path))
+    ansible_daemon.serve_forever()
@@ -0,0 +1,36 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from click import ClickException, command, echo, pass_context
+
+from ...config.ansible_daemon import daemon_available, stop_daemon
+
+_SHORT_HELP = 'Stop a running daemon.'
+
+
+@command(
+    short_help=_SHORT_HELP,
+    help=_SHORT_HELP + '''
+
+Playbooks that the daemon is already running will be allowed
+to finish, but no new requests will be accepted.
+
+\b
+Examples:
+  Stop the daemon
+  $ oct daemon stop
+''',
+)
+@pass_context
+def stop(context):
+    """
+    Stop a running daemon.
+
+    :param context: Click context
+    """
+    socket_path = context.obj.daemon_socket_path
+    if not daemon_available(socket_path):
+        raise ClickException('No daemon is listening on {}.'.format(socket_path))
+
+    stop_daemon(socket_path)
+    echo('Daemon stopped.')
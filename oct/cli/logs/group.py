@@ -0,0 +1,28 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from click import group
+
+from .query import query
+
+_SHORT_HELP = 'Inspect the logs of past playbook runs.'
+
+
+@group(
+    short_help=_SHORT_HELP,
+    help=_SHORT_HELP + '''
+
+Every playbook this tool runs is logged to its own file, one
+structured event per line, alongside an index of the results
+of every task in the run. These commands read the logs back.
+''',
+)
+def logs():
+    """
+    Do nothing -- this group should never be called without a sub-command.
+    """
+
+    pass
+
+
+logs.add_command(query)
@@ -0,0 +1,113 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from json import dumps
+
+from click import Choice, IntRange, command, echo, option, pass_context
+
+from ...util.log_query import LogQuery, query_runs, with_events
+
+_STATUSES = ['ok', 'changed', 'failed', 'ignored', 'skipped', 'unreachable']
+
+_SHORT_HELP = 'Find task results in the logs of past playbook runs.'
+
+
+@command(
+    short_help=_SHORT_HELP,
+    help=_SHORT_HELP + '''
+
+Task results from every run, or from the runs chosen, that meet
+all of the criteria given are printed one per line, oldest first,
+with the run, status, host and name and location of the task. With
+`--full', the whole logged event is printed as JSON instead.
+
+Results are found using the index of task results for each run,
+so only the logs of runs that are still in progress need to be
+read, unless the full events are requested.
+
+\b
+Examples:
+  Show all failed tasks on a host in the last 50 runs
+  $ oct logs query --host openshiftdevel --status failed --last 50
+\b
+  Show the full results of a task in one run
+  $ oct logs query --run 20170301T120000Z-0123abcd --name 'build the images' --full
+''',
+)
+@option(
+    '--run',
+    '-r',
+    'run_ids',
+    metavar='ID',
+    multiple=True,
+    help='Run to search. May be repeated.  [default: all runs]',
+)
+@option(
+    '--last',
+    '-n',
+    type=IntRange(min=1),
+    metavar='N',
+    help='Search only the N most recent runs.',
+)
+@option(
+    '--host',
+    'hosts',
+    metavar='HOST',
+    multiple=True,
+    help='Host the task ran on. May be repeated.',
+)
+@option(
+    '--status',
+    '-s',
+    'statuses',
+    type=Choice(_STATUSES),
+    multiple=True,
+    help='Status the task finished with. May be repeated.',
+)
+@option(
+    '--name',
+    metavar='TEXT',
+    help='Text the task name contains.',
+)
+@option(
+    '--location',
+    metavar='TEXT',
+    help='Text the task location contains, e.g. `main.yml:12`.',
+)
+@option(
+    '--full',
+    '-f',
+    is_flag=True,
+    help='Print the full logged events.',
+)
+@pass_context
+def query(context, run_ids, last, hosts, statuses, name, location, full):
+    """
+    Print the task results from the logs that match the query.
+
+    :param context: Click context
+    :param run_ids: runs to search, if not all runs
+    :param last: number of most recent runs to search
+    :param hosts: hosts the task must have run on
+    :param statuses: statuses the task must have finished with
+    :param name: text the task name must contain
+    :param location: text the task location must contain
+    :param full: whether or not to print the full events
+    """
+    log_root = context.obj.ansible_log_path
+    matches = query_runs(
+        log_root=log_root,
+        query=LogQuery(hosts=hosts, statuses=statuses, name=name, location=location),
+        run_ids=run_ids,
+        last=last,
+    )
+
+    if full:
+        for _, _, event in with_events(log_root, matches):
+            echo(dumps(event, sort_keys=True))
+    else:
+        for run_id, summary in matches:
+            echo(
+                '{} | {:<11} | {} | {} ({})'.
+                format(run_id, summary['status'], summary['host'], summary['name'], summary['location'])
+            )
@@ -1,6 +1,8 @@
 # coding=utf-8
 from __future__ import absolute_import, division, print_function
 
+from os.path import join
+
 from click import UsageError, command, pass_context
 
 from ..util.common_options import ansible_output_options
@@ -20,17 +22,29 @@ source repositories on remote hosts than what is possible with the
 a repository, make target and optionally some parameters, this command
 allows for more specific control over actions on the remote host.
 
+Targets are run one after another unless more than one may run at
+once, in which case targets start as soon as all of the targets they
+depend on have succeeded and the output of every target is written
+to its own log file. Unless dependencies between the targets are
+given, they are determined from the prerequisites in the Makefile.
+
 \b
 Examples:
   Run only some Origin unit tests
   $ oct make origin test-unit --env WHAT=tools/junitreport/...
+\b
+  Run the Origin unit tests, verification and image build at once
+  $ oct make origin test-unit verify build-images --parallel 3
+\b
+  Build Origin images only once the build has succeeded
+  $ oct make origin build build-images verify -p 2 -D build-images=build
 ''',
 )
 @repository_argument
 @make_options
 @ansible_output_options
 @pass_context
-def make(context, repository, target, parameters, make_destination):
+def make(context, repository, target, parameters, make_destination, parallelism, dependencies):
     """
     Execute some make targets on the remote host.
 
@@ -39,6 +53,8 @@ def make(context, repository, target, parameters, make_destination):
     :param make_destination: optional destination on the remote host
     :param repository: name of the repository in which to work
     :param target: make target or targets
+    :param parallelism: maximum number of targets to run at once
+    :param dependencies: TARGET=PREREQUISITE pairs ordering targets
     """
     playbook_variables = {
         'origin_ci_make_repository': repository,
@@ -58,6 +74,28 @@ def make(context, repository, target, parameters, make_destination):
     if make_destination:
         playbook_variables['origin_ci_make_destination'] = make_destination
 
+    if dependencies and parallelism == 1:
+        raise UsageError('Dependencies between targets can only be declared when running targets in parallel.')
+
+    if parallelism > 1:
+        playbook_variables['origin_ci_make_parallelism'] = parallelism
+        playbook_variables['origin_ci_make_log_directory'] = join(context.obj.ansible_log_path, 'make')
+
+    if dependencies:
+        make_dependencies = {}
+        for dependency in dependencies:
+            if '=' not in dependency:
+                raise UsageError('Dependencies must be a target-prerequisite pair. Dependency %s is invalid.' % dependency)
+            (dependent, prerequisite) = dependency.split('=', 1)
+            for dependency_target in [dependent, prerequisite]:
+                if dependency_target not in target:
+                    raise UsageError(
+                        'Dependency %s refers to target %s, which is not being run.' % (dependency, dependency_target)
+                    )
+            make_dependencies.setdefault(dependent, []).append(prerequisite)
+
+        playbook_variables['origin_ci_make_dependencies'] = make_dependencies
+
     context.obj.run_playbook(
         playbook_relative_path='make/main',
         playbook_variables=playbook_variables,
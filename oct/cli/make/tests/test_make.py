@@ -153,3 +153,71 @@ class MakeTestCase(PlaybookRunnerTestCase):
                 ],
             )
         )
+
+    def test_parallel(self):
+        self.run_test(
+            TestCaseParameters(
+                args=['make', Repository.origin, 'target', 'second_target', '--parallel', '2'],
+                expected_calls=[
+                    PlaybookRunCallSpecification(
+                        playbook_relative_path='make/main',
+                        playbook_variables={
+                            'origin_ci_make_repository': Repository.origin,
+                            'origin_ci_make_targets': ['target', 'second_target'],
+                            'origin_ci_make_parallelism': 2,
+                        },
+                        unexpected_playbook_variables=['origin_ci_make_dependencies'],
+                    )
+                ],
+            )
+        )
+
+    def test_parallel_dependencies(self):
+        self.run_test(
+            TestCaseParameters(
+                args=[
+                    'make', Repository.origin, 'build', 'images', 'verify', '-p', '3', '-D', 'images=build', '-D', 'verify=build'
+                ],
+                expected_calls=[
+                    PlaybookRunCallSpecification(
+                        playbook_relative_path='make/main',
+                        playbook_variables={
+                            'origin_ci_make_repository': Repository.origin,
+                            'origin_ci_make_targets': ['build', 'images', 'verify'],
+                            'origin_ci_make_parallelism': 3,
+                            'origin_ci_make_dependencies': {
+                                'images': ['build'],
+                                'verify': ['build'],
+                            },
+                        },
+                    )
+                ],
+            )
+        )
+
+    def test_sequential_dependencies(self):
+        self.run_test(
+            TestCaseParameters(
+                args=['make', Repository.origin, 'build', 'images', '-D', 'images=build'],
+                expected_result=CLICK_RC_USAGE,
+                expected_output='only be declared when running targets in parallel',
+            )
+        )
+
+    def test_bad_format_dependency(self):
+        self.run_test(
+            TestCaseParameters(
+                args=['make', Repository.origin, 'build', 'images', '-p', '2', '-D', 'images'],
+                expected_result=CLICK_RC_USAGE,
+                expected_output='Dependency images is invalid',
+            )
+        )
+
+    def test_unknown_dependency(self):
+        self.run_test(
+            TestCaseParameters(
+                args=['make', Repository.origin, 'build', 'images', '-p', '2', '-D', 'images=verify'],
+                expected_result=CLICK_RC_USAGE,
+                expected_output='refers to target verify, which is not being run',
+            )
+        )
@@ -0,0 +1,189 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+import sys
+from os.path import abspath, dirname, join
+from threading import Lock
+from time import sleep
+from unittest import TestCase
+
+from mock import Mock
+
+# Ansible modules are not part of a package, so we
+# import them from the library directory directly
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', '..', '..', 'ansible', 'oct', 'library'))
+from parallel_make import TargetScheduler, detect_conflicts, detect_dependencies, find_cycle, read_make_database  # noqa: E402
+
+_MAKE_DATABASE = '''
+# Variables
+OUT_DIR := _output
+# Files
+build: _output/local/bin
+\thack/build-go.sh
+_output/local/bin:
+\tmkdir -p _output/local/bin
+build-images: build | images-prereqs
+images-prereqs: check-docker
+test-cmd: build
+\thack/test-cmd.sh
+check: check-docker
+verify: verify-gofmt verify-govet
+check-docker:
+# Not a target:
+.PHONY: build build-images verify test-cmd check
+'''
+
+
+class RecordingRunner(object):
+    """
+    Runs targets by recording when they start and end.
+    """
+
+    def __init__(self, failing=None, duration=0.05):
+        self.failing = failing or []
+        self.duration = duration
+        self.events = []
+        self.running = 0
+        self.most_running = 0
+        self._lock = Lock()
+
+    def __call__(self, target):
+        with self._lock:
+            self.events.append(('start', target))
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        sleep(self.duration)
+        with self._lock:
+            self.events.append(('end', target))
+            self.running -= 1
+        return target not in self.failing
+
+    def started(self):
+        return [target for event, target in self.events if event == 'start']
+
+
+class TargetSchedulerTestCase(TestCase):
+    def test_independent_targets_run_at_once(self):
+        runner = RecordingRunner()
+        scheduler = TargetScheduler(['first', 'second', 'third'], {}, 2)
+        scheduler.run(runner)
+
+        self.assertEqual(runner.most_running, 2)
+        self.assertEqual(sorted(runner.started()), ['first', 'second', 'third'])
+        self.assertEqual(set(scheduler.statuses.values()), {'succeeded'})
+        self.assertEqual(sorted(scheduler.elapsed_times), ['first', 'second', 'third'])
+
+    def test_sequential(self):
+        runner = RecordingRunner(duration=0)
+        TargetScheduler(['first', 'second', 'third'], {}, 1).run(runner)
+
+        self.assertEqual(runner.most_running, 1)
+        self.assertEqual(runner.started(), ['first', 'second', 'third'])
+
+    def test_dependent_waits_for_dependencies(self):
+        runner = RecordingRunner()
+        scheduler = TargetScheduler(['images', 'build', 'verify'], {'images': ['build', 'verify']}, 3)
+        scheduler.run(runner)
+
+        self.assertEqual(runner.events[-2:], [('start', 'images'), ('end', 'images')])
+        self.assertEqual(scheduler.statuses['images'], 'succeeded')
+
+    def test_failed_dependency_skips_dependents(self):
+        runner = RecordingRunner(failing=['build'])
+        scheduler = TargetScheduler(['build', 'images', 'push', 'verify'], {'images': ['build'], 'push': ['images']}, 2)
+        scheduler.run(runner)
+
+        self.assertEqual(sorted(runner.started()), ['build', 'verify'])
+        self.assertEqual(scheduler.statuses, {'build': 'failed', 'images': 'skipped', 'push': 'skipped', 'verify': 'succeeded'})
+        self.assertNotIn('images', scheduler.elapsed_times)
+
+    def test_exception_fails_target(self):
+        def explode(target):
+            raise RuntimeError(target)
+
+        scheduler = TargetScheduler(['build'], {}, 2)
+        scheduler.run(explode)
+        self.assertEqual(scheduler.statuses, {'build': 'failed'})
+
+    def test_conflicting_targets_do_not_run_at_once(self):
+        runner = RecordingRunner()
+        scheduler = TargetScheduler(['images', 'test', 'verify'], {}, 3,
+                                    {'images': {
+                                        'test': ['build']
+                                    },
+                                     'test': {
+                                         'images': ['build']
+                                     }})
+        scheduler.run(runner)
+
+        self.assertEqual(runner.most_running, 2)
+        self.assertEqual(runner.events[:2], [('start', 'images'), ('start', 'verify')])
+        self.assertEqual(runner.events[-2:], [('start', 'test'), ('end', 'test')])
+        self.assertEqual(set(scheduler.statuses.values()), {'succeeded'})
+
+    def test_repeated_targets_run_once(self):
+        runner = RecordingRunner(duration=0)
+        scheduler = TargetScheduler(['build', 'build', 'verify', 'build'], {}, 2)
+        scheduler.run(runner)
+
+        self.assertEqual(sorted(runner.started()), ['build', 'verify'])
+        self.assertEqual(scheduler.targets, ['build', 'verify'])
+
+
+class FindCycleTestCase(TestCase):
+    def test_no_cycle(self):
+        self.assertEqual(find_cycle(['a', 'b', 'c'], {'c': ['b'], 'b': ['a']}), [])
+
+    def test_cycle(self):
+        self.assertEqual(find_cycle(['a', 'b', 'c'], {'a': ['b'], 'b': ['c'], 'c': ['a']}), ['a', 'b', 'c', 'a'])
+
+    def test_self_dependency(self):
+        self.assertEqual(find_cycle(['a'], {'a': ['a']}), ['a', 'a'])
+
+
+class DetectDependenciesTestCase(TestCase):
+    def read(self, database):
+        module = Mock()
+        module.run_command.return_value = (1, database, '')
+        prerequisites, with_recipes = read_make_database(module, '/usr/bin/make', ['WHAT=pkg'], '/src')
+
+        self.assertEqual(module.run_command.call_args[0][0][-1], 'WHAT=pkg')
+        self.assertEqual(module.run_command.call_args[1], {'cwd': '/src'})
+        return prerequisites, with_recipes
+
+    def test_transitive_prerequisites(self):
+        prerequisites, _ = self.read(_MAKE_DATABASE)
+        dependencies = detect_dependencies(prerequisites, ['check-docker', 'build-images', 'verify', 'build'])
+
+        self.assertEqual(dependencies, {'build-images': ['check-docker', 'build']})
+
+    def test_recipes(self):
+        _, with_recipes = self.read(_MAKE_DATABASE)
+        self.assertEqual(with_recipes, {'build', '_output/local/bin', 'test-cmd'})
+
+    def test_shared_prerequisite(self):
+        prerequisites, with_recipes = self.read(_MAKE_DATABASE)
+        conflicts = detect_conflicts(prerequisites, with_recipes, ['build-images', 'test-cmd', 'verify'])
+
+        self.assertEqual(
+            conflicts, {
+                'build-images': {
+                    'test-cmd': ['_output/local/bin', 'build']
+                },
+                'test-cmd': {
+                    'build-images': ['_output/local/bin', 'build']
+                },
+            }
+        )
+
+    def test_shared_phony_prerequisite(self):
+        prerequisites, with_recipes = self.read(_MAKE_DATABASE)
+        conflicts = detect_conflicts(prerequisites, with_recipes, ['build-images', 'check'])
+
+        self.assertEqual(conflicts, {})
+
+    def test_dependent_targets_do_not_conflict(self):
+        prerequisites, with_recipes = self.read(_MAKE_DATABASE)
+        conflicts = detect_conflicts(prerequisites, with_recipes, ['build-images', 'build'])
+
+        self.assertEqual(conflicts, {})
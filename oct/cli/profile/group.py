@@ -0,0 +1,28 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from click import group
+
+from .report import report
+
+_SHORT_HELP = 'Analyze the time playbook runs spend in every task.'
+
+
+@group(
+    short_help=_SHORT_HELP,
+    help=_SHORT_HELP + '''
+
+When a command is run with `--profile', the time every task takes
+on every host is recorded along with the playbook, play and role
+the task is in. These commands aggregate the recorded profiles.
+''',
+)
+def profile():
+    """
+    Do nothing -- this group should never be called without a sub-command.
+    """
+
+    pass
+
+
+profile.add_command(report)
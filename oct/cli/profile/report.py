@@ -0,0 +1,205 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from click import ClickException, IntRange, UsageError, command, echo, option, pass_context
+
+from ...util.profile import critical_paths, profile_path, profiled_runs, read_profile, regressions, slowest_tasks, \
+    task_statistics
+
+_SHORT_HELP = 'Report the slowest tasks and critical paths of profiled runs.'
+
+
+@command(
+    short_help=_SHORT_HELP,
+    help=_SHORT_HELP + '''
+
+The profiles of every run, or of the runs chosen, are aggregated
+to find the tasks that took the most time per run and the critical
+path of every playbook: the time spent running tasks one after the
+other, each taking as long as it took on the slowest host, broken
+down by role.
+
+If baseline runs are given, every task that now takes longer than
+it did in the baseline runs, by more than the threshold percentage
+and the minimum change, is reported as a regression. Baseline runs
+are never part of the runs being reported on.
+
+\b
+Examples:
+  Find the slowest tasks in the last five profiled runs
+  $ oct prepare all --profile
+  $ oct profile report --last 5
+\b
+  Compare the last run of a playbook against an older run
+  $ oct profile report --playbook prepare --last 1 --baseline 20170301T120000Z-0123abcd
+''',
+)
+@option(
+    '--run',
+    '-r',
+    'run_ids',
+    metavar='ID',
+    multiple=True,
+    help='Run to report on. May be repeated.  [default: all runs]',
+)
+@option(
+    '--last',
+    '-n',
+    type=IntRange(min=1),
+    metavar='N',
+    help='Report only on the N most recent runs.',
+)
+@option(
+    '--playbook',
+    '-p',
+    metavar='TEXT',
+    help='Text the playbook name contains, e.g. `prepare/main`.',
+)
+@option(
+    '--baseline',
+    '-b',
+    'baseline_ids',
+    metavar='ID',
+    multiple=True,
+    help='Run to compare against. May be repeated.',
+)
+@option(
+    '--top',
+    '-t',
+    type=IntRange(min=1),
+    default=10,
+    show_default=True,
+    metavar='N',
+    help='Number of tasks and roles to show.',
+)
+@option(
+    '--threshold',
+    type=float,
+    default=10.0,
+    show_default=True,
+    metavar='PERCENT',
+    help='Increase in mean task time past which a task has regressed.',
+)
+@option(
+    '--min-change',
+    type=float,
+    default=1.0,
+    show_default=True,
+    metavar='SECONDS',
+    help='Increase in mean task time below which a task has not regressed.',
+)
+@pass_context
+def report(context, run_ids, last, playbook, baseline_ids, top, threshold, min_change):
+    """
+    Print the aggregated timings of the profiled runs.
+
+    :param context: Click context
+    :param run_ids: runs to report on, if not all runs
+    :param last: number of most recent runs to report on
+    :param playbook: text the playbook name must contain
+    :param baseline_ids: runs to compare against
+    :param top: number of tasks and roles to show
+    :param threshold: percentage increase past which a task has regressed
+    :param min_change: increase in seconds below which a task has not regressed
+    """
+    profile_root = context.obj.ansible_profile_path
+    runs = profiled_runs(profile_root)
+    if not runs:
+        raise ClickException('No runs have been profiled yet. Run a command with `--profile` first.')
+
+    unknown_runs = [run_id for run_id in run_ids + baseline_ids if run_id not in runs]
+    if unknown_runs:
+        raise UsageError('No profiles were found for runs: {}.'.format(', '.join(unknown_runs)))
+
+    if threshold < 0 or min_change < 0:
+        raise UsageError('The regression threshold and minimum change must not be negative.')
+
+    selected_runs = [run_id for run_id in runs if run_id not in baseline_ids]
+    if run_ids:
+        selected_runs = [run_id for run_id in selected_runs if run_id in run_ids]
+    if last:
+        selected_runs = selected_runs[-last:]
+
+    profiles = load_profiles(profile_root, selected_runs, playbook)
+    if not profiles:
+        raise ClickException('No tasks were recorded in the runs chosen.')
+
+    statistics = task_statistics(profiles)
+    echo('Slowest tasks, mean over {} run(s):'.format(len(profiles)))
+    for task in slowest_tasks(statistics, top):
+        echo('  {:>10}  max {:>10}  {}'.format(format_time(task.mean), format_time(task.maximum), format_task(task)))
+
+    paths = critical_paths(profiles)
+    for name in sorted(paths, key=lambda name: paths[name].mean, reverse=True):
+        path = paths[name]
+        echo(
+            '\nCritical path of {}: {} of {} wall-clock, mean over {} run(s):'.
+            format(name, format_time(path.mean), format_time(path.mean_wall_clock_time), len(path.durations))
+        )
+        for role, duration in path.mean_role_durations()[:top]:
+            echo('  {:>10}  {:>5.1f}%  {}'.format(format_time(duration), 100 * duration / path.mean if path.mean else 0, role))
+
+    if not baseline_ids:
+        return
+
+    baseline_profiles = load_profiles(profile_root, baseline_ids, playbook)
+    regressed = regressions(task_statistics(baseline_profiles), statistics, threshold / 100, min_change)
+    echo('\nRegressions against {} baseline run(s):'.format(len(baseline_profiles)))
+    if not regressed:
+        echo('  No tasks regressed.')
+    for baseline_task, task in regressed[:top]:
+        change = task.mean - baseline_task.mean
+        echo(
+            '  {:>11}  {:>+7.1f}%  {} -> {}  {}'.format(
+                '+' + format_time(change),
+                100 * change / baseline_task.mean if baseline_task.mean else float('inf'),
+                format_time(baseline_task.mean),
+                format_time(task.mean),
+                format_task(task),
+            )
+        )
+
+
+def load_profiles(profile_root, run_ids, playbook):
+    """
+    Load the profiles for the runs, keeping only the records
+    for the playbooks chosen.
+
+    :param profile_root: root directory for profiles
+    :param run_ids: runs to load
+    :param playbook: text the playbook name must contain
+    :return: map of run ID to task result records
+    """
+    profiles = {}
+    for run_id in run_ids:
+        records = read_profile(profile_path(profile_root, run_id))
+        if playbook:
+            records = [record for record in records if playbook in record['playbook']]
+
+        if records:
+            profiles[run_id] = records
+
+    return profiles
+
+
+def format_time(seconds):
+    """
+    Format a duration like MM:SS.SSS.
+
+    :param seconds: duration in seconds
+    :return: formatted duration
+    """
+    return '{:02.0f}:{:06.3f}'.format(*divmod(seconds, 60))
+
+
+def format_task(task):
+    """
+    Format the identity of a task like:
+    PLAYBOOK | ROLE | NAME (LOCATION) on HOST
+
+    :param task: TaskStatistics for the task
+    :return: formatted identity
+    """
+    playbook, role, name, location = task.key
+    identity = ' | '.join(part for part in [playbook, role, name] if part)
+    return '{} ({}) on {}'.format(identity, location, task.slowest_host)
@@ -1,7 +1,9 @@
 # coding=utf-8
 from __future__ import absolute_import, division, print_function
 
-from click import Choice, UsageError, command, option, pass_context
+from subprocess import CalledProcessError
+
+from click import Choice, IntRange, UsageError, command, echo, option, pass_context
 
 from ..common_options import discrete_ssh_config_option
 from ...util.common_options import ansible_output_options
@@ -42,6 +44,11 @@ class Stage(object):
     crio = 'crio'
 
 
+# Vagrant can bring up many libvirt domains at once, but
+# the other providers do not support parallel operation,
+# so we bring their VMs up one at a time
+_PARALLEL_PROVIDERS = [Provider.libvirt]
+
 _SHORT_HELP = 'Provision a virtual host for an All-In-One deployment.'
 
 
@@ -54,6 +61,11 @@ An All-In-One deployment of OpenShift uses one virtual host on which
 all cluster components are provisioned. These types of deployments are
 most useful for short-term development work-flows.
 
+To test multi-node topologies, more than one VM may be provisioned at
+once. The first VM will be a master and node and every other VM will
+be a node, each with the next IP address after the one before. With
+the libvirt provider, all of the VMs are brought up at once.
+
 \b
 Examples:
   Provision a VM with default parameters (fedora, libvirt, install)
@@ -64,6 +76,9 @@ Examples:
 \b
   Provision a VM with a specific IP address
   $ oct provision local all-in-one --ip=10.245.2.2
+\b
+  Provision a master and two nodes
+  $ oct provision local all-in-one --count=3
 ''',
 )
 @option(
@@ -115,10 +130,19 @@ Examples:
     metavar='ADDRESS',
     help='Desired IP of the VM.',
 )
+@option(
+    '--count',
+    '-n',
+    type=IntRange(min=1),
+    default=1,
+    show_default=True,
+    metavar='N',
+    help='Number of VMs to provision.',
+)
 @discrete_ssh_config_option
 @ansible_output_options
 @pass_context
-def all_in_one_command(context, operating_system, provider, stage, ip, discrete_ssh_config):
+def all_in_one_command(context, operating_system, provider, stage, ip, count, discrete_ssh_config):
     """
     Provision a virtual host for an All-In-One deployment.
 
@@ -127,12 +151,14 @@ def all_in_one_command(context, operating_system, provider, stage, ip, discrete_
     :param provider: provider to use with Vagrant
     :param stage: image stage to base the VM off of
     :param ip: desired VM IP address
+    :param count: number of VMs to provision
     :param discrete_ssh_config: whether to update ~/.ssh/config or write a new file
     """
     configuration = context.obj
     validate(provider, stage)
+    addresses = vm_addresses(ip, count)
     if provider in [Provider.virtualbox, Provider.libvirt, Provider.vmware]:
-        provision_with_vagrant(configuration, operating_system, provider, stage, ip, discrete_ssh_config)
+        provision_with_vagrant(configuration, operating_system, provider, stage, addresses, discrete_ssh_config)
 
 
 def validate(provider, stage):
@@ -149,39 +175,84 @@ def validate(provider, stage):
         raise UsageError('Only the %s stage is supported for the %s provider.' % (Stage.bare, Provider.vmware))
 
 
-def provision_with_vagrant(configuration, operating_system, provider, stage, ip, discrete_ssh_config):
+def vm_addresses(ip, count):
     """
-    Provision a local VM using Vagrant.
+    Determine the IP addresses for the VMs, counting up
+    from the address requested for the first VM.
+
+    :param ip: desired IP address of the first VM
+    :param count: number of VMs
+    :return: list of IP addresses
+    """
+    octets = ip.split('.')
+    if len(octets) != 4 or not all(octet.isdigit() and int(octet) < 256 for octet in octets):
+        raise UsageError('The IP address %s is not a valid IPv4 address.' % ip)
+
+    if int(octets[3]) + count > 255:
+        raise UsageError('Not enough IP addresses follow %s to provision %d VMs.' % (ip, count))
+
+    prefix = '.'.join(octets[:3])
+    return ['%s.%d' % (prefix, int(octets[3]) + i) for i in range(count)]
+
+
+def provision_with_vagrant(configuration, operating_system, provider, stage, addresses, discrete_ssh_config):
+    """
+    Provision local VMs using Vagrant.
 
     :param configuration: Origin CI tool configuration
-    :param operating_system: operating system to use for the VM
+    :param operating_system: operating system to use for the VMs
     :param provider: provider to use with Vagrant
-    :param stage: image stage to base the VM off of
-    :param ip: desired VM IP address
+    :param stage: image stage to base the VMs off of
+    :param addresses: desired IP address of every VM
     :param discrete_ssh_config: whether to update ~/.ssh/config or write a new file
     """
-    hostname = configuration.next_available_vagrant_name
-    home_dir = configuration.vagrant_home_directory(hostname)
-    configuration.run_playbook(
-        playbook_relative_path='provision/vagrant-up',
-        playbook_variables={
-            'origin_ci_vagrant_home_dir': home_dir,
-            'origin_ci_vagrant_os': operating_system,
-            'origin_ci_vagrant_provider': provider,
-            'origin_ci_vagrant_stage': stage,
-            'origin_ci_vagrant_ip': ip,
-            'origin_ci_vagrant_hostname': hostname,
-            'origin_ci_inventory_dir': configuration.ansible_client_configuration.host_list,
-            'origin_ci_ssh_config_strategy': 'discrete' if discrete_ssh_config else 'update',
-        },
-    )
+    hosts = []
+    registered = 0
+    try:
+        # we reserve the hostnames up front so that a concurrent
+        # invocation cannot choose them while we are provisioning
+        for ip in addresses:
+            hostname = configuration.reserve_vagrant_name()
+            hosts.append({
+                'hostname': hostname,
+                'home_dir': configuration.vagrant_home_directory(hostname),
+                'ip': ip,
+            })
 
-    # if we successfully executed the playbook, we have a
-    # new host and need to update our metadata and records
-    register_host(configuration, home_dir, hostname, operating_system, provider, stage)
+        if provider in _PARALLEL_PROVIDERS:
+            batches = [hosts]
+        else:
+            batches = [[host] for host in hosts]
+
+        for batch in batches:
+            configuration.run_playbook(
+                playbook_relative_path='provision/vagrant-up',
+                playbook_variables={
+                    'origin_ci_vagrant_hosts': batch,
+                    'origin_ci_vagrant_os': operating_system,
+                    'origin_ci_vagrant_provider': provider,
+                    'origin_ci_vagrant_stage': stage,
+                    'origin_ci_inventory_dir': configuration.ansible_client_configuration.host_list,
+                    'origin_ci_ssh_config_strategy': 'discrete' if discrete_ssh_config else 'update',
+                },
+            )
+
+            # if we successfully executed the playbook, we have
+            # new hosts and need to update our metadata and records
+            for host in batch:
+                if host is hosts[0]:
+                    register_host(configuration, host['home_dir'], host['hostname'], operating_system, provider, stage)
+                else:
+                    register_node(configuration, host['home_dir'], host['hostname'], operating_system, provider, stage)
+                registered += 1
+    finally:
+        # if provisioning failed, the hosts we did not register
+        # will never be torn down, so we release their names
+        for host in hosts[registered:]:
+            release_failed_host(configuration, host['hostname'])
 
     if stage == Stage.bare and provider != Provider.virtualbox:
-        # once we have the new host, we must partition the space on it
+        # once we have the new hosts, we must partition the space on them
         # that was set aside for Docker storage, then update the kernel
         # partition tables and set up the volume group backed by the LVM
         # pool
@@ -192,12 +263,37 @@ def provision_with_vagrant(configuration, operating_system, provider, stage, ip,
             playbook_relative_path='provision/vagrant-docker-storage',
             playbook_variables={
                 'origin_ci_vagrant_provider': provider,
-                'origin_ci_vagrant_home_dir': home_dir,
-                'origin_ci_vagrant_hostname': hostname,
+                'origin_ci_vagrant_hostnames': [host['hostname'] for host in hosts],
             },
         )
 
 
+def release_failed_host(configuration, hostname):
+    """
+    Release the name reserved for a host that we failed
+    to provision, destroying the VM if Vagrant created
+    it. If the VM cannot be destroyed, we keep its home
+    directory so that it can still be torn down later.
+
+    :param configuration: Origin CI tool configuration
+    :param hostname: hostname reserved for the VM
+    """
+    try:
+        destroyed = configuration.release_vagrant_name(hostname)
+    except (CalledProcessError, OSError) as e:
+        echo(
+            'Failed to destroy the VM for {} after provisioning failed: {}\n'
+            'Destroy it with `vagrant destroy` in {}.'.format(hostname, e, configuration.vagrant_home_directory(hostname)),
+            err=True,
+        )
+        return
+
+    if destroyed:
+        echo('Destroyed the VM for {} after provisioning failed.'.format(hostname), err=True)
+    else:
+        echo('Released the name {} after provisioning failed.'.format(hostname), err=True)
+
+
 def register_host(configuration, home_dir, hostname, operating_system, provider, stage):
     """
     Register a new host by updating metadata records for the
@@ -241,3 +337,40 @@ def register_host(configuration, home_dir, hostname, operating_system, provider,
             }
         )
     )
+
+
+def register_node(configuration, home_dir, hostname, operating_system, provider, stage):
+    """
+    Register a new host that is only a node, by updating
+    metadata records for the new VM both in the in-memory
+    cache for this process and the on-disk records that
+    will persist past this CLI call.
+
+    :param configuration: Origin CI tool configuration
+    :param home_dir: directory from which the VM was created
+    :param hostname: hostname of the VM
+    :param operating_system: operating system used for the VM
+    :param provider: provider used with Vagrant
+    :param stage: image stage the VM was based off of
+    """
+    configuration.register_vagrant_host(
+        VagrantVMMetadata(
+            data={
+                'directory': home_dir,
+                'hostname': hostname,
+                'provisioning_details': {
+                    'operating_system': operating_system,
+                    'provider': provider,
+                    'stage': stage,
+                },
+                'groups': ['nodes'],
+                'extra': {
+                    'openshift_schedulable': True,
+                    'openshift_node_labels': {
+                        'region': 'primary',
+                        'zone': 'default',
+                    },
+                },
+            }
+        )
+    )
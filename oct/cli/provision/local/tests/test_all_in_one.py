@@ -1,13 +1,16 @@
 # coding=utf-8
 from __future__ import absolute_import, division, print_function
 
+from subprocess import CalledProcessError
+
+from click import ClickException
 from mock import patch
 from oct.cli.provision.local import all_in_one
 from oct.cli.provision.local.all_in_one import OperatingSystem, Provider, Stage
 from oct.config import vagrant as vagrant_configuration
 from oct.config.configuration import Configuration
 from oct.config.vagrant import VagrantVMMetadata
-from oct.tests.unit.playbook_runner_test_case import CLICK_RC_USAGE, PlaybookRunnerTestCase, \
+from oct.tests.unit.playbook_runner_test_case import CLICK_RC_EXCEPTION, CLICK_RC_USAGE, PlaybookRunnerTestCase, \
     TestCaseParameters, show_stack_trace, PlaybookRunCallSpecification
 
 if not show_stack_trace:
@@ -38,6 +41,11 @@ class ProvisionVagrantTestCase(PlaybookRunnerTestCase):
                 attribute='_vagrant_hostname_taken',
                 new=lambda _, __: False,
             ),
+            patch.object(
+                target=Configuration,
+                attribute='_claim_vagrant_home_directory',
+                new=lambda _, __: True,
+            ),
             patch.object(
                 target=all_in_one,
                 attribute='register_host',
@@ -121,12 +129,121 @@ class ProvisionVagrantTestCase(PlaybookRunnerTestCase):
                 expected_calls=[
                     PlaybookRunCallSpecification(
                         playbook_relative_path='provision/vagrant-up',
-                        playbook_variables={'origin_ci_vagrant_ip': ip, },
+                        playbook_variables={
+                            'origin_ci_vagrant_hosts': [{
+                                'hostname': 'openshiftdevel',
+                                'home_dir': Configuration().vagrant_home_directory('openshiftdevel'),
+                                'ip': ip,
+                            }],
+                        },
                     )
                 ],
             )
         )
 
+    def test_count(self):
+        names = iter(['openshiftdevel', 'openshiftdevel0', 'openshiftdevel1'])
+        with patch.object(target=Configuration, attribute='reserve_vagrant_name', new=lambda _: next(names)), \
+                patch.object(target=all_in_one, attribute='register_node', new=lambda _, __, ___, ____, _____, ______: None):
+            self.run_test(
+                TestCaseParameters(
+                    args=['provision', 'local', 'all-in-one', '--count', '3', '--stage', Stage.bare],
+                    expected_calls=[
+                        PlaybookRunCallSpecification(
+                            playbook_relative_path='provision/vagrant-up',
+                            playbook_variables={
+                                'origin_ci_vagrant_hosts': [{
+                                    'hostname': name,
+                                    'home_dir': Configuration().vagrant_home_directory(name),
+                                    'ip': '10.245.2.{}'.format(i + 2),
+                                } for i, name in enumerate(['openshiftdevel', 'openshiftdevel0', 'openshiftdevel1'])],
+                            },
+                        ),
+                        PlaybookRunCallSpecification(
+                            playbook_relative_path='provision/vagrant-docker-storage',
+                            playbook_variables={
+                                'origin_ci_vagrant_hostnames': ['openshiftdevel', 'openshiftdevel0', 'openshiftdevel1'],
+                            },
+                        ),
+                    ],
+                )
+            )
+
+    def test_count_serial_provider(self):
+        with patch.object(target=all_in_one, attribute='register_node', new=lambda _, __, ___, ____, _____, ______: None):
+            self.run_test(
+                TestCaseParameters(
+                    args=['provision', 'local', 'all-in-one', '--count', '2', '--provider', Provider.virtualbox],
+                    expected_calls=[
+                        PlaybookRunCallSpecification(playbook_relative_path='provision/vagrant-up'),
+                        PlaybookRunCallSpecification(playbook_relative_path='provision/vagrant-up'),
+                    ],
+                )
+            )
+
+    def test_failed_provisioning_releases_names(self):
+        names = iter(['openshiftdevel', 'openshiftdevel0', 'openshiftdevel1'])
+        provisioned, released = [], []
+
+        def run_playbook(_, playbook_relative_path, playbook_variables=None, option_overrides=None):
+            if provisioned:
+                raise ClickException('Playbook execution failed with code 2')
+            provisioned.extend(host['hostname'] for host in playbook_variables['origin_ci_vagrant_hosts'])
+
+        def release_vagrant_name(_, name):
+            released.append(name)
+            return False
+
+        with patch.object(target=Configuration, attribute='reserve_vagrant_name', new=lambda _: next(names)), \
+                patch.object(target=Configuration, attribute='run_playbook', new=run_playbook), \
+                patch.object(target=Configuration, attribute='release_vagrant_name', new=release_vagrant_name):
+            self.run_test(
+                TestCaseParameters(
+                    args=['provision', 'local', 'all-in-one', '--count', '3', '--provider', Provider.virtualbox],
+                    expected_result=CLICK_RC_EXCEPTION,
+                    expected_output='Released the name openshiftdevel1 after provisioning failed.',
+                )
+            )
+
+        self.assertEqual(provisioned, ['openshiftdevel'])
+        self.assertEqual(released, ['openshiftdevel0', 'openshiftdevel1'])
+
+    def test_failed_provisioning_destroys_created_machines(self):
+        names = iter(['openshiftdevel', 'openshiftdevel0'])
+        released = []
+
+        def run_playbook(_, playbook_relative_path, playbook_variables=None, option_overrides=None):
+            raise ClickException('Playbook execution failed with code 2')
+
+        def release_vagrant_name(_, name):
+            released.append(name)
+            if name == 'openshiftdevel':
+                raise CalledProcessError(1, ['vagrant', 'destroy', '--force'])
+            return True
+
+        with patch.object(target=Configuration, attribute='reserve_vagrant_name', new=lambda _: next(names)), \
+                patch.object(target=Configuration, attribute='run_playbook', new=run_playbook), \
+                patch.object(target=Configuration, attribute='release_vagrant_name', new=release_vagrant_name):
+            self.run_test(
+                TestCaseParameters(
+                    args=['provision', 'local', 'all-in-one', '--count', '2'],
+                    expected_result=CLICK_RC_EXCEPTION,
+                    expected_output='Destroyed the VM for openshiftdevel0 after provisioning failed.',
+                )
+            )
+
+        # a VM we could not destroy does not stop us releasing the others
+        self.assertEqual(released, ['openshiftdevel', 'openshiftdevel0'])
+
+    def test_count_too_many_addresses(self):
+        self.run_test(
+            TestCaseParameters(
+                args=['provision', 'local', 'all-in-one', '--count', '3', '--master-ip', '10.245.2.253'],
+                expected_result=CLICK_RC_USAGE,
+                expected_output='Not enough IP addresses follow 10.245.2.253 to provision 3 VMs.',
+            )
+        )
+
     def test_custom(self):
         os = OperatingSystem.centos
         stage = Stage.bare
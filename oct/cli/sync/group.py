@@ -4,6 +4,7 @@ from __future__ import absolute_import, division, print_function
 from click import group
 
 from .local import local
+from .many import many
 from .remote import remote
 
 _SHORT_HELP = 'Update the state of repositories on the virtual machine.'
@@ -30,4 +31,5 @@ def sync():
 
 
 sync.add_command(local)
+sync.add_command(many)
 sync.add_command(remote)
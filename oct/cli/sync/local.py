@@ -1,7 +1,7 @@
 # coding=utf-8
 from __future__ import absolute_import, division, print_function
 
-from click import command, pass_context
+from click import command, option, pass_context
 
 from .git_options import git_options, git_options_helptext, git_version_specifier, validate_git_specifier
 from .sync_options import sync_options
@@ -16,10 +16,16 @@ _SHORT_HELP = 'Synchronize a repository using local sources.'
     help=_SHORT_HELP + '''
 
 The local Git client can be used to synchronize the repositories
-on remote hosts with local copies by directly pushing to a ref
-over SSH. This command will do so, creating automated commits
-in order to preserve the state of staged and unstaged changes
-in the working tree.
+on remote hosts with local copies by sending them a bundle of
+the objects they are missing. This command will do so, creating
+automated commits in order to preserve the state of staged and
+unstaged changes in the working tree.
+
+The state that each remote repository is left in is cached, so
+that later synchronizations only need to send the changes made
+since then. If the remote repositories are found to be missing
+objects they had then, they are asked what they have and sent a
+new bundle. The cache can be bypassed with `--verify-remote-state'.
 
 Both the sync source directory on the local host and the sync
 destination directory on the remote hosts are optional if the
@@ -43,14 +49,23 @@ Examples:
 \b
   Synchronize the Origin repo, resulting in a merged state of two branches
   $ oct sync local origin --branch=my-feature-branch --merge-into=master
+\b
+  Synchronize the Origin repo, asking the remote hosts what they have
+  $ oct sync local origin --verify-remote-state
 ''',
 )
 @repository_argument
 @sync_options
 @git_options
+@option(
+    '--verify-remote-state',
+    'verify_remote_state',
+    is_flag=True,
+    help='Ask the remote hosts for their state instead of using the cache.',
+)
 @ansible_output_options
 @pass_context
-def local(context, repository, sync_source, sync_destination, tag, refspec, branch, commit, merge_target):
+def local(context, repository, sync_source, sync_destination, tag, refspec, branch, commit, merge_target, verify_remote_state):
     """
     Synchronize a repository on a remote host at the
     sync_destination by pushing the git state of the
@@ -65,6 +80,44 @@ def local(context, repository, sync_source, sync_destination, tag, refspec, bran
     :param branch: branch to synchronize to (or create for refspec)
     :param commit: commit to synchronize to
     :param merge_target: optional second branch to merge the state into
+    :param verify_remote_state: whether or not to bypass the cached remote state
+    """
+    context.obj.run_playbook(
+        playbook_relative_path='sync/local',
+        playbook_variables=local_sync_variables(
+            repository,
+            sync_source,
+            sync_destination,
+            tag,
+            refspec,
+            branch,
+            commit,
+            merge_target,
+            state_directory=context.obj.sync_state_path,
+            verify_remote_state=verify_remote_state,
+        ),
+    )
+
+
+def local_sync_variables(
+        repository, sync_source, sync_destination, tag, refspec, branch, commit, merge_target, state_directory=None,
+        verify_remote_state=False
+):
+    """
+    Validate the options for a local sync and determine the
+    playbook variables that they translate to.
+
+    :param repository: name of the repository to sync
+    :param sync_source: local repository location override
+    :param sync_destination: repository location override
+    :param tag: tag to synchronize to
+    :param refspec: refspec to synchronize to
+    :param branch: branch to synchronize to (or create for refspec)
+    :param commit: commit to synchronize to
+    :param merge_target: optional second branch to merge the state into
+    :param state_directory: where the state of remote repositories is cached
+    :param verify_remote_state: whether or not to bypass the cached remote state
+    :return: variables for the local sync playbook
     """
     validate_git_specifier(refspec, branch, commit, tag)
 
@@ -90,7 +143,10 @@ def local(context, repository, sync_source, sync_destination, tag, refspec, bran
     for key in version_specifier:
         playbook_variables[key] = version_specifier[key]
 
-    context.obj.run_playbook(
-        playbook_relative_path='sync/local',
-        playbook_variables=playbook_variables,
-    )
+    if state_directory:
+        playbook_variables['origin_ci_sync_state_directory'] = state_directory
+
+    if verify_remote_state:
+        playbook_variables['origin_ci_sync_verify_remote_state'] = True
+
+    return playbook_variables
@@ -0,0 +1,222 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from functools import partial
+from os import makedirs
+from os.path import exists, join
+from timeit import default_timer as timer
+
+from click import ClickException, IntRange, Path, UsageError, argument, command, echo, option, pass_context
+from yaml import load
+
+from .local import local_sync_variables
+from .remote import remote_sync_variables
+from ..util.common_options import ansible_output_options
+from ..util.repository_options import Repository
+from ...util.parallel import ParallelJob, run_in_parallel
+
+DEFAULT_WORKERS = 4
+
+_LOCAL_SOURCE = 'local'
+_REMOTE_SOURCE = 'remote'
+
+# keys that entries in the manifest may set, mirroring the
+# options of the `local` and `remote` sync commands
+_MANIFEST_KEYS = [
+    'repository',
+    'source',
+    'src',
+    'dest',
+    'remote',
+    'new_remote',
+    'refspec',
+    'branch',
+    'commit',
+    'tag',
+    'merge_into',
+    'verify_remote_state',
+]
+
+_SHORT_HELP = 'Synchronize many repositories at once.'
+
+
+@command(
+    short_help=_SHORT_HELP,
+    help=_SHORT_HELP + '''
+
+Every repository listed in the manifest is synchronized using
+either local sources or remote servers, with up to a configurable
+number of repositories synchronized at once. The output of each
+synchronization is written to its own log file and the time each
+one took is reported when all have finished.
+
+The manifest is a YAML list of entries. Every entry must name a
+repository and may set any of the following keys, which behave
+like the options of the same name for the `local' and `remote'
+sub-commands:
+
+\b
+  source:     `local' or `remote' [default: remote]
+  src:        local directory from which to sync
+  dest:       remote directory to sync to
+  remote:     named remote server to use
+  new_remote: [name, url] of a remote server to install and use
+  refspec, branch, commit, tag, merge_into
+  verify_remote_state: true to bypass the cache of remote state
+
+\b
+Examples:
+  Synchronize the repositories in a manifest, four at a time
+  $ oct sync many repositories.yml
+\b
+  Synchronize the repositories in a manifest, all at once
+  $ oct sync many repositories.yml --workers=10
+\b
+  An example manifest:
+  ---
+  - repository: origin
+    branch: master
+  - repository: openshift-ansible
+    source: local
+    merge_into: master
+''',
+)
+@argument(
+    'manifest',
+    type=Path(
+        exists=True,
+        dir_okay=False,
+        resolve_path=True,
+    ),
+)
+@option(
+    '--workers',
+    '-w',
+    type=IntRange(min=1),
+    default=DEFAULT_WORKERS,
+    show_default=True,
+    metavar='N',
+    help='Maximum number of repositories to sync at once.',
+)
+@ansible_output_options
+@pass_context
+def many(context, manifest, workers):
+    """
+    Synchronize every repository in the manifest, running
+    at most `workers` synchronizations at once.
+
+    :param context: Click context
+    :param manifest: path to the manifest of repositories
+    :param workers: maximum number of concurrent syncs
+    """
+    configuration = context.obj
+    with open(manifest) as manifest_file:
+        entries = load(manifest_file)
+
+    log_directory = join(configuration.ansible_log_path, 'sync')
+    if not exists(log_directory):
+        makedirs(log_directory)
+
+    # the pretty printer redraws the terminal, which makes
+    # no sense in a log file, so we ask for plain output for
+    # these runs only, leaving the saved configuration alone
+    option_overrides = None
+    if configuration.ansible_client_configuration['verbosity'] < 2:
+        option_overrides = {'verbosity': 2}
+
+    playbooks = manifest_playbooks(entries, configuration.sync_state_path)
+
+    jobs = []
+    for index, (name, playbook_relative_path, playbook_variables) in enumerate(playbooks):
+        jobs.append(
+            ParallelJob(
+                name=name,
+                func=partial(configuration.run_playbook, playbook_relative_path, playbook_variables, option_overrides),
+                log_file=join(log_directory, '{}-{}.log'.format(index, name)),
+            )
+        )
+
+    start_time = timer()
+    results = run_in_parallel(jobs, workers)
+    elapsed_time = timer() - start_time
+
+    for result in results:
+        status = 'SUCCESS' if result.succeeded else 'FAILURE'
+        echo('{} | {} - [{}] {}'.format(status, result.name, result.format_runtime(), result.log_file))
+    echo('Synchronized {} repositories in {:02.0f}:{:06.3f}.'.format(len(results), *divmod(elapsed_time, 60)))
+
+    failures = [result.name for result in results if not result.succeeded]
+    if failures:
+        raise ClickException('Failed to synchronize: {}.'.format(', '.join(failures)))
+
+
+def manifest_playbooks(entries, state_directory=None):
+    """
+    Validate the entries in a manifest and determine the
+    playbook to run and the variables to run it with for
+    each one.
+
+    :param entries: entries loaded from the manifest
+    :param state_directory: where the state of remote repositories is cached
+    :return: list of repository, playbook and variables
+    """
+    if not isinstance(entries, list) or not entries:
+        raise UsageError('The manifest must be a non-empty list of repositories.')
+
+    repositories = [value for key, value in vars(Repository).items() if not key.startswith('_')]
+
+    playbooks = []
+    for entry in entries:
+        if not isinstance(entry, dict) or 'repository' not in entry:
+            raise UsageError('Every entry in the manifest must name a repository.')
+
+        unknown_keys = [key for key in entry if key not in _MANIFEST_KEYS]
+        if unknown_keys:
+            raise UsageError('Unknown keys in manifest entry for {}: {}.'.format(entry['repository'], ', '.join(unknown_keys)))
+
+        repository = entry['repository']
+        if repository not in repositories:
+            raise UsageError('Unknown repository {} in the manifest.'.format(repository))
+
+        new_remote = entry.get('new_remote')
+        if new_remote is not None and (not isinstance(new_remote, list) or len(new_remote) != 2):
+            raise UsageError('The new remote for {} must be given as a name and url.'.format(repository))
+
+        source = entry.get('source', _REMOTE_SOURCE)
+        if source == _LOCAL_SOURCE:
+            playbooks.append((
+                repository,
+                'sync/local',
+                local_sync_variables(
+                    repository=repository,
+                    sync_source=entry.get('src'),
+                    sync_destination=entry.get('dest'),
+                    tag=entry.get('tag'),
+                    refspec=entry.get('refspec'),
+                    branch=entry.get('branch'),
+                    commit=entry.get('commit'),
+                    merge_target=entry.get('merge_into'),
+                    state_directory=state_directory,
+                    verify_remote_state=entry.get('verify_remote_state', False),
+                ),
+            ))
+        elif source == _REMOTE_SOURCE:
+            playbooks.append((
+                repository,
+                'sync/remote',
+                remote_sync_variables(
+                    repository=repository,
+                    sync_destination=entry.get('dest'),
+                    remote_name=entry.get('remote'),
+                    new_remote=new_remote,
+                    tag=entry.get('tag'),
+                    refspec=entry.get('refspec'),
+                    branch=entry.get('branch'),
+                    commit=entry.get('commit'),
+                    merge_target=entry.get('merge_into'),
+                ),
+            ))
+        else:
+            raise UsageError('The source for {} must be `{}` or `{}`.'.format(repository, _LOCAL_SOURCE, _REMOTE_SOURCE))
+
+    return playbooks
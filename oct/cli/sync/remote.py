@@ -85,6 +85,30 @@ def remote(context, repository, sync_destination, remote_name, new_remote, tag,
     :param commit: commit to synchronize to
     :param merge_target: optional second branch to merge the state into
     """
+    context.obj.run_playbook(
+        playbook_relative_path='sync/remote',
+        playbook_variables=remote_sync_variables(
+            repository, sync_destination, remote_name, new_remote, tag, refspec, branch, commit, merge_target
+        ),
+    )
+
+
+def remote_sync_variables(repository, sync_destination, remote_name, new_remote, tag, refspec, branch, commit, merge_target):
+    """
+    Validate the options for a remote sync and determine the
+    playbook variables that they translate to.
+
+    :param repository: name of the repository to sync
+    :param sync_destination: repository location override
+    :param remote_name: name of a remote server to sync from
+    :param new_remote: name and url of a new remote server to add and sync from
+    :param tag: tag to synchronize to
+    :param refspec: refspec to synchronize to
+    :param branch: branch to synchronize to (or create for refspec)
+    :param commit: commit to synchronize to
+    :param merge_target: optional second branch to merge the state into
+    :return: variables for the remote sync playbook
+    """
     validate_git_specifier(refspec, branch, commit, tag)
     validate_repository(repository)
     validate_remote(remote_name, new_remote)
@@ -117,10 +141,7 @@ def remote(context, repository, sync_destination, remote_name, new_remote, tag,
     else:
         playbook_variables['origin_ci_sync_remote'] = remote_name
 
-    context.obj.run_playbook(
-        playbook_relative_path='sync/remote',
-        playbook_variables=playbook_variables,
-    )
+    return playbook_variables
 
 
 def validate_repository(repository):
@@ -0,0 +1,131 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+import sys
+from os.path import abspath, dirname, join
+from shutil import rmtree
+from subprocess import PIPE, Popen
+from tempfile import mkdtemp
+from unittest import TestCase
+
+# Ansible modules are not part of a package, so we
+# import them from the library directory directly
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', '..', '..', 'ansible', 'oct', 'library'))
+from git_bundle import Git, common_objects, determine_bundle_arguments  # noqa: E402
+
+
+class FakeModule(object):
+    """
+    Runs commands the way AnsibleModule does.
+    """
+
+    def run_command(self, args, cwd=None, data=None):
+        process = Popen(args, cwd=cwd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        stdout, stderr = process.communicate(data.encode('utf-8') + b'\n' if data is not None else None)
+        return process.returncode, stdout.decode('utf-8'), stderr.decode('utf-8')
+
+    def fail_json(self, **kwargs):
+        raise AssertionError(kwargs['msg'])
+
+
+class CommonObjectsTestCase(TestCase):
+    def test_no_hosts(self):
+        self.assertEqual(common_objects([]), set())
+
+    def test_objects_every_host_knows(self):
+        self.assertEqual(common_objects([['a', 'b', 'c'], ['b', 'c'], ['c', 'b', 'd']]), {'b', 'c'})
+
+    def test_host_that_knows_nothing(self):
+        self.assertEqual(common_objects([['a', 'b'], []]), set())
+
+
+class DetermineBundleArgumentsTestCase(TestCase):
+    def setUp(self):
+        self.repo = mkdtemp()
+        self.addCleanup(rmtree, self.repo)
+        self.git = Git(FakeModule(), 'git', self.repo)
+
+        self.git.run('init', '--quiet')
+        self.git.run('config', 'user.name', 'test')
+        self.git.run('config', 'user.email', 'test@example.com')
+        self.first = self.commit('first')
+        self.git.run('tag', '--annotate', '--message=v1', 'v1')
+        self.tag = self.git.run('rev-parse', 'refs/tags/v1').strip()
+        self.second = self.commit('second')
+
+    def commit(self, message):
+        self.git.run('commit', '--allow-empty', '--message', message)
+        return self.git.run('rev-parse', 'HEAD').strip()
+
+    def bundle_arguments(self, known_refs):
+        ref = self.git.run('rev-parse', '--symbolic-full-name', 'HEAD').strip()
+        local_refs = self.git.refs(ref)
+        prerequisites = self.git.existing_objects(common_objects(known_refs))
+        return ref, local_refs, determine_bundle_arguments(self.git, ref, local_refs, prerequisites)
+
+    def bundled_commits(self, arguments):
+        """
+        Create a bundle with the arguments.
+
+        :param arguments: arguments for `git bundle create`
+        :return: commits the bundle requires, commits it carries
+        """
+        bundle = join(self.repo, 'bundle')
+        self.git.run('bundle', 'create', bundle, *arguments)
+
+        # the bundle header lists the commits it requires,
+        # each prefixed by a dash, until the first blank line
+        required = []
+        with open(bundle, 'rb') as bundle_file:
+            for line in iter(bundle_file.readline, b'\n'):
+                if line.startswith(b'-'):
+                    required.append(line[1:].split()[0].decode('utf-8'))
+
+        return required, self.git.run('rev-list', *arguments).split()
+
+    def test_no_known_refs(self):
+        ref, local_refs, arguments = self.bundle_arguments([])
+
+        self.assertEqual(arguments, [ref, local_refs[ref][0], '--tags'])
+        required, commits = self.bundled_commits(arguments)
+        self.assertEqual(required, [])
+        self.assertEqual(commits, [self.second, self.first])
+
+    def test_known_ancestors(self):
+        ref, local_refs, arguments = self.bundle_arguments([[self.first], [self.first, 'f' * 40]])
+
+        self.assertEqual(arguments, [ref, local_refs[ref][0], '--tags', '^{}'.format(self.first)])
+        required, commits = self.bundled_commits(arguments)
+        self.assertEqual(required, [self.first])
+        self.assertEqual(commits, [self.second])
+
+    def test_requested_ref_already_known(self):
+        _, _, arguments = self.bundle_arguments([[self.second, self.tag]])
+
+        self.assertEqual(arguments, [])
+
+    def test_new_tag_on_known_commit(self):
+        self.git.run('tag', '--annotate', '--message=v2', 'v2')
+        _, _, arguments = self.bundle_arguments([[self.second, self.tag]])
+
+        self.assertEqual(arguments, ['refs/tags/v2', '^{}^@'.format(self.second)])
+
+    def test_recorded_refs(self):
+        ref = self.git.run('rev-parse', '--symbolic-full-name', 'HEAD').strip()
+        # changes committed only to be bundled are reset
+        # before the bundle is rebuilt from recorded refs
+        committed = self.commit('changes')
+        refs_path = join(self.repo, 'refs')
+        with open(refs_path, 'w') as refs_file:
+            for name, (sha, _) in sorted(self.git.refs(ref).items()):
+                refs_file.write('{} {}\n'.format(sha, name))
+        self.git.run('reset', '--quiet', '--soft', 'HEAD^')
+
+        local_refs = self.git.recorded_refs(refs_path)
+        self.assertEqual(local_refs[ref], (committed, 'commit'))
+        self.assertEqual(local_refs['refs/tags/v1'][1], 'tag')
+
+        arguments = determine_bundle_arguments(self.git, ref, local_refs, {self.second})
+        required, commits = self.bundled_commits(arguments)
+        self.assertEqual(required, [self.second])
+        self.assertEqual(commits, [committed])
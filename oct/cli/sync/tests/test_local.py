@@ -126,3 +126,32 @@ class SyncLocalTestCase(PlaybookRunnerTestCase):
                 ],
             )
         )
+
+    def test_cached_remote_state(self):
+        self.run_test(
+            TestCaseParameters(
+                args=['sync', 'local', Repository.origin],
+                expected_calls=[
+                    PlaybookRunCallSpecification(
+                        playbook_relative_path='sync/local', playbook_variables={'origin_ci_sync_repository': Repository.origin},
+                        unexpected_playbook_variables={'origin_ci_sync_verify_remote_state': True}
+                    )
+                ],
+            )
+        )
+
+    def test_verify_remote_state(self):
+        self.run_test(
+            TestCaseParameters(
+                args=['sync', 'local', Repository.origin, '--verify-remote-state'],
+                expected_calls=[
+                    PlaybookRunCallSpecification(
+                        playbook_relative_path='sync/local', playbook_variables={
+                            'origin_ci_sync_repository': Repository.origin,
+                            'origin_ci_sync_version': 'master',
+                            'origin_ci_sync_verify_remote_state': True
+                        }
+                    )
+                ],
+            )
+        )
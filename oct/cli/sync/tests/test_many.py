@@ -0,0 +1,185 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from click import UsageError
+from mock import patch
+from oct.cli.sync.many import manifest_playbooks
+from oct.cli.util.repository_options import Repository
+from oct.tests.unit.playbook_runner_test_case import PlaybookRunCallSpecification, PlaybookRunnerTestCase, \
+    TestCaseParameters
+from oct.util.parallel import ParallelJobResult
+
+
+class ManifestPlaybooksTestCase(TestCase):
+    def test_remote_default(self):
+        self.assertEqual(
+            manifest_playbooks([{
+                'repository': Repository.origin
+            }]),
+            [(
+                Repository.origin,
+                'sync/remote',
+                {
+                    'origin_ci_sync_repository': Repository.origin,
+                    'origin_ci_sync_version': 'master',
+                    'origin_ci_sync_remote': 'origin',
+                },
+            )],
+        )
+
+    def test_local(self):
+        self.assertEqual(
+            manifest_playbooks([{
+                'repository': Repository.origin,
+                'source': 'local',
+                'tag': 'v1.0.0',
+                'dest': '/some/path'
+            }]),
+            [(
+                Repository.origin,
+                'sync/local',
+                {
+                    'origin_ci_sync_repository': Repository.origin,
+                    'origin_ci_sync_version': 'v1.0.0',
+                    'origin_ci_sync_destination': '/some/path',
+                },
+            )],
+        )
+
+    def test_new_remote(self):
+        self.assertEqual(
+            manifest_playbooks([{
+                'repository': Repository.logging,
+                'new_remote': ['fork', 'https://host/logging.git']
+            }]),
+            [(
+                Repository.logging,
+                'sync/remote',
+                {
+                    'origin_ci_sync_repository': Repository.logging,
+                    'origin_ci_sync_version': 'master',
+                    'origin_ci_sync_remote': 'fork',
+                    'origin_ci_sync_address': 'https://host/logging.git',
+                },
+            )],
+        )
+
+    def test_local_state(self):
+        self.assertEqual(
+            manifest_playbooks(
+                [{
+                    'repository': Repository.origin,
+                    'source': 'local',
+                    'verify_remote_state': True
+                }],
+                state_directory='/some/state',
+            ),
+            [(
+                Repository.origin,
+                'sync/local',
+                {
+                    'origin_ci_sync_repository': Repository.origin,
+                    'origin_ci_sync_version': 'master',
+                    'origin_ci_sync_state_directory': '/some/state',
+                    'origin_ci_sync_verify_remote_state': True,
+                },
+            )],
+        )
+
+    def test_many(self):
+        playbooks = manifest_playbooks([
+            {
+                'repository': Repository.origin
+            },
+            {
+                'repository': Repository.openshift_ansible,
+                'source': 'local'
+            },
+        ])
+        self.assertEqual([playbook[:2] for playbook in playbooks], [
+            (Repository.origin, 'sync/remote'),
+            (Repository.openshift_ansible, 'sync/local'),
+        ])
+
+    def test_empty(self):
+        with self.assertRaisesRegexp(UsageError, 'must be a non-empty list'):
+            manifest_playbooks([])
+
+    def test_no_repository(self):
+        with self.assertRaisesRegexp(UsageError, 'must name a repository'):
+            manifest_playbooks([{'branch': 'master'}])
+
+    def test_unknown_repository(self):
+        with self.assertRaisesRegexp(UsageError, 'Unknown repository'):
+            manifest_playbooks([{'repository': 'notarepo'}])
+
+    def test_unknown_key(self):
+        with self.assertRaisesRegexp(UsageError, 'Unknown keys'):
+            manifest_playbooks([{'repository': Repository.origin, 'branches': 'master'}])
+
+    def test_unknown_source(self):
+        with self.assertRaisesRegexp(UsageError, 'must be `local` or `remote`'):
+            manifest_playbooks([{'repository': Repository.origin, 'source': 'elsewhere'}])
+
+    def test_invalid_specifier(self):
+        with self.assertRaisesRegexp(UsageError, 'neither a refspec, branch, or tag'):
+            manifest_playbooks([{'repository': Repository.origin, 'commit': 'SHA', 'branch': 'master'}])
+
+    def test_private_repository_from_remote(self):
+        with self.assertRaisesRegexp(UsageError, 'not supported'):
+            manifest_playbooks([{'repository': Repository.enterprise}])
+
+
+class ManyTestCase(PlaybookRunnerTestCase):
+    def setUp(self):
+        super(ManyTestCase, self).setUp()
+        self.directory = mkdtemp()
+        self.addCleanup(rmtree, self.directory)
+
+        patcher = patch.dict('os.environ', {'OCT_CONFIG_HOME': self.directory})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # run the jobs in this process so the mocked
+        # playbook runs are recorded
+        self.verbosities = []
+        patcher = patch('oct.cli.sync.many.run_in_parallel', new=self.run_jobs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.manifest = join(self.directory, 'manifest.yml')
+        with open(self.manifest, 'w') as manifest_file:
+            manifest_file.write('- repository: origin\n- repository: origin-aggregated-logging\n')
+
+    def run_jobs(self, jobs, _):
+        results = []
+        for job in jobs:
+            job.func()
+            configuration = job.func.func.__self__
+            self.verbosities.append(configuration.ansible_client_configuration['verbosity'])
+            results.append(ParallelJobResult(job.name, True, 0, job.log_file))
+        return results
+
+    def test_plain_output_is_not_saved(self):
+        self.run_test(
+            TestCaseParameters(
+                args=['sync', 'many', self.manifest],
+                expected_calls=[
+                    PlaybookRunCallSpecification(
+                        playbook_relative_path='sync/remote',
+                        option_overrides={'verbosity': 2},
+                    ),
+                    PlaybookRunCallSpecification(
+                        playbook_relative_path='sync/remote',
+                        option_overrides={'verbosity': 2},
+                    ),
+                ],
+                expected_output='Synchronized 2 repositories',
+            )
+        )
+        self.assertEqual(self.verbosities, [1, 1])
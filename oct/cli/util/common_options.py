@@ -1,6 +1,8 @@
 # coding=utf-8
 from __future__ import absolute_import, division, print_function
 
+from os import environ
+
 from ansible import constants
 from click import option
 
@@ -16,6 +18,7 @@ def ansible_output_options(func):
         ansible_verbosity_option,
         ansible_dry_run_option,
         ansible_debug_mode_option,
+        ansible_profile_option,
     ]
 
     for output_option in reversed(output_options):
@@ -124,3 +127,37 @@ def ansible_debug_mode_option(func):
         callback=update_ansible_debug_mode,
         is_eager=True,
     )(func)
+
+
+def update_ansible_profile(context, _, value):
+    """
+    Record the time every task takes for later analysis.
+
+    :param context: Click context
+    :param _: command-line parameter
+    :param value: whether or not to profile the run
+    """
+    if not value or context.resilient_parsing:
+        return
+
+    # the profiling callback is configured through the
+    # environment, which is forwarded to the daemon, so
+    # this does not persist past this CLI call
+    environ['ANSIBLE_PROFILE_DIR'] = context.obj.ansible_profile_path
+
+
+def ansible_profile_option(func):
+    """
+    Add the Ansible profiling option to the decorated command func.
+
+    :param func: Click CLI command to decorate
+    :return: decorated CLI command
+    """
+    return option(
+        '--profile',
+        is_flag=True,
+        expose_value=False,
+        help='Record the time every task takes. See `oct profile report`.',
+        callback=update_ansible_profile,
+        is_eager=True,
+    )(func)
@@ -1,7 +1,7 @@
 # coding=utf-8
 from __future__ import absolute_import, division, print_function
 
-from click import Path, argument, option
+from click import IntRange, Path, argument, option
 
 
 def make_options(func):
@@ -15,6 +15,8 @@ def make_options(func):
         make_target_argument,
         make_parameter_option,
         make_directory_override_option,
+        make_parallelism_option,
+        make_dependency_option,
     ]
 
     for make_option in reversed(makefile_options):
@@ -70,3 +72,39 @@ def make_directory_override_option(func):
         ),
         help='Remote directory to run make in. Optional.',
     )(func)
+
+
+def make_parallelism_option(func):
+    """
+    Add the make parallelism option to the decorated command func.
+
+    :param func: Click CLI command to decorate
+    :return: decorated CLI command
+    """
+    return option(
+        '--parallel',
+        '-p',
+        'parallelism',
+        type=IntRange(min=1),
+        default=1,
+        show_default=True,
+        metavar='N',
+        help='Maximum number of targets to run at once.',
+    )(func)
+
+
+def make_dependency_option(func):
+    """
+    Add the make dependency option to the decorated command func.
+
+    :param func: Click CLI command to decorate
+    :return: decorated CLI command
+    """
+    return option(
+        '--dependency',
+        '-D',
+        'dependencies',
+        metavar='TARGET=PREREQUISITE',
+        multiple=True,
+        help='Target that must succeed before another may start.',
+    )(func)
@@ -2,7 +2,6 @@
 from __future__ import absolute_import, division, print_function
 
 from functools import partial
-from time import sleep
 from os import environ, mkdir, makedirs
 from os.path import abspath, dirname, exists, join
 
@@ -17,6 +16,8 @@ from ansible.plugins import callback_loader
 from ansible.vars import VariableManager
 from click import ClickException
 
+from ..util.log_index import new_run_id
+
 DEFAULT_VERBOSITY = 1
 
 
@@ -118,12 +119,27 @@ class AnsibleCoreClient(object):
 
         return playbook_cli.options
 
-    def run_playbook(self, playbook_file, playbook_variables=None, option_overrides=None):
+    def run_playbook(
+            self,
+            playbook_file,
+            playbook_variables=None,
+            option_overrides=None,
+            data_loader=None,
+            variable_manager=None,
+            inventory=None,
+    ):
         """
         Run a playbook from file with the variables provided.
+        A data loader, variable manager and inventory that have
+        already been loaded may be passed in to be re-used, as
+        the daemon does; otherwise, fresh ones will be created.
 
         :param playbook_file: the location of the playbook
         :param playbook_variables: extra variables for the playbook
+        :param option_overrides: overrides for the Ansible CLI options
+        :param data_loader: optional pre-loaded DataLoader
+        :param variable_manager: optional VariableManager for the inventory
+        :param inventory: optional pre-loaded Inventory
         """
         # on the first run, the playbook that initializes the
         # inventory will not have yet run, so we should ensure
@@ -132,19 +148,28 @@ class AnsibleCoreClient(object):
         if not exists(self.host_list):
             makedirs(self.host_list)
 
-        variable_manager = VariableManager()
-        data_loader = DataLoader()
-        inventory = Inventory(
-            loader=data_loader,
-            variable_manager=variable_manager,
-            host_list=self.host_list,
-        )
-        variable_manager.set_inventory(inventory)
+        if data_loader is None:
+            data_loader = DataLoader()
+
+        if variable_manager is None or inventory is None:
+            variable_manager = VariableManager()
+            inventory = Inventory(
+                loader=data_loader,
+                variable_manager=variable_manager,
+                host_list=self.host_list,
+            )
+            variable_manager.set_inventory(inventory)
         variable_manager.extra_vars = playbook_variables
 
         # until Ansible's display logic is less hack-ey we need
         # to mutate their global in __main__
         options = self.generate_playbook_options(playbook_file)
+        # overrides are applied before the options are used, so
+        # that overriding the verbosity also picks the output
+        if option_overrides:
+            for key in option_overrides:
+                if hasattr(options, key):
+                    setattr(options, key, option_overrides[key])
         display.verbosity = options.verbosity
 
         # we want to log everything so we can parse output
@@ -153,7 +178,12 @@ class AnsibleCoreClient(object):
         from ..oct import __file__ as root_dir
         callback_loader.add_directory(join(dirname(root_dir), 'ansible', 'oct', 'callback_plugins'))
         constants.DEFAULT_CALLBACK_WHITELIST = ['log_results', 'generate_junit']
+        if 'ANSIBLE_PROFILE_DIR' in environ:
+            # the user has asked for the time every task
+            # takes to be recorded for later analysis
+            constants.DEFAULT_CALLBACK_WHITELIST.append('record_profile')
         environ['ANSIBLE_LOG_ROOT_PATH'] = self.log_directory
+        environ['ANSIBLE_RUN_ID'] = new_run_id()
 
         if options.verbosity == 1:
             # if the user has not asked for verbose output
@@ -173,21 +203,36 @@ class AnsibleCoreClient(object):
             # plugin, anyway
             constants.DEFAULT_STDOUT_CALLBACK = 'default_with_output_lists'
 
-        if option_overrides:
-            for key in option_overrides:
-                if hasattr(options, key):
-                    setattr(options, key, option_overrides[key])
-
-        result = PlaybookExecutor(
+        executor = PlaybookExecutor(
             playbooks=[playbook_file],
             inventory=inventory,
             variable_manager=variable_manager,
             loader=data_loader,
             options=options,
             passwords=None,
-        ).run()
+        )
+        try:
+            result = executor.run()
+        finally:
+            # the stdout callback may still be writing out
+            # the progress of the run, which must be done
+            # before we print anything else or exit
+            shutdown_stdout_callback(executor)
 
         if result != TaskQueueManager.RUN_OK:
-            # TODO: this seems bad, but can we discover the thread here to join() it?
-            sleep(0.2)
             raise ClickException('Playbook execution failed with code ' + str(result))
+
+
+def shutdown_stdout_callback(executor):
+    """
+    Wait for the stdout callback used by a playbook run to
+    finish writing, if it writes in the background.
+
+    :param executor: PlaybookExecutor that ran the playbook
+    """
+    # the executor does not expose the callbacks it used,
+    # but the task queue manager holds on to them after
+    # the run; it may not exist if the run failed early
+    stdout_callback = getattr(executor._tqm, '_stdout_callback', None)
+    if hasattr(stdout_callback, 'shutdown'):
+        stdout_callback.shutdown()
@@ -0,0 +1,402 @@
+# coding=utf-8
+"""
+A long-lived server that keeps the Ansible core warm between
+CLI invocations, and the client used to submit playbooks to it.
+"""
+from __future__ import absolute_import, division, print_function
+
+from errno import ECONNREFUSED, ENOENT
+from json import dumps, loads
+from logging import shutdown as shutdown_logging
+from os import _exit, close, devnull, dup2, environ, fork, listdir, open as open_fd, O_RDWR, remove, stat, walk
+from os.path import exists, join
+from signal import SIGCHLD, SIG_DFL, SIG_IGN, signal
+from socket import AF_UNIX, SOCK_STREAM, error as socket_error, socket
+from sys import stderr, stdout
+
+from ansible.errors import AnsibleError
+from ansible.inventory import Inventory
+from ansible.parsing.dataloader import DataLoader
+from ansible.vars import VariableManager
+from backports.shutil_get_terminal_size import get_terminal_size
+from click import ClickException
+
+from ..config.ansible_client import AnsibleCoreClient
+
+# the daemon streams all output from a playbook run to
+# the client over the same connection, so the final result
+# is delimited with a sequence that Ansible will not write
+_RESULT_MARKER = b'\x00OCT-DAEMON-RESULT\x00'
+
+# environment variables that the callback plugins consult
+# and that therefore must follow the client into the worker
+_FORWARDED_ENVIRONMENT_PREFIXES = ('ANSIBLE_', 'OCT_')
+
+_BUFFER_SIZE = 4096
+
+
+def daemon_available(socket_path):
+    """
+    Determine if a daemon is listening on the socket.
+
+    :param socket_path: path to the daemon's Unix socket
+    :return: whether or not a daemon is accepting requests
+    """
+    if not exists(socket_path):
+        return False
+
+    connection = socket(AF_UNIX, SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except socket_error as e:
+        if e.errno not in [ECONNREFUSED, ENOENT]:
+            raise
+        return False
+    finally:
+        connection.close()
+
+    return True
+
+
+def submit_playbook(socket_path, client_configuration, playbook_file, playbook_variables=None, option_overrides=None):
+    """
+    Run a playbook in the daemon instead of in this process,
+    relaying the output of the run to our std{out,err} as it
+    is produced.
+
+    :param socket_path: path to the daemon's Unix socket
+    :param client_configuration: AnsibleCoreClient to run the playbook with
+    :param playbook_file: the location of the playbook
+    :param playbook_variables: extra variables for the playbook
+    :param option_overrides: overrides for the Ansible CLI options
+    """
+    client = dict((key, client_configuration[key]) for key in client_configuration)
+    environment = dict((key, environ[key]) for key in environ if key.startswith(_FORWARDED_ENVIRONMENT_PREFIXES))
+    request = {
+        'command': 'run_playbook',
+        'client': client,
+        'playbook_file': playbook_file,
+        'playbook_variables': playbook_variables,
+        'option_overrides': option_overrides,
+        'environment': environment,
+        'columns': get_terminal_size().columns,
+        'lines': get_terminal_size().lines,
+    }
+
+    response = send_request(socket_path, request)
+    if 'error' in response:
+        raise ClickException(response['error'])
+
+
+def stop_daemon(socket_path):
+    """
+    Ask the daemon listening on the socket to shut down.
+
+    :param socket_path: path to the daemon's Unix socket
+    """
+    send_request(socket_path, {'command': 'stop'})
+
+
+def send_request(socket_path, request):
+    """
+    Send a request to the daemon and wait for its result.
+
+    :param socket_path: path to the daemon's Unix socket
+    :param request: request to serialize and send
+    :return: the response from the daemon
+    """
+    connection = socket(AF_UNIX, SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+        connection.sendall(dumps(request).encode('utf-8') + b'\n')
+        return relay_output(connection, getattr(stdout, 'buffer', stdout))
+    finally:
+        connection.close()
+
+
+def relay_output(connection, output):
+    """
+    Copy everything the daemon sends to the output until the
+    result marker is seen, then decode the result after it.
+    As the marker may be split between reads, we hold back
+    enough of the tail of the buffer to recognize it.
+
+    :param connection: connected socket to read from
+    :param output: binary stream to write output to
+    :return: the decoded result
+    """
+    buffered = b''
+    while True:
+        chunk = connection.recv(_BUFFER_SIZE)
+        if not chunk:
+            raise ClickException('The daemon closed the connection without reporting a result.')
+
+        buffered += chunk
+        marker_index = buffered.find(_RESULT_MARKER)
+        if marker_index != -1:
+            output.write(buffered[:marker_index])
+            output.flush()
+            return loads(read_line(connection, buffered[marker_index + len(_RESULT_MARKER):]).decode('utf-8'))
+
+        safe_length = len(buffered) - len(_RESULT_MARKER) + 1
+        if safe_length > 0:
+            output.write(buffered[:safe_length])
+            output.flush()
+            buffered = buffered[safe_length:]
+
+
+def read_line(connection, buffered=b''):
+    """
+    Read from the connection until a newline or the end
+    of the stream is reached.
+
+    :param connection: connected socket to read from
+    :param buffered: data that has already been read
+    :return: the line, without the trailing newline
+    """
+    while b'\n' not in buffered:
+        chunk = connection.recv(_BUFFER_SIZE)
+        if not chunk:
+            break
+        buffered += chunk
+
+    return buffered.split(b'\n', 1)[0]
+
+
+class AnsibleDaemon(object):
+    """
+    A server that holds on to the expensive parts of an
+    Ansible playbook run -- the imported Ansible core, the
+    data loader with its cache of parsed YAML, and the loaded
+    inventory -- and forks a worker for each request so that
+    the worker starts out warm but every run gets a clean copy
+    of the Ansible global state.
+    """
+
+    def __init__(self, socket_path, playbook_directories, vagrant_directory_root):
+        # where we listen for requests
+        self.socket_path = socket_path
+        # directories of playbooks and roles to pre-parse
+        self.playbook_directories = playbook_directories
+        # the Vagrant dynamic inventory reads VM metadata
+        # from here, so changes here invalidate inventories
+        self.vagrant_directory_root = vagrant_directory_root
+
+        self._data_loader = DataLoader()
+        # inventories keyed by their directory, with the
+        # signature of the directory when they were loaded
+        self._inventories = {}
+
+    def warm(self):
+        """
+        Parse all of the YAML under the playbook directories
+        so that the data loader can serve it from its cache.
+        """
+        for playbook_directory in self.playbook_directories:
+            for directory, _, files in walk(playbook_directory):
+                for file_name in files:
+                    if not file_name.endswith(('.yml', '.yaml')):
+                        continue
+
+                    try:
+                        self._data_loader.load_from_file(join(directory, file_name))
+                    except AnsibleError:
+                        # not every YAML file in a role is valid
+                        # on its own; those that are not will be
+                        # parsed by the worker when needed
+                        pass
+
+    def inventory_for(self, host_list):
+        """
+        Fetch a loaded inventory for the directory, re-loading
+        it if any of the files in the directory have changed
+        since we last loaded it.
+
+        :param host_list: location of the inventory directory
+        :return: the variable manager and inventory
+        """
+        signature = inventory_signature(host_list, self.vagrant_directory_root)
+        if host_list in self._inventories and self._inventories[host_list][0] == signature:
+            return self._inventories[host_list][1:]
+
+        variable_manager = VariableManager()
+        inventory = Inventory(
+            loader=self._data_loader,
+            variable_manager=variable_manager,
+            host_list=host_list,
+        )
+        variable_manager.set_inventory(inventory)
+
+        self._inventories[host_list] = (signature, variable_manager, inventory)
+        return variable_manager, inventory
+
+    def serve_forever(self):
+        """
+        Listen for requests until we are asked to stop.
+        """
+        # workers are never waited on, so ask the kernel to
+        # reap them for us instead of leaving zombies behind
+        signal(SIGCHLD, SIG_IGN)
+
+        server = socket(AF_UNIX, SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen(5)
+        try:
+            while True:
+                connection, _ = server.accept()
+                try:
+                    raw_request = read_line(connection)
+                    if not raw_request:
+                        # clients probe for the daemon by connecting
+                        # and hanging up without sending anything
+                        connection.close()
+                        continue
+
+                    request = loads(raw_request.decode('utf-8'))
+                    if request['command'] == 'stop':
+                        respond(connection, {})
+                        connection.close()
+                        return
+
+                    self.dispatch(server, connection, request)
+                except Exception as e:
+                    # one bad request or inventory must not take
+                    # the daemon down for every other client
+                    reject(connection, 'The daemon could not handle the request: {}'.format(e))
+        finally:
+            server.close()
+            remove(self.socket_path)
+
+    def dispatch(self, server, connection, request):
+        """
+        Fork a worker to run the playbook in the request.
+
+        :param server: listening socket, which the worker must not hold
+        :param connection: connection to the requesting client
+        :param request: decoded request
+        """
+        client = AnsibleCoreClient(inventory_dir=request['client']['host_list'])
+        for key in request['client']:
+            client[key] = request['client'][key]
+
+        variable_manager, inventory = None, None
+        if exists(client.host_list):
+            variable_manager, inventory = self.inventory_for(client.host_list)
+
+        if fork() != 0:
+            connection.close()
+            return
+
+        # whatever happens, the worker must never return into
+        # the server loop, which would close and remove the
+        # socket of the daemon that is still serving, nor run
+        # the `atexit` handlers that the parent registered, or
+        # it would write the parent's configuration out from
+        # under it
+        status = 1
+        try:
+            self.work(server, connection, client, request, variable_manager, inventory)
+            status = 0
+        finally:
+            _exit(status)
+
+    def work(self, server, connection, client, request, variable_manager, inventory):
+        """
+        Run the playbook in a request in a forked worker and
+        report the result to the client.
+
+        :param server: listening socket, which the worker must not hold
+        :param connection: connection to the requesting client
+        :param client: AnsibleCoreClient configured for the request
+        :param request: decoded request
+        :param variable_manager: warm variable manager for the inventory, if any
+        :param inventory: warm inventory, if any
+        """
+        # Ansible needs to wait on the processes it forks
+        signal(SIGCHLD, SIG_DFL)
+        server.close()
+        environ.update(request['environment'])
+        environ['COLUMNS'] = str(request['columns'])
+        environ['LINES'] = str(request['lines'])
+
+        # everything Ansible and our callbacks write should
+        # go to the client, including output from the worker
+        # processes that Ansible will fork in turn
+        null_fd = open_fd(devnull, O_RDWR)
+        dup2(null_fd, 0)
+        close(null_fd)
+        dup2(connection.fileno(), 1)
+        dup2(connection.fileno(), 2)
+
+        response = {}
+        try:
+            client.run_playbook(
+                playbook_file=request['playbook_file'],
+                playbook_variables=request['playbook_variables'],
+                option_overrides=request['option_overrides'],
+                data_loader=self._data_loader,
+                variable_manager=variable_manager,
+                inventory=inventory,
+            )
+        except ClickException as e:
+            response['error'] = e.format_message()
+        except SystemExit as e:
+            response['error'] = 'Playbook execution exited in the daemon with status {}.'.format(e.code)
+        except Exception as e:
+            response['error'] = 'Playbook execution failed in the daemon: {}'.format(e)
+
+        # the callbacks may still be writing logs in the
+        # background, which we must wait for before exiting
+        shutdown_logging()
+        stdout.flush()
+        stderr.flush()
+        respond(connection, response)
+
+
+def respond(connection, response):
+    """
+    Send the result of a request to the client.
+
+    :param connection: connection to the requesting client
+    :param response: result to serialize and send
+    """
+    connection.sendall(_RESULT_MARKER + dumps(response).encode('utf-8') + b'\n')
+
+
+def reject(connection, message):
+    """
+    Report an error to a client whose request could not be
+    handled, if it is still listening, and hang up.
+
+    :param connection: connection to the requesting client
+    :param message: description of the error
+    """
+    try:
+        respond(connection, {'error': message})
+    except socket_error:
+        pass
+    finally:
+        connection.close()
+
+
+def inventory_signature(host_list, vagrant_directory_root):
+    """
+    Determine a signature for the inventory directory
+    that changes when any of the files in it change or
+    when any of the Vagrant VM metadata that the dynamic
+    inventory reads changes.
+
+    :param host_list: location of the inventory directory
+    :param vagrant_directory_root: location of the Vagrant VM directories
+    :return: the signature
+    """
+    paths = []
+    for directory, _, files in walk(host_list):
+        paths.extend(join(directory, file_name) for file_name in files)
+
+    if exists(vagrant_directory_root):
+        for content in listdir(vagrant_directory_root):
+            for metadata_file in ['variables.yml', 'groups.yml']:
+                paths.append(join(vagrant_directory_root, content, metadata_file))
+
+    return sorted((path, stat(path).st_mtime) for path in paths if exists(path))
@@ -2,16 +2,28 @@
 from __future__ import absolute_import, division, print_function
 
 from atexit import register
-from errno import EEXIST
-
-from os import getenv, listdir, makedirs
+from contextlib import contextmanager
+from copy import deepcopy
+from errno import EEXIST, ENOENT
+from fcntl import LOCK_EX, flock
+from itertools import count
+from os import getenv, listdir, makedirs, mkdir, rename, stat
 from os.path import abspath, dirname, exists, expanduser, isdir, join
+from shutil import rmtree
+from uuid import uuid4
+
 from yaml import dump, load
 
+try:
+    from cPickle import HIGHEST_PROTOCOL, dump as dump_pickle, load as load_pickle  # for python 2
+except ImportError:
+    from pickle import HIGHEST_PROTOCOL, dump as dump_pickle, load as load_pickle  # for python 3
+
 from ..config.ansible_client import AnsibleCoreClient
+from ..config.ansible_daemon import daemon_available, submit_playbook
 from ..config.aws_client import AWSClientConfiguration
 from ..config.aws_variables import AWSVariables
-from ..config.vagrant import VagrantVMMetadata
+from ..config.vagrant import VagrantVMMetadata, destroy_vagrant_machines, vagrant_machines_created
 from ..config.variables import PlaybookExtraVariables
 from ..util.playbook import playbook_path
 
@@ -25,6 +37,13 @@ _VAGRANT_BOX_DIRECTORY = 'boxes'
 _LOG_DIRECTORY = 'logs'
 _AWS_CLIENT_CONFIGURATION_FILE = 'aws_client_configuration.yml'
 _AWS_VARIABLES_FILE = 'aws_variables.yml'
+_DAEMON_SOCKET_FILE = 'daemon.sock'
+_SYNC_STATE_DIRECTORY = 'sync'
+_PROFILE_DIRECTORY = 'profiles'
+# parsed configuration objects, keyed by the file they
+# were parsed from, so we only parse YAML when it changes
+_CONFIGURATION_CACHE_FILE = 'configuration.cache'
+_CONFIGURATION_LOCK_FILE = 'configuration.lock'
 
 
 def load_configuration(path, default_func):
@@ -33,30 +52,88 @@ def load_configuration(path, default_func):
     a path and falling back to creating a default instance. This
     function will furthermore register a serialization of the
     object on process exit, ensuring we always leave the file-
-    system with the most up-to-date version of the data.
+    system with the most up-to-date version of the data. Only
+    the fields that this process changes are written back, so
+    concurrent invocations do not undo each other's changes.
 
     :param path: path to attempt to load from
     :param default_func: function to create a default instance
     :return: the loaded or defaulted instance of the class
     """
-    if not exists(path):
+    file_key = configuration_file_key(path)
+    if file_key is None:
         loaded_object = default_func()
     else:
-        with open(path) as configuration_file:
-            loaded_object = load(configuration_file)
+        loaded_object = read_configuration(path, file_key)
 
     # ensure that the object is saved on process exit
-    register(save_configuration, loaded_object, path)
+    register(save_configuration, loaded_object, path, deepcopy(vars(loaded_object)), file_key)
 
     return loaded_object
 
 
-def save_configuration(data, path):
+def read_configuration(path, file_key):
     """
-    Save a configuration object to disk.
+    Read a configuration object from disk, from the cache if
+    it was cached for the current contents of the file.
+
+    :param path: path to the configuration file
+    :param file_key: identifier for the file contents
+    :return: the configuration object
+    """
+    loaded_object = load_cached_configuration(path, file_key)
+    if loaded_object is None:
+        with open(path) as configuration_file:
+            loaded_object = load(configuration_file)
+        cache_configuration(path, file_key, loaded_object)
+
+    return loaded_object
+
+
+def save_configuration(data, path, original=None, file_key=None):
+    """
+    Atomically save a configuration object to disk. If we know
+    how the object looked when it was loaded, we only save the
+    fields that have changed since, and if another process has
+    saved the file since we loaded it, we apply our changes on
+    top of theirs instead of over-writing them.
 
     :param data: configuration object to save
     :param path: where to save the object
+    :param original: fields of the object as it was loaded, if it was
+    :param file_key: identifier for the file contents it was loaded from, if any
+    """
+    if original is not None and vars(data) == original and exists(path):
+        return
+
+    with configuration_lock(path):
+        current_key = configuration_file_key(path)
+        if original is not None and current_key is not None:
+            changes = dict((key, value) for key, value in vars(data).items() if key not in original or original[key] != value)
+            if not changes:
+                return
+
+            if current_key != file_key:
+                current = read_configuration(path, current_key)
+                vars(current).update(changes)
+                data = current
+
+        temporary_path = '{}.{}.tmp'.format(path, uuid4().hex)
+        with open(temporary_path, 'w') as configuration_file:
+            dump(data, configuration_file, default_flow_style=False, explicit_start=True)
+        rename(temporary_path, path)
+
+        cache_configuration(path, configuration_file_key(path), data)
+
+
+@contextmanager
+def configuration_lock(path):
+    """
+    Hold the lock that serializes changes to the configuration
+    files in a directory. Files are replaced atomically, so
+    readers never need to take the lock.
+
+    :param path: path to a configuration file in the directory
     """
     try:
         makedirs(dirname(path))
@@ -69,8 +146,85 @@ def save_configuration(data, path):
             # we can ignore EEXIST
             raise
 
-    with open(path, 'w+') as configuration_file:
-        dump(data, configuration_file, default_flow_style=False, explicit_start=True)
+    with open(join(dirname(path), _CONFIGURATION_LOCK_FILE), 'a') as lock_file:
+        flock(lock_file.fileno(), LOCK_EX)
+        yield
+
+
+def configuration_file_key(path):
+    """
+    Identify the contents of a configuration file without
+    reading it. Files are replaced, not written in place,
+    so a new inode means new contents even if the size and
+    modification time happen to match.
+
+    :param path: path to the configuration file
+    :return: identifier for the file contents, or None if it does not exist
+    """
+    try:
+        status = stat(path)
+    except OSError as e:
+        if e.errno != ENOENT:
+            raise
+        return None
+
+    return [status.st_ino, status.st_size, status.st_mtime]
+
+
+def load_cached_configuration(path, file_key):
+    """
+    Load a configuration object from the cache, if it was
+    cached for the current contents of the file.
+
+    :param path: path to the configuration file
+    :param file_key: identifier for the file contents
+    :return: the cached object, or None
+    """
+    entry = _load_configuration_cache(path).get(path)
+    if entry is None or entry[0] != file_key:
+        return None
+
+    return entry[1]
+
+
+def cache_configuration(path, file_key, data):
+    """
+    Atomically record a configuration object in the cache.
+    Concurrent writers may drop each other's entries, which
+    costs only a parse of the YAML file the next time.
+
+    :param path: path to the configuration file
+    :param file_key: identifier for the file contents
+    :param data: configuration object to cache
+    """
+    cache = _load_configuration_cache(path)
+    cache[path] = (file_key, data)
+
+    cache_path = join(dirname(path), _CONFIGURATION_CACHE_FILE)
+    temporary_path = '{}.{}.tmp'.format(cache_path, uuid4().hex)
+    try:
+        with open(temporary_path, 'wb') as cache_file:
+            dump_pickle(cache, cache_file, HIGHEST_PROTOCOL)
+        rename(temporary_path, cache_path)
+    except (IOError, OSError):
+        # the cache is only an optimization
+        pass
+
+
+def _load_configuration_cache(path):
+    """
+    Load the configuration cache next to a configuration file.
+
+    :param path: path to the configuration file
+    :return: map of path to file identifier and cached object
+    """
+    try:
+        with open(join(dirname(path), _CONFIGURATION_CACHE_FILE), 'rb') as cache_file:
+            return load_pickle(cache_file)
+    except Exception:  # pylint: disable=broad-except
+        # a missing, corrupt or incompatible cache
+        # is no worse than having no cache at all
+        return {}
 
 
 class Configuration(object):
@@ -90,36 +244,11 @@ class Configuration(object):
         # path to the local configuration directory
         self._path = abspath(join(base_dir, 'origin-ci-tool'))
 
-        # configuration options for Ansible core
-        self.ansible_client_configuration = load_configuration(
-            self.ansible_client_configuration_path,
-            lambda: AnsibleCoreClient(
-                inventory_dir=self.ansible_inventory_path,
-                log_directory=self.ansible_log_path,
-            ),
-        )
-
-        # extra variables we want to send to Ansible playbooks
-        self.ansible_variables = load_configuration(
-            self.variables_path,
-            lambda: PlaybookExtraVariables(),
-        )
-
-        # metadata about active Vagrant local VMs
-        self._vagrant_metadata = self.load_vagrant_metadata()
-
-        # configuration options for AWS client
-        self.aws_client_configuration = load_configuration(
-            self.aws_client_configuration_path,
-            lambda: AWSClientConfiguration(),
-        )
-
-        # extra variables we want to send to Ansible playbooks
-        # that touch the AWS API
-        self.aws_variables = load_configuration(
-            self.aws_variables_path,
-            lambda: AWSVariables(),
-        )
+        # configuration sections are loaded the first time
+        # they are used, so commands that do not need them
+        # do not pay to parse them
+        self._sections = {}
+        self._vagrant_metadata = None
 
     def run_playbook(self, playbook_relative_path, playbook_variables=None, option_overrides=None):
         """
@@ -133,12 +262,78 @@ class Configuration(object):
         """
         playbook_variables = self.ansible_variables.default(self.aws_variables.default(playbook_variables), )
 
+        if daemon_available(self.daemon_socket_path):
+            # a daemon is keeping the Ansible core warm for
+            # us, so we can skip the start-up cost entirely
+            submit_playbook(
+                socket_path=self.daemon_socket_path,
+                client_configuration=self.ansible_client_configuration,
+                playbook_file=playbook_path(playbook_relative_path),
+                playbook_variables=playbook_variables,
+                option_overrides=option_overrides,
+            )
+            return
+
         self.ansible_client_configuration.run_playbook(
             playbook_file=playbook_path(playbook_relative_path),
             playbook_variables=playbook_variables,
             option_overrides=option_overrides,
         )
 
+    def _section(self, name, path, default_func):
+        """
+        Load a configuration section the first time it is used.
+
+        :param name: name of the section
+        :param path: path to attempt to load the section from
+        :param default_func: function to create a default instance
+        :return: the configuration section
+        """
+        if name not in self._sections:
+            self._sections[name] = load_configuration(path, default_func)
+
+        return self._sections[name]
+
+    @property
+    def ansible_client_configuration(self):
+        """
+        Yield the configuration options for Ansible core.
+        :return: the AnsibleCoreClient
+        """
+        return self._section(
+            'ansible_client_configuration',
+            self.ansible_client_configuration_path,
+            lambda: AnsibleCoreClient(
+                inventory_dir=self.ansible_inventory_path,
+                log_directory=self.ansible_log_path,
+            ),
+        )
+
+    @property
+    def ansible_variables(self):
+        """
+        Yield the extra variables we want to send to Ansible playbooks.
+        :return: the PlaybookExtraVariables
+        """
+        return self._section('ansible_variables', self.variables_path, lambda: PlaybookExtraVariables())
+
+    @property
+    def aws_client_configuration(self):
+        """
+        Yield the configuration options for the AWS client.
+        :return: the AWSClientConfiguration
+        """
+        return self._section('aws_client_configuration', self.aws_client_configuration_path, lambda: AWSClientConfiguration())
+
+    @property
+    def aws_variables(self):
+        """
+        Yield the extra variables we want to send to Ansible
+        playbooks that touch the AWS API.
+        :return: the AWSVariables
+        """
+        return self._section('aws_variables', self.aws_variables_path, lambda: AWSVariables())
+
     @property
     def ansible_inventory_path(self):
         """
@@ -205,6 +400,65 @@ class Configuration(object):
             if not self._vagrant_hostname_taken(possible_hostname):
                 return possible_hostname
 
+    def reserve_vagrant_name(self):
+        """
+        Reserve the next available hostname for a local Vagrant
+        VM by creating the home directory for the VM. Creating a
+        directory is atomic, so concurrent invocations can never
+        reserve the same hostname.
+
+        :return: the reserved hostname
+        """
+        for i in count():
+            possible_hostname = DEFAULT_HOSTNAME + (str(i - 1) if i else '')
+            if self._vagrant_hostname_taken(possible_hostname):
+                continue
+
+            if self._claim_vagrant_home_directory(possible_hostname):
+                return possible_hostname
+
+    def _claim_vagrant_home_directory(self, name):
+        """
+        Create the home directory for a Vagrant VM, unless
+        another process has already done so.
+
+        :param name: hostname of the VM
+        :return: whether or not we created the directory
+        """
+        try:
+            makedirs(self.vagrant_directory_root)
+        except OSError as e:
+            if e.errno != EEXIST:
+                raise
+
+        try:
+            mkdir(self.vagrant_home_directory(name))
+        except OSError as e:
+            if e.errno != EEXIST:
+                raise
+            return False
+
+        return True
+
+    def release_vagrant_name(self, name):
+        """
+        Release a hostname reserved for a local Vagrant VM
+        that was never registered by removing the home
+        directory for the VM. If Vagrant already created
+        the VM, we destroy it first, as nothing else knows
+        about it and the name would collide with it.
+
+        :param name: the reserved hostname
+        :return: whether or not a VM had to be destroyed
+        """
+        home_directory = self.vagrant_home_directory(name)
+        created = vagrant_machines_created(home_directory)
+        if created:
+            destroy_vagrant_machines(home_directory)
+
+        rmtree(home_directory, ignore_errors=True)
+        return created
+
     def _vagrant_hostname_taken(self, name):
         """
         Determine if a Vagrant VM with the given hostname exists.
@@ -237,6 +491,9 @@ class Configuration(object):
         Yield the list of Vagrant machine metadata.
         :return: the Vagrant metadata
         """
+        if self._vagrant_metadata is None:
+            self._vagrant_metadata = self.load_vagrant_metadata()
+
         return self._vagrant_metadata
 
     def register_vagrant_host(self, data):
@@ -247,7 +504,7 @@ class Configuration(object):
 
         :param data: VagrantVMMetadata for the host
         """
-        self._vagrant_metadata.append(data)
+        self.registered_vagrant_machines().append(data)
         data.write()
 
     @property
@@ -258,6 +515,31 @@ class Configuration(object):
         """
         return join(self._path, _LOG_DIRECTORY)
 
+    @property
+    def daemon_socket_path(self):
+        """
+        Yield the path to the Unix socket the daemon listens on.
+        :return: absolute path to the daemon socket
+        """
+        return join(self._path, _DAEMON_SOCKET_FILE)
+
+    @property
+    def sync_state_path(self):
+        """
+        Yield the root path for the cached state of synced
+        repositories on remote hosts.
+        :return: absolute path to the sync state directory
+        """
+        return join(self._path, _SYNC_STATE_DIRECTORY)
+
+    @property
+    def ansible_profile_path(self):
+        """
+        Yield the root path for task timing profiles.
+        :return: absolute path to the profile directory
+        """
+        return join(self._path, _PROFILE_DIRECTORY)
+
     @property
     def aws_client_configuration_path(self):
         """
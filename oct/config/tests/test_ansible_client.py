@@ -0,0 +1,64 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+import sys
+from os.path import abspath, dirname, join
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from oct.config.ansible_client import shutdown_stdout_callback
+
+# callback plugins are not part of a package, so we
+# import them from the plugin directory directly
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', '..', 'ansible', 'oct', 'callback_plugins'))
+import pretty_progress  # noqa: E402
+
+
+class FakeStream(object):
+    def __init__(self):
+        self.written = []
+
+    def write(self, text):
+        self.written.append(text)
+
+    def flush(self):
+        pass
+
+
+class FakeWorkload(object):
+    def __init__(self, identifier, stream):
+        self.identifier = identifier
+        self.stream = stream
+        self.status = pretty_progress.RUNNING_PREFIX
+        self.elapsed_time = None
+
+    def complete(self, status):
+        self.status = status
+        self.elapsed_time = '00:01.000'
+
+    def format(self):
+        return '{} | {}\n'.format(self.status, self.identifier)
+
+
+class ShutdownStdoutCallbackTestCase(TestCase):
+    def test_progress_is_written_before_returning(self):
+        stream = FakeStream()
+        with patch.object(target=pretty_progress, attribute='stdout', new=stream):
+            callback = pretty_progress.CallbackModule()
+            for index in range(100):
+                callback.append_workload(FakeWorkload('TASK [{}]'.format(index), stream))
+            callback.complete_workload(0, pretty_progress.SUCCESS_PREFIX)
+
+            shutdown_stdout_callback(Mock(_tqm=Mock(_stdout_callback=callback)))
+
+        self.assertFalse(callback._progress._worker.is_alive())
+        written = b''.join(stream.written)
+        self.assertIn(b'RUNNING | TASK [99]\n', written)
+        self.assertIn(b'SUCCESS | TASK [0]\n', written)
+
+    def test_callback_without_shutdown(self):
+        shutdown_stdout_callback(Mock(_tqm=Mock(_stdout_callback=object())))
+
+    def test_run_failed_before_callbacks_were_loaded(self):
+        shutdown_stdout_callback(Mock(_tqm=None))
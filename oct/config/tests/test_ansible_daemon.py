@@ -0,0 +1,120 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from io import BytesIO
+from json import dumps
+from os import _exit, fork, kill, waitpid
+from os.path import exists, join
+from shutil import rmtree
+from signal import SIGKILL
+from socket import AF_UNIX, SOCK_STREAM, socket
+from tempfile import mkdtemp
+from time import sleep
+from unittest import TestCase
+
+from click import ClickException
+from oct.config.ansible_daemon import _RESULT_MARKER, AnsibleDaemon, daemon_available, relay_output, stop_daemon
+
+
+class FakeConnection(object):
+    def __init__(self, chunks):
+        """
+        A socket-like object that yields the chunks in order.
+
+        :param chunks: data to return from successive reads
+        """
+        self.chunks = list(chunks)
+
+    def recv(self, _):
+        if self.chunks:
+            return self.chunks.pop(0)
+        return b''
+
+
+class RelayOutputTestCase(TestCase):
+    def test_output_and_result(self):
+        output = BytesIO()
+        connection = FakeConnection([b'some output\n', _RESULT_MARKER + b'{"error": "bad"}\n'])
+        self.assertEqual(relay_output(connection, output), {'error': 'bad'})
+        self.assertEqual(output.getvalue(), b'some output\n')
+
+    def test_split_marker(self):
+        output = BytesIO()
+        data = b'some output\n' + _RESULT_MARKER + b'{}\n'
+        connection = FakeConnection([data[i:i + 3] for i in range(0, len(data), 3)])
+        self.assertEqual(relay_output(connection, output), {})
+        self.assertEqual(output.getvalue(), b'some output\n')
+
+    def test_no_result(self):
+        with self.assertRaisesRegexp(ClickException, 'without reporting a result'):
+            relay_output(FakeConnection([b'some output\n']), BytesIO())
+
+
+def interrupt(*_):
+    raise KeyboardInterrupt()
+
+
+class AnsibleDaemonTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.addCleanup(rmtree, self.directory)
+        self.socket_path = join(self.directory, 'daemon.sock')
+
+    def start_daemon(self, work=None):
+        """
+        Serve requests from a daemon in a child process.
+
+        :param work: replacement for the worker's playbook run
+        """
+        pid = fork()
+        if pid == 0:
+            status = 1
+            try:
+                daemon = AnsibleDaemon(self.socket_path, [], self.directory)
+                if work:
+                    daemon.work = work
+                daemon.serve_forever()
+                status = 0
+            finally:
+                _exit(status)
+
+        self.addCleanup(self.stop, pid)
+        for _ in range(100):
+            if daemon_available(self.socket_path):
+                return
+            sleep(0.05)
+        self.fail('The daemon did not start.')
+
+    def stop(self, pid):
+        if daemon_available(self.socket_path):
+            stop_daemon(self.socket_path)
+        else:
+            # nobody can reach the daemon to ask it to stop
+            kill(pid, SIGKILL)
+        waitpid(pid, 0)
+
+    def send(self, raw_request):
+        connection = socket(AF_UNIX, SOCK_STREAM)
+        try:
+            connection.connect(self.socket_path)
+            connection.sendall(raw_request + b'\n')
+            return relay_output(connection, BytesIO())
+        finally:
+            connection.close()
+
+    def test_bad_requests_keep_daemon_serving(self):
+        self.start_daemon()
+
+        self.assertIn('could not handle the request', self.send(b'not json')['error'])
+        self.assertIn('could not handle the request', self.send(b'{"command": "run_playbook"}')['error'])
+        self.assertTrue(daemon_available(self.socket_path))
+
+    def test_worker_never_returns_to_server(self):
+        self.start_daemon(work=interrupt)
+        request = dumps({'command': 'run_playbook', 'client': {'host_list': join(self.directory, 'inventory')}})
+
+        for _ in range(2):
+            with self.assertRaisesRegexp(ClickException, 'without reporting a result'):
+                self.send(request.encode('utf-8'))
+            self.assertTrue(exists(self.socket_path))
+            self.assertTrue(daemon_available(self.socket_path))
@@ -0,0 +1,131 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from os import listdir, makedirs
+from os.path import exists, getmtime, join
+from shutil import rmtree
+from subprocess import CalledProcessError
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from mock import patch
+from oct.config.aws_client import AWSClientConfiguration
+from oct.config.configuration import DEFAULT_HOSTNAME, Configuration, load_configuration, save_configuration
+
+
+class ConfigurationTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.addCleanup(rmtree, self.directory)
+        self.path = join(self.directory, 'aws_client_configuration.yml')
+
+        # we save objects by hand, not on exit
+        patcher = patch('oct.config.configuration.register')
+        self.register = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def saved_call(self):
+        """
+        :return: arguments registered to save the last object loaded
+        """
+        return self.register.call_args[0][1:]
+
+    def test_default_is_saved(self):
+        configuration = load_configuration(self.path, lambda: AWSClientConfiguration(keypair_name='default'))
+        save_configuration(*self.saved_call())
+        self.assertEqual(load_configuration(self.path, AWSClientConfiguration).keypair_name, configuration.keypair_name)
+
+    def test_only_changes_are_saved(self):
+        save_configuration(AWSClientConfiguration(keypair_name='first'), self.path)
+        modified = getmtime(self.path)
+
+        configuration = load_configuration(self.path, AWSClientConfiguration)
+        with patch('oct.config.configuration.dump') as dump:
+            save_configuration(*self.saved_call())
+        self.assertFalse(dump.called)
+
+        configuration.keypair_name = 'second'
+        save_configuration(*self.saved_call())
+        self.assertEqual(load_configuration(self.path, AWSClientConfiguration).keypair_name, 'second')
+        self.assertGreaterEqual(getmtime(self.path), modified)
+        self.assertEqual(
+            sorted(listdir(self.directory)), ['aws_client_configuration.yml', 'configuration.cache', 'configuration.lock']
+        )
+
+    def test_cache_skips_parsing(self):
+        save_configuration(AWSClientConfiguration(keypair_name='first'), self.path)
+        with patch('oct.config.configuration.load') as load:
+            self.assertEqual(load_configuration(self.path, AWSClientConfiguration).keypair_name, 'first')
+        self.assertFalse(load.called)
+
+        # a file that changed behind our back is parsed again
+        with open(self.path, 'w') as configuration_file:
+            configuration_file.write(
+                '--- !!python/object:oct.config.aws_client.AWSClientConfiguration\n'
+                'keypair_name: edited\nprivate_key_path: null\n'
+            )
+        self.assertEqual(load_configuration(self.path, AWSClientConfiguration).keypair_name, 'edited')
+
+    def test_corrupt_cache(self):
+        save_configuration(AWSClientConfiguration(keypair_name='first'), self.path)
+        with open(join(self.directory, 'configuration.cache'), 'w') as cache_file:
+            cache_file.write('garbage')
+        self.assertEqual(load_configuration(self.path, AWSClientConfiguration).keypair_name, 'first')
+
+    def test_sections_are_lazy(self):
+        with patch.dict('os.environ', {'OCT_CONFIG_HOME': self.directory}):
+            configuration = Configuration()
+        self.assertFalse(self.register.called)
+
+        self.assertIs(configuration.aws_variables, configuration.aws_variables)
+        self.assertEqual(self.register.call_count, 1)
+
+    def test_concurrent_changes_are_merged(self):
+        save_configuration(AWSClientConfiguration(keypair_name='first', private_key_path='first'), self.path)
+
+        first = load_configuration(self.path, AWSClientConfiguration)
+        first_call = self.saved_call()
+        second = load_configuration(self.path, AWSClientConfiguration)
+        second_call = self.saved_call()
+
+        first.keypair_name = 'changed'
+        second.private_key_path = 'changed'
+        save_configuration(*first_call)
+        save_configuration(*second_call)
+
+        configuration = load_configuration(self.path, AWSClientConfiguration)
+        self.assertEqual((configuration.keypair_name, configuration.private_key_path), ('changed', 'changed'))
+
+    def test_reserve_vagrant_name(self):
+        with patch.dict('os.environ', {'OCT_CONFIG_HOME': self.directory}):
+            first, second = Configuration(), Configuration()
+        names = [first.reserve_vagrant_name(), second.reserve_vagrant_name(), first.reserve_vagrant_name()]
+        self.assertEqual(names, [DEFAULT_HOSTNAME, DEFAULT_HOSTNAME + '0', DEFAULT_HOSTNAME + '1'])
+
+    def test_release_vagrant_name(self):
+        with patch.dict('os.environ', {'OCT_CONFIG_HOME': self.directory}):
+            configuration = Configuration()
+        name = configuration.reserve_vagrant_name()
+        self.assertFalse(configuration.release_vagrant_name(name))
+        self.assertEqual(configuration.reserve_vagrant_name(), name)
+
+    def test_release_created_vagrant_machine(self):
+        with patch.dict('os.environ', {'OCT_CONFIG_HOME': self.directory}):
+            configuration = Configuration()
+        name = configuration.reserve_vagrant_name()
+        machine_directory = join(configuration.vagrant_home_directory(name), '.vagrant', 'machines', name, 'libvirt')
+        makedirs(machine_directory)
+        with open(join(machine_directory, 'id'), 'w') as id_file:
+            id_file.write('machine')
+
+        with patch('oct.config.configuration.destroy_vagrant_machines') as destroy:
+            destroy.side_effect = CalledProcessError(1, ['vagrant', 'destroy', '--force'])
+            with self.assertRaises(CalledProcessError):
+                configuration.release_vagrant_name(name)
+            # the VM still exists, so we must be able to tear it down
+            self.assertTrue(exists(join(machine_directory, 'id')))
+
+            destroy.side_effect = None
+            self.assertTrue(configuration.release_vagrant_name(name))
+            destroy.assert_called_with(configuration.vagrant_home_directory(name))
+        self.assertFalse(exists(configuration.vagrant_home_directory(name)))
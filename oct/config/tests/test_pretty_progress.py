@@ -0,0 +1,209 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+import sys
+from os.path import abspath, dirname, join
+from unittest import TestCase
+
+from mock import Mock, patch
+
+# callback plugins are not part of a package, so we
+# import them from the plugin directory directly
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', '..', 'ansible', 'oct', 'callback_plugins'))
+import pretty_progress  # noqa: E402
+from pretty_progress import APPEND, COMPLETE, FLUSH, REPLACE, STOP, TRUNCATE, ProgressDisplay  # noqa: E402
+
+
+class FakeStream(object):
+    """
+    Records what is written to it, along with its name,
+    into a log shared with the other streams.
+    """
+
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    def write(self, text):
+        self.log.append((self.name, text))
+
+    def flush(self):
+        pass
+
+
+class FakeItem(object):
+    """
+    Stands in for a workload or failure on the display.
+    """
+
+    def __init__(self, text, stream, elapsed_time='00:00.000'):
+        self.text = text
+        self.stream = stream
+        self.status = 'RUNNING'
+        self.elapsed_time = elapsed_time
+
+    def format(self):
+        return '{} | {}\n'.format(self.status, self.text)
+
+
+class ProgressDisplayTestCase(TestCase):
+    def setUp(self):
+        self.log = []
+        self.stdout = FakeStream('stdout', self.log)
+        self.stderr = FakeStream('stderr', self.log)
+        self.terminal_lines = 24
+
+        patches = [
+            patch.object(target=pretty_progress, attribute='stdout', new=self.stdout),
+            patch.object(
+                target=pretty_progress,
+                attribute='get_terminal_size',
+                new=lambda: Mock(columns=80, lines=self.terminal_lines),
+            ),
+            # we drive the display ourselves from the test,
+            # so that every batch of changes is painted at once
+            patch.object(target=pretty_progress, attribute='Thread'),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.display = ProgressDisplay()
+
+    def paint(self, *changes):
+        """
+        Have the display apply a batch of changes and
+        repaint once, returning what it wrote.
+
+        :param changes: changes to send to the display
+        :return: stream and text pairs that were written
+        """
+        for change in changes:
+            self.display.send(*change)
+        self.display.send(STOP)
+        self.display._display()
+
+        written = list(self.log)
+        del self.log[:]
+        return written
+
+    def item(self, text, stream=None):
+        return FakeItem(text, stream or self.stdout)
+
+    def test_append(self):
+        self.assertEqual(
+            self.paint((APPEND, self.item('first')), (APPEND, self.item('second'))),
+            [('stdout', b'RUNNING | first\n'), ('stdout', b'RUNNING | second\n')],
+        )
+        self.assertEqual(
+            self.paint((APPEND, self.item('third'))),
+            [('stdout', b'RUNNING | third\n')],
+        )
+
+    def test_complete(self):
+        self.paint((APPEND, self.item('first')), (APPEND, self.item('second')))
+        self.assertEqual(
+            self.paint((COMPLETE, 0, 'SUCCESS', '00:01.000')),
+            [('stdout', b'\033[2F\033[KSUCCESS | first\n'), ('stdout', b'\033[1E')],
+        )
+
+    def test_replace(self):
+        self.paint((APPEND, self.item('first')), (APPEND, self.item('second')))
+        self.assertEqual(
+            self.paint((REPLACE, 1, self.item('third'))),
+            [('stdout', b'\033[1F\033[KRUNNING | third\n')],
+        )
+
+    def test_unchanged_lines_are_not_repainted(self):
+        self.paint((APPEND, self.item('first')), (APPEND, self.item('second')))
+        self.assertEqual(self.paint((REPLACE, 0, self.item('first'))), [])
+
+    def test_truncate(self):
+        self.paint((APPEND, self.item('first')), (APPEND, self.item('second')), (APPEND, self.item('third')))
+        self.assertEqual(
+            self.paint((TRUNCATE, 1)),
+            [('stdout', b'\033[2F'), ('stdout', b'\033[J')],
+        )
+        self.assertEqual(
+            self.paint((APPEND, self.item('fourth'))),
+            [('stdout', b'RUNNING | fourth\n')],
+        )
+
+    def test_truncate_and_append(self):
+        self.paint((APPEND, self.item('first')), (APPEND, self.item('second')))
+        self.assertEqual(
+            self.paint((TRUNCATE, 1), (APPEND, self.item('third'))),
+            [('stdout', b'\033[1F'), ('stdout', b'\033[J'), ('stdout', b'RUNNING | third\n')],
+        )
+
+    def test_streams_keep_their_order(self):
+        self.paint((APPEND, self.item('first')))
+        self.assertEqual(
+            self.paint((COMPLETE, 0, 'FAILURE', '00:01.000'), (APPEND, FakeItem('failed\nbadly', self.stderr))),
+            [
+                ('stdout', b'\033[1F\033[KFAILURE | first\n'),
+                ('stderr', b'RUNNING | failed\n'),
+                ('stderr', b'badly\n'),
+            ],
+        )
+
+    def test_lines_scrolled_off_screen_are_not_repainted(self):
+        self.terminal_lines = 2
+        self.paint((APPEND, self.item('first')), (APPEND, self.item('second')), (APPEND, self.item('third')))
+        self.assertEqual(self.paint((COMPLETE, 0, 'SUCCESS', '00:01.000')), [])
+        self.assertEqual(
+            self.paint((COMPLETE, 2, 'SUCCESS', '00:01.000')),
+            [('stdout', b'\033[1F\033[KSUCCESS | third\n')],
+        )
+
+    def test_unknown_terminal_height(self):
+        self.terminal_lines = 0
+        self.paint((APPEND, self.item('first')), (APPEND, self.item('second')), (APPEND, self.item('third')))
+        self.assertEqual(
+            self.paint((COMPLETE, 0, 'SUCCESS', '00:01.000')),
+            [('stdout', b'\033[3F\033[KSUCCESS | first\n'), ('stdout', b'\033[2E')],
+        )
+
+    def test_flush_is_acknowledged_after_painting(self):
+        acknowledgement = Mock()
+        acknowledgement.set.side_effect = lambda: self.assertEqual(self.log, [('stdout', b'RUNNING | first\n')])
+
+        self.paint((APPEND, self.item('first')), (FLUSH, acknowledgement))
+        acknowledgement.set.assert_called_once_with()
+
+
+class ProgressDisplayStopTestCase(TestCase):
+    def setUp(self):
+        self.log = []
+        self.stdout = FakeStream('stdout', self.log)
+        patcher = patch.object(target=pretty_progress, attribute='stdout', new=self.stdout)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stop_writes_everything_queued(self):
+        display = ProgressDisplay()
+        for index in range(100):
+            display.send(APPEND, FakeItem(str(index), self.stdout))
+        display.send(COMPLETE, 0, 'SUCCESS', '00:01.000')
+        display.stop()
+
+        self.assertFalse(display._worker.is_alive())
+        written = b''.join(text for _, text in self.log)
+        self.assertIn(b'RUNNING | 99\n', written)
+        self.assertIn(b'SUCCESS | 0\n', written)
+
+        # stopping again does nothing
+        display.stop()
+        self.assertEqual(b''.join(text for _, text in self.log), written)
+
+    def test_stop_without_display_thread(self):
+        with patch.object(target=pretty_progress, attribute='Thread') as thread:
+            thread.return_value.is_alive.return_value = False
+            display = ProgressDisplay()
+
+        display.send(APPEND, FakeItem('first', self.stdout))
+        display.flush()
+        display.stop()
+
+        thread.return_value.join.assert_not_called()
+        self.assertEqual(self.log, [])
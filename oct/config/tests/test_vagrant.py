@@ -0,0 +1,97 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from os import makedirs, remove, utime
+from os.path import exists, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from mock import patch
+from oct.config.vagrant import fetch_ssh_configuration
+
+_SSH_CONFIG = '''Host openshiftdevel
+  HostName 192.168.121.10
+  User vagrant
+  Port 22
+  IdentityFile /home/user/.vagrant.d/insecure_private_key
+'''
+
+
+class FetchSSHConfigurationTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.addCleanup(rmtree, self.directory)
+        self.machine_directory = join(self.directory, '.vagrant', 'machines', 'openshiftdevel', 'libvirt')
+        makedirs(self.machine_directory)
+        self.create_machine('first')
+
+        patcher = patch('oct.config.vagrant.check_output', return_value=_SSH_CONFIG)
+        self.check_output = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_machine(self, machine_id, modified=1000):
+        with open(join(self.machine_directory, 'id'), 'w') as id_file:
+            id_file.write(machine_id)
+        utime(join(self.machine_directory, 'id'), (modified, modified))
+
+    def record_ssh_config(self, modified=2000, host='192.168.121.20'):
+        with open(join(self.directory, 'ssh_config'), 'w') as ssh_config_file:
+            ssh_config_file.write(_SSH_CONFIG.replace('192.168.121.10', host))
+        utime(join(self.directory, 'ssh_config'), (modified, modified))
+
+    def test_recorded_configuration(self):
+        self.record_ssh_config()
+        configuration = fetch_ssh_configuration('openshiftdevel', self.directory)
+        self.assertFalse(self.check_output.called)
+        self.assertEqual(configuration['hostname'], '192.168.121.20')
+        self.assertTrue(exists(join(self.directory, 'ssh_configuration.yml')))
+
+    def test_cached_configuration(self):
+        self.assertEqual(fetch_ssh_configuration('openshiftdevel', self.directory)['hostname'], '192.168.121.10')
+        self.assertEqual(self.check_output.call_count, 1)
+
+        configuration = fetch_ssh_configuration('openshiftdevel', self.directory)
+        self.assertEqual(self.check_output.call_count, 1)
+        self.assertEqual(configuration['port'], '22')
+
+    def test_recreated_machine(self):
+        self.record_ssh_config()
+        fetch_ssh_configuration('openshiftdevel', self.directory)
+
+        # the recorded output is older than the new machine
+        self.create_machine('second', modified=3000)
+        self.assertEqual(fetch_ssh_configuration('openshiftdevel', self.directory)['hostname'], '192.168.121.10')
+        self.assertEqual(self.check_output.call_count, 1)
+
+    def test_rerecorded_configuration(self):
+        self.record_ssh_config()
+        fetch_ssh_configuration('openshiftdevel', self.directory)
+
+        # the VM was provisioned again without being re-created
+        self.record_ssh_config(modified=3000, host='192.168.121.30')
+        self.assertEqual(fetch_ssh_configuration('openshiftdevel', self.directory)['hostname'], '192.168.121.30')
+        self.assertFalse(self.check_output.called)
+
+    def test_restarted_machine(self):
+        self.record_ssh_config()
+        fetch_ssh_configuration('openshiftdevel', self.directory)
+
+        # restarting the VM removes the recorded output
+        remove(join(self.directory, 'ssh_config'))
+        self.assertEqual(fetch_ssh_configuration('openshiftdevel', self.directory)['hostname'], '192.168.121.10')
+        self.assertEqual(self.check_output.call_count, 1)
+
+        fetch_ssh_configuration('openshiftdevel', self.directory)
+        self.assertEqual(self.check_output.call_count, 1)
+
+    def test_private_key(self):
+        with open(join(self.machine_directory, 'private_key'), 'w') as key_file:
+            key_file.write('key')
+        configuration = fetch_ssh_configuration('openshiftdevel', self.directory)
+        self.assertEqual(configuration['identityfile'][0], join(self.machine_directory, 'private_key'))
+
+    def test_no_machine(self):
+        remove(join(self.machine_directory, 'id'))
+        fetch_ssh_configuration('openshiftdevel', self.directory)
+        self.assertFalse(exists(join(self.directory, 'ssh_configuration.yml')))
@@ -6,10 +6,12 @@ try:
 except ImportError:
     from io import StringIO  # for Python 3
 from copy import deepcopy
+from errno import ENOENT
+from glob import glob
 from shutil import rmtree
-from subprocess import check_output
+from subprocess import check_call, check_output
 
-from os.path import exists, join
+from os.path import exists, getmtime, join
 from paramiko import SSHConfig
 from yaml import dump, load
 
@@ -26,20 +28,112 @@ _variable_name_to_metadata_field = {
     'ansible_ssh_extra_args': 'extra_ssh_args',
 }
 
+# the output of `vagrant ssh-config` that the vagrant-up
+# role records, so we do not need to ask Vagrant again
+_SSH_CONFIG_FILE = 'ssh_config'
+# the SSH configuration we parsed for the VM, alongside
+# the ID of the VM and the modification time of the
+# recorded `vagrant ssh-config` output it was parsed for
+_SSH_CONFIGURATION_CACHE_FILE = 'ssh_configuration.yml'
+
 
 def fetch_ssh_configuration(hostname, directory):
     """
     Fetch the SSH configuration options that Vagrant
     holds for the VM with the specified hostname in
-    the local directory.
+    the local directory. Vagrant does not record the
+    SSH endpoint in its machine data, so we need the
+    output of `vagrant ssh-config`, but every call to
+    Vagrant is slow to start. We cache what we parse
+    for as long as the VM is the same machine, and
+    use the output that provisioning recorded before
+    asking Vagrant for it. The cache is dropped when
+    that output is recorded again or removed, as the
+    playbooks that restart the VM do.
 
     :param hostname: name of the Vagrant VM
     :param directory: "location" of the Vagrant VM
     :return: SSH configuration
     """
+    machine_id, machine_id_modified = vagrant_machine_id(hostname, directory)
+    recorded_file = join(directory, _SSH_CONFIG_FILE)
+    recorded_modified = getmtime(recorded_file) if exists(recorded_file) else None
+    cache_file = join(directory, _SSH_CONFIGURATION_CACHE_FILE)
+    if machine_id is not None and exists(cache_file):
+        with open(cache_file) as cache:
+            cached = load(cache)
+        if cached and cached.get('machine_id') == machine_id and cached.get('ssh_config_modified') == recorded_modified:
+            return cached['configuration']
+
+    if machine_id is not None and recorded_modified is not None and recorded_modified >= machine_id_modified:
+        with open(recorded_file) as recorded:
+            raw_configuration = recorded.read()
+    else:
+        raw_configuration = check_output(['vagrant', 'ssh-config', '--host', hostname], cwd=directory)
+
     config = SSHConfig()
-    config.parse(StringIO(unicode(check_output(['vagrant', 'ssh-config', '--host', hostname], cwd=directory))))
-    return config.lookup(hostname)
+    config.parse(StringIO(unicode(raw_configuration)))
+    configuration = dict(config.lookup(hostname))
+
+    # Vagrant keeps the key it generated for the VM with
+    # the machine data, so we prefer it when it exists
+    private_keys = glob(join(directory, '.vagrant', 'machines', hostname, '*', 'private_key'))
+    if private_keys and private_keys[0] not in configuration.get('identityfile', []):
+        configuration['identityfile'] = private_keys[:1] + configuration.get('identityfile', [])
+
+    if machine_id is not None:
+        with open(cache_file, 'w') as cache:
+            dump({
+                'machine_id': machine_id,
+                'ssh_config_modified': recorded_modified,
+                'configuration': configuration,
+            }, cache, default_flow_style=False, explicit_start=True)
+
+    return configuration
+
+
+def vagrant_machine_id(hostname, directory):
+    """
+    Determine the ID that the Vagrant provider gave
+    the VM, which changes when the VM is re-created,
+    and when Vagrant recorded it.
+
+    :param hostname: name of the Vagrant VM
+    :param directory: "location" of the Vagrant VM
+    :return: the ID and its modification time, or None and None if the VM was not created
+    """
+    for id_file in glob(join(directory, '.vagrant', 'machines', hostname, '*', 'id')):
+        try:
+            with open(id_file) as machine_id:
+                return machine_id.read().strip() or None, getmtime(id_file)
+        except (IOError, OSError) as e:
+            if e.errno != ENOENT:
+                raise
+
+    return None, None
+
+
+def vagrant_machines_created(directory):
+    """
+    Determine if Vagrant created any VM from the
+    local directory. Vagrant records the ID of a
+    VM once the provider has created it, and only
+    removes it when the VM is destroyed.
+
+    :param directory: "location" of the Vagrant VMs
+    :return: whether or not any VM was created
+    """
+    return bool(glob(join(directory, '.vagrant', 'machines', '*', '*', 'id')))
+
+
+def destroy_vagrant_machines(directory):
+    """
+    Destroy every VM that Vagrant created from the
+    local directory.
+
+    :param directory: "location" of the Vagrant VMs
+    """
+    check_call(['vagrant', 'destroy', '--force'], cwd=directory)
 
 
 class VagrantVMMetadata(object):
@@ -6,13 +6,16 @@ from click import group, pass_context
 from .cli.bootstrap.group import bootstrap
 from .cli.build.build import build
 from .cli.config.group import configure
+from .cli.daemon.group import daemon
 from .cli.deprovision import deprovision
 from .cli.download.group import download
 from .cli.image_not_ready import image_not_ready
 from .cli.install.install import install
+from .cli.logs.group import logs
 from .cli.make.make import make
 from .cli.package.group import package
 from .cli.prepare.group import prepare
+from .cli.profile.group import profile
 from .cli.provision.group import provision
 from .cli.sync.group import sync
 from .cli.test.group import test
@@ -39,13 +42,16 @@ def oct_command(context):
 oct_command.add_command(bootstrap)
 oct_command.add_command(build)
 oct_command.add_command(configure)
+oct_command.add_command(daemon)
 oct_command.add_command(deprovision)
 oct_command.add_command(download)
 oct_command.add_command(image_not_ready)
 oct_command.add_command(install)
+oct_command.add_command(logs)
 oct_command.add_command(make)
 oct_command.add_command(prepare)
 oct_command.add_command(package)
+oct_command.add_command(profile)
 oct_command.add_command(provision)
 oct_command.add_command(sync)
 oct_command.add_command(test)
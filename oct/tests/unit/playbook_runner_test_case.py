@@ -40,17 +40,21 @@ class TestCaseParameters(object):
 
 
 class PlaybookRunCallSpecification(object):
-    def __init__(self, playbook_relative_path, playbook_variables=None, unexpected_playbook_variables=None):
+    def __init__(
+            self, playbook_relative_path, playbook_variables=None, unexpected_playbook_variables=None, option_overrides=None
+    ):
         """
         Specify a run_playbook call.
 
         :param playbook_relative_path: relative playbook path passed to the call
         :param playbook_variables: affirm that these variables are passed to the call
         :param unexpected_playbook_variables: affirm that these variables are not passed to the call
+        :param option_overrides: affirm that these Ansible option overrides are passed to the call
         """
         self.playbook_relative_path = playbook_relative_path
         self.playbook_variables = {} if playbook_variables is None else playbook_variables
         self.unexpected_playbook_variables = {} if unexpected_playbook_variables is None else unexpected_playbook_variables
+        self.option_overrides = option_overrides
 
 
 class PlaybookRunnerTestCase(TestCase):
@@ -72,10 +76,11 @@ class PlaybookRunnerTestCase(TestCase):
             patch.object(
                 target=Configuration,
                 attribute='run_playbook',
-                new=lambda _, playbook_relative_path, playbook_variables=None:
+                new=lambda _, playbook_relative_path, playbook_variables=None, option_overrides=None:
                 self._call_metadata.append(PlaybookRunCallSpecification(
                     playbook_relative_path=playbook_relative_path,
                     playbook_variables=playbook_variables,
+                    option_overrides=option_overrides,
                 )),
             ),
             patch.object(
@@ -166,6 +171,13 @@ class PlaybookRunnerTestCase(TestCase):
             for unexpected_variable in expected.unexpected_playbook_variables:
                 self.assertNotIn(member=unexpected_variable, container=actual.playbook_variables)
 
+            if expected.option_overrides is not None:
+                self.make_equality_assertion(
+                    actual=actual.option_overrides,
+                    expected=expected.option_overrides,
+                    message='{}: Invalid option overrides.'.format(prefix),
+                )
+
     def make_equality_assertion(self, actual, expected, message):
         """
         Make an assertion about equality, with a nice
@@ -0,0 +1,417 @@
+# coding=utf-8
+"""
+A utility module for writing jUnit XML reports incrementally,
+so that test cases are on disk as soon as they are recorded and
+reports for runs that died part of the way through can be
+recovered, and for the index of the reports for every run.
+"""
+from __future__ import absolute_import, division, print_function
+
+from errno import ENOENT, EWOULDBLOCK
+from fcntl import LOCK_EX, LOCK_NB, flock
+from os import listdir, makedirs, remove, rename
+from os.path import basename, exists, getmtime, join, splitext
+from re import sub
+from time import time
+from xml.etree.ElementTree import ParseError, iterparse, tostring
+from xml.sax.saxutils import quoteattr
+
+from junit_xml import TestSuite, _clean_illegal_xml_chars
+
+from .log_index import load_index, update_index
+
+# failure, error and skip details longer than this many
+# characters are written to their own file next to the
+# report and only the start of them kept in the report
+DEFAULT_OUTPUT_LIMIT = 64 * 1024
+
+# reports are written under this suffix until they are
+# complete, and may be recovered if the writer dies
+PARTIAL_SUFFIX = '.partial'
+
+# the counts of a test suite are not known until the suite
+# is finished, so we leave this much room for them in the
+# opening tag and fill it in once they are
+_COUNTS_WIDTH = 128
+
+_INDEX_FILE = 'index.json'
+_LOCK_FILE = 'index.lock'
+_REPORT_SUFFIX = '.xml'
+
+_HEADER = b'<?xml version="1.0" encoding="utf-8"?>\n'
+_RESULTS = ['failure', 'error', 'skipped']
+
+
+def junit_report_name(run_id, playbook):
+    """
+    Determine the name of the report for a playbook in a
+    run, so that reports sort in the order the runs were
+    started and can be found for a run without the index.
+
+    :param run_id: ID of the run
+    :param playbook: short name of the playbook
+    :return: file name for the report
+    """
+    return '{}_{}{}'.format(run_id, sub(r'[^A-Za-z0-9_.-]+', '-', playbook).strip('-'), _REPORT_SUFFIX)
+
+
+class TestCounts(object):
+    """
+    The counts that jUnit records for a suite of test cases.
+    """
+
+    def __init__(self):
+        self.tests = 0
+        self.failures = 0
+        self.errors = 0
+        self.skipped = 0
+        self.time = 0.0
+
+    def add(self, case_element):
+        """
+        Count a test case.
+
+        :param case_element: `testcase` XML element
+        """
+        self.tests += 1
+        self.failures += int(case_element.find('failure') is not None)
+        self.errors += int(case_element.find('error') is not None)
+        self.skipped += int(case_element.find('skipped') is not None)
+        self.time += float(case_element.get('time', 0))
+
+    def merge(self, other):
+        """
+        Add the counts of another suite to these.
+
+        :param other: TestCounts to add
+        """
+        self.tests += other.tests
+        self.failures += other.failures
+        self.errors += other.errors
+        self.skipped += other.skipped
+        self.time += other.time
+
+    def format(self):
+        """
+        Format the counts as XML attributes, padded to a
+        fixed width so they can be written over a placeholder.
+
+        :return: encoded attributes
+        """
+        attributes = 'errors="{}" failures="{}" skipped="{}" tests="{}" time="{:f}"'.format(
+            self.errors, self.failures, self.skipped, self.tests, self.time
+        )
+        return attributes.ljust(_COUNTS_WIDTH).encode('utf-8')
+
+
+class JUnitReportWriter(object):
+    """
+    Writes a jUnit XML report one test case at a time. Test
+    cases must be added suite by suite; adding a case for a
+    new suite closes the last one. The counts for every suite
+    and for the whole report are written over placeholders in
+    the opening tags once they are known. The report is written
+    under a partial name, locked, until it is closed.
+    """
+
+    def __init__(self, path, output_limit=DEFAULT_OUTPUT_LIMIT):
+        """
+        :param path: where the finished report should be
+        :param output_limit: details longer than this are moved to their own files
+        """
+        self.path = path
+        self.output_limit = output_limit
+        self.output_directory = '{}.output'.format(splitext(path)[0])
+        self.counts = TestCounts()
+
+        self._suite_name = None
+        self._suite_counts = None
+        self._suite_counts_offset = None
+        self._outputs = 0
+
+        self._file = open(path + PARTIAL_SUFFIX, 'wb')
+        # hold the lock for as long as we write, so nobody
+        # recovers a report that is still being written
+        flock(self._file.fileno(), LOCK_EX)
+        self._file.write(_HEADER)
+        self._file.write(b'<testsuites ')
+        self._counts_offset = self._file.tell()
+        self._file.write(self.counts.format() + b'>\n')
+
+    def add_case(self, suite_name, test_case):
+        """
+        Write a test case to the report.
+
+        :param suite_name: name of the suite the case belongs to
+        :param test_case: junit_xml TestCase to write
+        """
+        case_element = TestSuite(suite_name, [test_case]).build_xml_doc().find('testcase')
+        self.add_case_element(suite_name, case_element)
+
+    def add_case_element(self, suite_name, case_element):
+        """
+        Write a test case to the report.
+
+        :param suite_name: name of the suite the case belongs to
+        :param case_element: `testcase` XML element to write
+        """
+        if suite_name != self._suite_name:
+            self._close_suite()
+            self._open_suite(suite_name)
+
+        for result_element in case_element:
+            if result_element.tag in _RESULTS:
+                self._limit_output(result_element)
+
+        fragment = _clean_illegal_xml_chars(tostring(case_element, encoding='utf-8').decode('utf-8'))
+        self._file.write(b'\t\t' + fragment.strip().encode('utf-8') + b'\n')
+        self._suite_counts.add(case_element)
+        # the report is only of use after a crash if the
+        # cases we have seen are on disk when it happens
+        self._file.flush()
+
+    def close(self):
+        """
+        Finish the report and move it to its final name.
+        """
+        self._close_suite()
+        self._file.write(b'</testsuites>\n')
+        self._file.seek(self._counts_offset)
+        self._file.write(self.counts.format())
+        self._file.close()
+        rename(self.path + PARTIAL_SUFFIX, self.path)
+
+    def _open_suite(self, suite_name):
+        """
+        Write the opening tag for a suite, with a placeholder
+        for the counts.
+
+        :param suite_name: name of the suite
+        """
+        self._suite_name = suite_name
+        self._suite_counts = TestCounts()
+        self._file.write('\t<testsuite name={} '.format(quoteattr(suite_name)).encode('utf-8'))
+        self._suite_counts_offset = self._file.tell()
+        self._file.write(self._suite_counts.format() + b'>\n')
+
+    def _close_suite(self):
+        """
+        Write the closing tag for the open suite, if any,
+        and fill in its counts.
+        """
+        if self._suite_name is None:
+            return
+
+        self._file.write(b'\t</testsuite>\n')
+        end = self._file.tell()
+        self._file.seek(self._suite_counts_offset)
+        self._file.write(self._suite_counts.format())
+        self._file.seek(end)
+
+        self.counts.merge(self._suite_counts)
+        self._suite_name = None
+
+    def _limit_output(self, result_element):
+        """
+        Move details of a failure, error or skip that are too
+        long for the report into their own file, keeping only
+        the start of them and a pointer to the file.
+
+        :param result_element: `failure`, `error` or `skipped` element
+        """
+        if not self.output_limit:
+            return
+
+        for key in ['message', 'text']:
+            value = result_element.text if key == 'text' else result_element.get(key)
+            if not value or len(value) <= self.output_limit:
+                continue
+
+            if not exists(self.output_directory):
+                makedirs(self.output_directory)
+            self._outputs += 1
+            output_path = join(self.output_directory, '{}.txt'.format(self._outputs))
+            with open(output_path, 'wb') as output_file:
+                output_file.write(value.encode('utf-8'))
+
+            value = '{}\n... [truncated, see {} for the full output]'.format(value[:self.output_limit], output_path)
+            if key == 'text':
+                result_element.text = value
+            else:
+                result_element.set(key, value)
+
+
+def recover_partial_reports(directory):
+    """
+    Finish the reports in a directory whose writers died
+    before closing them, keeping every test case that was
+    written in full.
+
+    :param directory: directory holding the reports
+    :return: list of path, counts and time of the last write for every recovered report
+    """
+    recovered = []
+    for file_name in sorted(listdir(directory)):
+        if not file_name.endswith(PARTIAL_SUFFIX):
+            continue
+
+        partial_path = join(directory, file_name)
+        try:
+            partial_file = open(partial_path, 'rb')
+        except IOError as e:
+            if e.errno != ENOENT:
+                raise
+            # runs started together all recover at start-up,
+            # and another one has recovered the report already
+            continue
+
+        with partial_file:
+            try:
+                flock(partial_file.fileno(), LOCK_EX | LOCK_NB)
+            except IOError as e:
+                if e.errno != EWOULDBLOCK:
+                    raise
+                # the report is still being written
+                continue
+
+            path = partial_path[:-len(PARTIAL_SUFFIX)]
+            try:
+                modified = getmtime(partial_path)
+                rename(partial_path, path + '.recovering')
+            except OSError as e:
+                if e.errno != ENOENT:
+                    raise
+                # another run recovered the report between our
+                # opening it and taking the lock
+                continue
+            # the details of the cases were limited as they
+            # were written, so we must not limit them again
+            writer = JUnitReportWriter(path, output_limit=0)
+            try:
+                for suite_name, case_element in read_cases(partial_file):
+                    writer.add_case_element(suite_name, case_element)
+            finally:
+                writer.close()
+
+        remove(path + '.recovering')
+        recovered.append((path, writer.counts, modified))
+
+    return recovered
+
+
+def read_cases(report_file):
+    """
+    Lazily read the test cases in a report, stopping at the
+    first case that was not written in full.
+
+    :param report_file: open report file
+    :return: generator of suite name and `testcase` element
+    """
+    suite_name = None
+    try:
+        for event, element in iterparse(report_file, events=('start', 'end')):
+            if event == 'start' and element.tag == 'testsuite':
+                suite_name = element.get('name')
+            elif event == 'end' and element.tag == 'testcase':
+                yield suite_name, element
+                element.clear()
+            elif event == 'end' and element.tag == 'testsuite':
+                # drop the cases we have seen from the tree
+                element.clear()
+    except ParseError:
+        return
+
+
+class JUnitReportIndex(object):
+    """
+    The index of the jUnit reports in a directory. Every entry
+    records the run and playbook a report is for, when the run
+    started and ended and the counts of test cases in the report,
+    keyed by the name of the report, so that the newest report or
+    the failed reports for a playbook can be found without parsing
+    every report. All changes to the index are made while holding
+    an exclusive lock and written out atomically.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: directory holding the reports
+        """
+        self.directory = directory
+        self.index_path = join(directory, _INDEX_FILE)
+        self.lock_path = join(directory, _LOCK_FILE)
+
+    def load(self):
+        """
+        Load the index.
+
+        :return: map of report name to index entry
+        """
+        return load_index(self.index_path)
+
+    def reports(self, playbook=None, failed=False):
+        """
+        Find the reports in the index.
+
+        :param playbook: playbook the reports must be for
+        :param failed: only find reports with failed or errored test cases
+        :return: list of index entries, newest first
+        """
+        entries = [entry for entry in self.load().values() if playbook in [None, entry['playbook']]]
+        if failed:
+            entries = [entry for entry in entries if entry['failures'] or entry['errors']]
+
+        return sorted(entries, key=lambda entry: (entry['start'], entry['run_id']), reverse=True)
+
+    def record_start(self, report_name, run_id, playbook):
+        """
+        Record that a report has been started.
+
+        :param report_name: file name of the report
+        :param run_id: ID of the run
+        :param playbook: short name of the playbook
+        """
+        with update_index(self.index_path, self.lock_path) as entries:
+            entries[report_name] = {
+                'file': report_name,
+                'run_id': run_id,
+                'playbook': playbook,
+                'start': time(),
+                'end': None,
+                'duration': None,
+                'tests': 0,
+                'failures': 0,
+                'errors': 0,
+                'skipped': 0,
+                'recovered': False,
+            }
+
+    def record_end(self, report_name, counts, end=None, recovered=False):
+        """
+        Record that a report has been finished.
+
+        :param report_name: file name of the report
+        :param counts: TestCounts for the report
+        :param end: time the run ended, if not now
+        :param recovered: whether the report was recovered from a run that died
+        """
+        with update_index(self.index_path, self.lock_path) as entries:
+            if report_name not in entries:
+                return
+
+            entry = entries[report_name]
+            entry['end'] = end or time()
+            entry['duration'] = entry['end'] - entry['start']
+            entry['tests'] = counts.tests
+            entry['failures'] = counts.failures
+            entry['errors'] = counts.errors
+            entry['skipped'] = counts.skipped
+            entry['recovered'] = recovered
+
+    def recover(self):
+        """
+        Recover the reports whose writers died and record
+        them as finished.
+        """
+        for path, counts, modified in recover_partial_reports(self.directory):
+            self.record_end(basename(path), counts, end=modified, recovered=True)
@@ -0,0 +1,409 @@
+# coding=utf-8
+"""
+A utility module for the per-run log files that the log_results
+callback writes, the index that maps every run to its log file,
+the playbook it ran and when it ran, and the per-run indices of
+the task results in every log file.
+"""
+from __future__ import absolute_import, division, print_function
+
+from contextlib import contextmanager
+from datetime import datetime
+from errno import EEXIST, ENOENT
+from fcntl import LOCK_EX, flock
+from gzip import open as gzip_open
+from json import dump, load, loads
+from os import makedirs, remove, rename, stat, walk
+from os.path import dirname, exists, getmtime, getsize, join
+from time import time
+from uuid import uuid4
+
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_RETENTION_BYTES = 1024 * 1024 * 1024
+
+# directory under the log root holding per-run log files
+_RUN_DIRECTORY = 'runs'
+# directory under the log root holding output that was
+# too large to be written into the run logs themselves
+CONTENT_DIRECTORY = 'content'
+
+_INDEX_FILE = 'index.json'
+_LOCK_FILE = 'index.lock'
+_LOG_SUFFIX = '.log.gz'
+_EVENT_INDEX_SUFFIX = '.events.json'
+
+# callbacks that report the result of a task on a
+# host, and the status of the task that they report
+_RESULT_STATUSES = {
+    'v2_runner_on_ok': 'ok',
+    'v2_runner_on_failed': 'failed',
+    'v2_runner_on_skipped': 'skipped',
+    'v2_runner_on_unreachable': 'unreachable',
+    'v2_runner_on_async_ok': 'ok',
+    'v2_runner_on_async_failed': 'failed',
+    'v2_runner_item_on_ok': 'ok',
+    'v2_runner_item_on_failed': 'failed',
+    'v2_runner_item_on_skipped': 'skipped',
+}
+
+
+def new_run_id():
+    """
+    Generate an identifier for a playbook run that sorts
+    in the order the runs were started.
+
+    :return: the run ID
+    """
+    return '{:%Y%m%dT%H%M%SZ}-{}'.format(datetime.utcnow(), uuid4().hex[:8])
+
+
+def run_log_path(log_root, run_id):
+    """
+    Determine the location of the log file for a run.
+
+    :param log_root: root directory for logs
+    :param run_id: ID of the run
+    :return: absolute path to the compressed log file
+    """
+    return join(log_root, _RUN_DIRECTORY, run_id + _LOG_SUFFIX)
+
+
+def run_event_index_path(log_root, run_id):
+    """
+    Determine the location of the index of task results
+    in the log file for a run.
+
+    :param log_root: root directory for logs
+    :param run_id: ID of the run
+    :return: absolute path to the event index
+    """
+    return join(log_root, _RUN_DIRECTORY, run_id + _EVENT_INDEX_SUFFIX)
+
+
+def summarize_event(line_number, event):
+    """
+    Summarize an event in a run log for the event index, if
+    it reports the result of a task on a host.
+
+    :param line_number: line in the log holding the event
+    :param event: decoded event
+    :return: the summary, or None
+    """
+    if event.get('callback') not in _RESULT_STATUSES or 'host' not in event:
+        return None
+
+    status = _RESULT_STATUSES[event['callback']]
+    if status == 'ok' and isinstance(event.get('result'), dict) and event['result'].get('changed'):
+        status = 'changed'
+    if status == 'failed' and event.get('ignore_errors'):
+        status = 'ignored'
+
+    return {
+        'line': line_number,
+        'host': event['host'],
+        'name': event.get('name'),
+        'location': event.get('location'),
+        'status': status,
+    }
+
+
+def read_events(log_path):
+    """
+    Lazily decode the events in a run log, one line at a time.
+    Logs for runs that are still in progress may end part of
+    the way through an event, so we stop at the first event
+    that cannot be read.
+
+    :param log_path: path to the compressed log file
+    :return: generator of line number and decoded event
+    """
+    log_file = gzip_open(log_path, 'rb')
+    try:
+        line_number = 0
+        while True:
+            try:
+                line = log_file.readline()
+            except (EOFError, IOError):
+                return
+
+            if not line.endswith(b'\n'):
+                return
+
+            try:
+                event = loads(line.decode('utf-8'))
+            except ValueError:
+                return
+
+            yield line_number, event
+            line_number += 1
+    finally:
+        log_file.close()
+
+
+def write_event_index(path, summaries):
+    """
+    Atomically write the event index for a run.
+
+    :param path: path to the event index
+    :param summaries: summaries of the task results in the run
+    """
+    temporary_path = '{}.{}.tmp'.format(path, uuid4().hex)
+    with open(temporary_path, 'w') as index_file:
+        dump(summaries, index_file)
+    rename(temporary_path, path)
+
+
+def load_event_index(path):
+    """
+    Load the event index for a run, if it has been written.
+
+    :param path: path to the event index
+    :return: summaries of the task results in the run, or None
+    """
+    try:
+        with open(path) as index_file:
+            return load(index_file)
+    except IOError as e:
+        if e.errno != ENOENT:
+            raise
+        return None
+
+
+class RunLogIndex(object):
+    """
+    The index of playbook runs that have logs on disk. Every
+    entry records the log file, the playbook and the time range
+    of a run, keyed by the run ID. As many processes may run
+    playbooks at once, all changes to the index are made while
+    holding an exclusive lock and written out atomically, so
+    readers never need the lock.
+    """
+
+    def __init__(self, log_root):
+        """
+        :param log_root: root directory for logs
+        """
+        self.log_root = log_root
+        self.run_directory = join(log_root, _RUN_DIRECTORY)
+        self.index_path = join(self.run_directory, _INDEX_FILE)
+
+    def load(self):
+        """
+        Load the index.
+
+        :return: map of run ID to index entry
+        """
+        return load_index(self.index_path)
+
+    def lookup(self, run_id):
+        """
+        Find the index entry for a run.
+
+        :param run_id: ID of the run
+        :return: the index entry, or None
+        """
+        return self.load().get(run_id)
+
+    def record_start(self, run_id, playbook):
+        """
+        Record that a run has started.
+
+        :param run_id: ID of the run
+        :param playbook: playbook being run
+        """
+        with self._update() as entries:
+            entries[run_id] = {
+                'file': join(_RUN_DIRECTORY, run_id + _LOG_SUFFIX),
+                'playbook': playbook,
+                'start': time(),
+                'end': None,
+                'size': 0,
+            }
+
+    def record_end(self, run_id):
+        """
+        Record that a run has ended and how large its log is.
+
+        :param run_id: ID of the run
+        """
+        with self._update() as entries:
+            if run_id in entries:
+                entries[run_id]['end'] = time()
+                entries[run_id]['size'] = self._log_size(entries[run_id])
+
+    def prune(self, retention_days=DEFAULT_RETENTION_DAYS, retention_bytes=DEFAULT_RETENTION_BYTES):
+        """
+        Remove the logs for runs that are older than the retention
+        period, then remove logs for the oldest runs until the logs
+        and stored output that remain fit in the retention size.
+        Stored output is removed once no run has written it for the
+        retention period, or, while the logs do not fit, once every
+        run that could have written it has been removed: runs mark
+        the output they write as used, so output last used before
+        the oldest remaining run started belongs only to runs that
+        are gone.
+
+        :param retention_days: age past which logs are removed
+        :param retention_bytes: total size past which logs are removed
+        """
+        cutoff = time() - retention_days * 24 * 60 * 60
+        with self._update() as entries:
+            for entry in entries.values():
+                if entry['end'] is None:
+                    # runs that are still writing or that died
+                    # never recorded how large their log is
+                    entry['size'] = self._log_size(entry)
+
+            run_ids = sorted(entries, key=lambda run_id: entries[run_id]['start'])
+            content = self._stored_content()
+
+            total_size = sum(entries[run_id]['size'] for run_id in run_ids) + sum(size for _, size, _ in content)
+            running_starts = []
+            for run_id in run_ids:
+                threshold = cutoff
+                if total_size > retention_bytes:
+                    threshold = max(cutoff, min(running_starts + [entries[run_id]['start']]))
+                total_size -= self._prune_content(content, threshold)
+
+                if entries[run_id]['start'] >= cutoff and total_size <= retention_bytes:
+                    break
+
+                if entries[run_id]['start'] >= cutoff and entries[run_id]['end'] is None:
+                    # the run is still writing to its log
+                    running_starts.append(entries[run_id]['start'])
+                    continue
+
+                total_size -= entries[run_id]['size']
+                remove_if_exists(join(self.log_root, entries[run_id]['file']))
+                remove_if_exists(run_event_index_path(self.log_root, run_id))
+                del entries[run_id]
+            else:
+                threshold = cutoff
+                if total_size > retention_bytes:
+                    threshold = max(cutoff, min(running_starts + [time()]))
+                self._prune_content(content, threshold)
+
+    def _stored_content(self):
+        """
+        Find the output stored for runs.
+
+        :return: list of time of last use, size and path of the stored output, least recently used first
+        """
+        content = []
+        for directory, _, files in walk(join(self.log_root, CONTENT_DIRECTORY)):
+            for file_name in files:
+                path = join(directory, file_name)
+                try:
+                    stats = stat(path)
+                except OSError as e:
+                    if e.errno != ENOENT:
+                        raise
+                    continue
+
+                content.append((stats.st_mtime, stats.st_size, path))
+
+        return sorted(content)
+
+    def _prune_content(self, content, threshold):
+        """
+        Remove stored output last used before the threshold.
+
+        :param content: stored output from `_stored_content`, which is removed from
+        :param threshold: time before which stored output is removed
+        :return: the number of bytes removed
+        """
+        removed_size = 0
+        while content and content[0][0] < threshold:
+            _, size, path = content.pop(0)
+            try:
+                if getmtime(path) >= threshold:
+                    # a run has used the output since we looked
+                    continue
+            except OSError as e:
+                if e.errno != ENOENT:
+                    raise
+                continue
+
+            remove_if_exists(path)
+            removed_size += size
+
+        return removed_size
+
+    def _log_size(self, entry):
+        """
+        Determine the size of the log file for an entry.
+
+        :param entry: index entry
+        :return: size in bytes
+        """
+        path = join(self.log_root, entry['file'])
+        if not exists(path):
+            return 0
+
+        return getsize(path)
+
+    def _update(self):
+        """
+        Hold the index lock while the index is changed, then
+        write the changed index out atomically.
+
+        :return: context manager for the map of run ID to index entry
+        """
+        return update_index(self.index_path, join(self.run_directory, _LOCK_FILE))
+
+
+def load_index(path):
+    """
+    Load an index that is written with `update_index`.
+
+    :param path: path to the index
+    :return: map of key to index entry
+    """
+    try:
+        with open(path) as index_file:
+            return load(index_file)
+    except IOError as e:
+        if e.errno != ENOENT:
+            raise
+        return {}
+
+
+@contextmanager
+def update_index(path, lock_path):
+    """
+    Hold a lock while an index is changed, then write the
+    changed index out atomically, so that readers of the
+    index never need to take the lock.
+
+    :param path: path to the index
+    :param lock_path: path to the lock file guarding the index
+    :return: map of key to index entry, to change in place
+    """
+    try:
+        makedirs(dirname(path))
+    except OSError as e:
+        if e.errno != EEXIST:
+            raise
+
+    with open(lock_path, 'a') as lock_file:
+        flock(lock_file.fileno(), LOCK_EX)
+        entries = load_index(path)
+        yield entries
+
+        temporary_path = '{}.{}.tmp'.format(path, uuid4().hex)
+        with open(temporary_path, 'w') as index_file:
+            dump(entries, index_file, sort_keys=True)
+        rename(temporary_path, path)
+
+
+def remove_if_exists(path):
+    """
+    Remove a file, if it has not been removed already.
+
+    :param path: path to the file
+    """
+    try:
+        remove(path)
+    except OSError as e:
+        if e.errno != ENOENT:
+            raise
@@ -0,0 +1,147 @@
+# coding=utf-8
+"""
+A utility module for querying the per-run logs that the log_results
+callback writes. Queries are answered with a pipeline of generators,
+so that no more of any log is read than the query needs, and from
+the per-run event indices wherever they exist, so that most queries
+do not need to read any logs at all.
+"""
+from __future__ import absolute_import, division, print_function
+
+from os.path import exists
+
+from .log_index import RunLogIndex, load_event_index, read_events, run_event_index_path, run_log_path, summarize_event, \
+    write_event_index
+
+
+class LogQuery(object):
+    """
+    The criteria that task results must meet to match a query.
+    Criteria that are not set match every result.
+    """
+
+    def __init__(self, hosts=None, statuses=None, name=None, location=None):
+        """
+        :param hosts: hosts the task must have run on
+        :param statuses: statuses the task must have finished with
+        :param name: text the task name must contain
+        :param location: text the task location must contain
+        """
+        self.hosts = hosts
+        self.statuses = statuses
+        self.name = name
+        self.location = location
+
+    def matches(self, summary):
+        """
+        Determine if a summarized task result matches.
+
+        :param summary: summary of the task result
+        :return: whether or not the result matches
+        """
+        if self.hosts and summary['host'] not in self.hosts:
+            return False
+
+        if self.statuses and summary['status'] not in self.statuses:
+            return False
+
+        if self.name and self.name not in (summary['name'] or ''):
+            return False
+
+        if self.location and self.location not in (summary['location'] or ''):
+            return False
+
+        return True
+
+
+def selected_runs(entries, run_ids=None, last=None):
+    """
+    Determine the runs to query, oldest first.
+
+    :param entries: map of run ID to run log index entry
+    :param run_ids: runs to query, if not all runs
+    :param last: number of most recent runs to query
+    :return: list of run IDs
+    """
+    runs = sorted(entries, key=lambda run_id: entries[run_id]['start'])
+
+    if run_ids:
+        runs = [run_id for run_id in runs if run_id in run_ids]
+
+    if last:
+        runs = runs[-last:]
+
+    return runs
+
+
+def run_summaries(log_root, run_id, finished):
+    """
+    Summarize the task results in a run, using the event index
+    for the run if it exists. When it does not, we read the log
+    and, if the run has finished and its log will not change any
+    more, write the event index so we do not need to read the log
+    for this run again.
+
+    :param log_root: root directory for logs
+    :param run_id: ID of the run
+    :param finished: whether or not the run has finished
+    :return: generator of task result summaries
+    """
+    index_path = run_event_index_path(log_root, run_id)
+    summaries = load_event_index(index_path)
+    if summaries is not None:
+        for summary in summaries:
+            yield summary
+        return
+
+    log_path = run_log_path(log_root, run_id)
+    if not exists(log_path):
+        return
+
+    summaries = []
+    for line_number, event in read_events(log_path):
+        summary = summarize_event(line_number, event)
+        if summary:
+            summaries.append(summary)
+            yield summary
+
+    if finished:
+        write_event_index(index_path, summaries)
+
+
+def query_runs(log_root, query, run_ids=None, last=None):
+    """
+    Find the task results in the runs that match the query.
+
+    :param log_root: root directory for logs
+    :param query: LogQuery to match
+    :param run_ids: runs to query, if not all runs
+    :param last: number of most recent runs to query
+    :return: generator of run ID and matching task result summary
+    """
+    entries = RunLogIndex(log_root).load()
+    for run_id in selected_runs(entries, run_ids, last):
+        finished = entries[run_id]['end'] is not None
+        for summary in run_summaries(log_root, run_id, finished):
+            if query.matches(summary):
+                yield run_id, summary
+
+
+def with_events(log_root, matches):
+    """
+    Attach the full logged event to every match, reading each
+    run log only as far as the last matching line in it.
+
+    :param log_root: root directory for logs
+    :param matches: generator of run ID and task result summary
+    :return: generator of run ID, summary and decoded event
+    """
+    current_run_id, events = None, None
+    for run_id, summary in matches:
+        if run_id != current_run_id:
+            current_run_id, events = run_id, read_events(run_log_path(log_root, run_id))
+
+        for line_number, event in events:
+            if line_number == summary['line']:
+                yield run_id, summary, event
+                break
@@ -0,0 +1,109 @@
+# coding=utf-8
+"""
+A utility module for running work concurrently, with each unit of
+work isolated in its own process so that the global state Ansible
+keeps does not leak between them.
+"""
+from __future__ import absolute_import, division, print_function
+
+from multiprocessing import Process
+from multiprocessing.pool import ThreadPool
+from os import dup2
+from sys import exit, stderr, stdout
+from timeit import default_timer as timer
+
+from click import ClickException
+
+
+class ParallelJob(object):
+    """
+    A named unit of work and the file its output goes to.
+    """
+
+    def __init__(self, name, func, log_file):
+        """
+        :param name: name to report the job with
+        :param func: function to run, without arguments
+        :param log_file: file to write the job's output to
+        """
+        self.name = name
+        self.func = func
+        self.log_file = log_file
+
+
+class ParallelJobResult(object):
+    """
+    The outcome of a ParallelJob.
+    """
+
+    def __init__(self, name, succeeded, elapsed_time, log_file):
+        """
+        :param name: name of the job
+        :param succeeded: whether or not the job succeeded
+        :param elapsed_time: wall-clock duration of the job in seconds
+        :param log_file: file the job's output went to
+        """
+        self.name = name
+        self.succeeded = succeeded
+        self.elapsed_time = elapsed_time
+        self.log_file = log_file
+
+    def format_runtime(self):
+        """
+        Format the runtime of the job as MM:SS.SSS.
+
+        :return: formatted time
+        """
+        return '{:02.0f}:{:06.3f}'.format(*divmod(self.elapsed_time, 60))
+
+
+def run_in_parallel(jobs, workers):
+    """
+    Run the jobs with at most `workers` running at once.
+
+    :param jobs: list of ParallelJobs to run
+    :param workers: maximum number of concurrent jobs
+    :return: list of ParallelJobResults, in the order of the jobs
+    """
+    if not jobs:
+        return []
+
+    pool = ThreadPool(processes=min(workers, len(jobs)))
+    try:
+        return pool.map(run_isolated, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run_isolated(job):
+    """
+    Run the job in a child process and wait for it.
+
+    :param job: ParallelJob to run
+    :return: ParallelJobResult for the job
+    """
+    start_time = timer()
+    process = Process(target=run_with_output_to_file, args=(job.func, job.log_file))
+    process.start()
+    process.join()
+    return ParallelJobResult(job.name, process.exitcode == 0, timer() - start_time, job.log_file)
+
+
+def run_with_output_to_file(func, log_file):
+    """
+    Run the function with std{out,err} sent to the log file,
+    exiting non-zero if the function raises.
+
+    :param func: function to run, without arguments
+    :param log_file: file to write output to
+    """
+    with open(log_file, 'w') as log:
+        dup2(log.fileno(), stdout.fileno())
+        dup2(log.fileno(), stderr.fileno())
+
+    try:
+        func()
+    except ClickException as e:
+        e.show()
+        exit(e.exit_code)
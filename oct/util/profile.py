@@ -0,0 +1,366 @@
+# coding=utf-8
+"""
+A utility module for the task timing profiles that the
+record_profile callback writes for playbook runs when the
+user asks for `--profile`, and for aggregating them across
+runs to find where the time in a playbook goes.
+"""
+from __future__ import absolute_import, division, print_function
+
+from csv import DictReader, DictWriter
+from errno import EEXIST
+from os import listdir, makedirs, rename
+from os.path import basename, dirname, join, normpath, sep, splitext
+from uuid import uuid4
+
+try:
+    text_type = unicode  # for python 2
+except NameError:
+    text_type = str  # for python 3
+
+# every profile holds one row per task result, recording
+# where the task came from, which host it ran on, when
+# it started relative to the start of the playbook and
+# how long the host took to finish it, in seconds
+PROFILE_FIELDS = ['playbook', 'play', 'role', 'task', 'location', 'host', 'status', 'start', 'duration']
+
+_PROFILE_SUFFIX = '.csv'
+
+
+def profile_path(profile_root, run_id):
+    """
+    Determine the location of the profile for a run.
+
+    :param profile_root: root directory for profiles
+    :param run_id: ID of the run
+    :return: absolute path to the profile
+    """
+    return join(profile_root, run_id + _PROFILE_SUFFIX)
+
+
+def profiled_runs(profile_root):
+    """
+    Determine the runs that have been profiled. Run IDs
+    sort in the order the runs were started.
+
+    :param profile_root: root directory for profiles
+    :return: run IDs, oldest first
+    """
+    try:
+        file_names = listdir(profile_root)
+    except OSError:
+        return []
+
+    return sorted(file_name[:-len(_PROFILE_SUFFIX)] for file_name in file_names if file_name.endswith(_PROFILE_SUFFIX))
+
+
+def short_playbook_name(playbook_file):
+    """
+    Determine a short name for a playbook, relative to
+    the playbook directory it was found in, if any.
+
+    :param playbook_file: path to the playbook
+    :return: name like `prepare/main`
+    """
+    path = splitext(normpath(playbook_file))[0].split(sep)
+    if 'playbooks' in path[:-1]:
+        last_index = len(path) - 1 - path[::-1].index('playbooks')
+        return '/'.join(path[last_index + 1:])
+
+    return basename(path[-1])
+
+
+def write_profile(path, records):
+    """
+    Atomically write the profile for a run, so that a
+    profile that exists on disk is always complete.
+
+    :param path: path to the profile
+    :param records: task result records
+    """
+    try:
+        makedirs(dirname(path))
+    except OSError as e:
+        if e.errno != EEXIST:
+            raise
+
+    temporary_path = '{}.{}.tmp'.format(path, uuid4().hex)
+    with _open_csv(temporary_path, 'w') as profile_file:
+        writer = DictWriter(profile_file, fieldnames=PROFILE_FIELDS)
+        writer.writeheader()
+        for record in records:
+            row = dict((field, _to_native(record[field])) for field in PROFILE_FIELDS)
+            row['start'] = '{:.3f}'.format(record['start'])
+            row['duration'] = '{:.3f}'.format(record['duration'])
+            writer.writerow(row)
+    rename(temporary_path, path)
+
+
+def read_profile(path):
+    """
+    Read the task result records in a profile.
+
+    :param path: path to the profile
+    :return: list of task result records
+    """
+    records = []
+    with _open_csv(path, 'r') as profile_file:
+        for row in DictReader(profile_file):
+            record = dict((field, _from_native(row[field])) for field in PROFILE_FIELDS)
+            record['start'] = float(record['start'])
+            record['duration'] = float(record['duration'])
+            records.append(record)
+
+    return records
+
+
+def _open_csv(path, mode):
+    """
+    Open a file for the `csv` module, which needs a
+    binary file on Python 2 and a text file on Python 3.
+
+    :param path: path to the file
+    :param mode: `r` or `w`
+    :return: the open file
+    """
+    if str is bytes:
+        return open(path, mode + 'b')
+
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def _to_native(value):
+    """
+    Convert a value to a native string for the `csv` module.
+
+    :param value: value to convert
+    :return: native string
+    """
+    if str is bytes and isinstance(value, text_type):
+        return value.encode('utf-8')
+
+    return str(value)
+
+
+def _from_native(value):
+    """
+    Convert a native string from the `csv` module to text.
+
+    :param value: value to convert
+    :return: text
+    """
+    if str is bytes:
+        return value.decode('utf-8')
+
+    return value
+
+
+def task_key(record):
+    """
+    Identify the task a record is for, across runs.
+
+    :param record: task result record
+    :return: playbook, role, task name and location
+    """
+    return record['playbook'], record['role'], record['task'], record['location']
+
+
+def task_executions(records):
+    """
+    Collapse the per-host records for every execution of a task
+    in a run into one execution. Hosts run each task in lockstep,
+    so the execution takes as long as the slowest host takes and
+    that is the time the task adds to the critical path.
+
+    :param records: task result records for one run
+    :return: list of executions, in the order they started
+    """
+    executions = {}
+    for record in records:
+        execution_key = task_key(record) + (record['play'], record['start'])
+        execution = executions.get(execution_key)
+        if execution is None:
+            execution = executions[execution_key] = {
+                'key': task_key(record),
+                'playbook': record['playbook'],
+                'role': record['role'],
+                'start': record['start'],
+                'duration': 0.0,
+                'host': None,
+            }
+
+        if execution['host'] is None or record['duration'] > execution['duration']:
+            execution['duration'] = record['duration']
+            execution['host'] = record['host']
+
+    return sorted(executions.values(), key=lambda execution: execution['start'])
+
+
+class TaskStatistics(object):
+    """
+    The time a task took across many runs. If a task ran
+    more than once in a run, its executions are summed.
+    """
+
+    def __init__(self, key):
+        """
+        :param key: playbook, role, task name and location
+        """
+        self.key = key
+        # time the task took in every run, keyed by run ID
+        self.durations = {}
+        # host that took longest on the slowest execution
+        self.slowest_host = None
+        self._slowest_execution = 0.0
+
+    def add(self, run_id, execution):
+        """
+        Account for an execution of the task in a run.
+
+        :param run_id: ID of the run
+        :param execution: collapsed task execution
+        """
+        self.durations[run_id] = self.durations.get(run_id, 0.0) + execution['duration']
+        if self.slowest_host is None or execution['duration'] > self._slowest_execution:
+            self.slowest_host = execution['host']
+            self._slowest_execution = execution['duration']
+
+    @property
+    def mean(self):
+        """
+        :return: mean time the task took per run
+        """
+        return sum(self.durations.values()) / len(self.durations)
+
+    @property
+    def maximum(self):
+        """
+        :return: most time the task took in one run
+        """
+        return max(self.durations.values())
+
+
+def task_statistics(profiles):
+    """
+    Aggregate the time every task took across runs.
+
+    :param profiles: map of run ID to task result records
+    :return: map of task key to TaskStatistics
+    """
+    statistics = {}
+    for run_id in profiles:
+        for execution in task_executions(profiles[run_id]):
+            if execution['key'] not in statistics:
+                statistics[execution['key']] = TaskStatistics(execution['key'])
+            statistics[execution['key']].add(run_id, execution)
+
+    return statistics
+
+
+def slowest_tasks(statistics, limit):
+    """
+    Find the tasks that took the most time per run.
+
+    :param statistics: map of task key to TaskStatistics
+    :param limit: number of tasks to return
+    :return: list of TaskStatistics, slowest first
+    """
+    return sorted(statistics.values(), key=lambda task: task.mean, reverse=True)[:limit]
+
+
+def regressions(baseline, current, threshold, minimum_change):
+    """
+    Find the tasks that take longer now than they did in the
+    baseline runs, by more than the threshold fraction and by
+    more than the minimum change, so that noise in the timing
+    of short tasks is not reported.
+
+    :param baseline: map of task key to TaskStatistics for the baseline runs
+    :param current: map of task key to TaskStatistics for the runs to compare
+    :param threshold: fractional increase past which a task has regressed
+    :param minimum_change: increase in seconds below which a task has not regressed
+    :return: list of baseline and current TaskStatistics, largest increase first
+    """
+    regressed = []
+    for key in current:
+        if key not in baseline:
+            continue
+
+        change = current[key].mean - baseline[key].mean
+        if change > minimum_change and change > baseline[key].mean * threshold:
+            regressed.append((baseline[key], current[key]))
+
+    return sorted(regressed, key=lambda pair: pair[1].mean - pair[0].mean, reverse=True)
+
+
+class CriticalPath(object):
+    """
+    The time a playbook spent on its critical path across many
+    runs, and how much of that time was spent in every role.
+    """
+
+    def __init__(self, playbook):
+        """
+        :param playbook: short name of the playbook
+        """
+        self.playbook = playbook
+        # critical path time in every run, keyed by run ID
+        self.durations = {}
+        # wall-clock time of every run, keyed by run ID
+        self.wall_clock_times = {}
+        # critical path time per role summed over all runs
+        self.role_durations = {}
+
+    @property
+    def mean(self):
+        """
+        :return: mean critical path time per run
+        """
+        return sum(self.durations.values()) / len(self.durations)
+
+    @property
+    def mean_wall_clock_time(self):
+        """
+        :return: mean wall-clock time per run
+        """
+        return sum(self.wall_clock_times.values()) / len(self.wall_clock_times)
+
+    def mean_role_durations(self):
+        """
+        :return: role and mean critical path time per run, slowest first
+        """
+        runs = len(self.durations)
+        return sorted(((role, total / runs)
+                       for role, total in self.role_durations.items()), key=lambda pair: pair[1], reverse=True)
+
+
+def critical_paths(profiles):
+    """
+    Determine the critical path of every playbook. Tasks in a
+    play run one after another, so the critical path is made
+    of every task execution, each taking as long as the slowest
+    host took. Time spent outside of tasks, like gathering the
+    inventory, is not part of any task and shows as the gap to
+    the wall-clock time of the run.
+
+    :param profiles: map of run ID to task result records
+    :return: map of playbook name to CriticalPath
+    """
+    paths = {}
+    for run_id in profiles:
+        records = profiles[run_id]
+        for execution in task_executions(records):
+            playbook = execution['playbook']
+            if playbook not in paths:
+                paths[playbook] = CriticalPath(playbook)
+            path = paths[playbook]
+
+            path.durations[run_id] = path.durations.get(run_id, 0.0) + execution['duration']
+            role = execution['role'] or '(no role)'
+            path.role_durations[role] = path.role_durations.get(role, 0.0) + execution['duration']
+
+        for record in records:
+            path = paths[record['playbook']]
+            path.wall_clock_times[run_id] = max(path.wall_clock_times.get(run_id, 0.0), record['start'] + record['duration'])
+
+    return paths
@@ -0,0 +1,144 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from errno import ENOENT
+from os import listdir
+from os.path import exists, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from xml.etree.ElementTree import parse
+
+from junit_xml import TestCase as JUnitTestCase
+from mock import patch
+
+from oct.util.junit_report import PARTIAL_SUFFIX, JUnitReportIndex, JUnitReportWriter, TestCounts, junit_report_name, \
+    recover_partial_reports
+
+
+def test_case(name, failure=None, skipped=None):
+    case = JUnitTestCase(name=name, elapsed_sec=1.5)
+    if failure:
+        case.add_failure_info(failure)
+    if skipped:
+        case.add_skipped_info(skipped)
+    return case
+
+
+class JUnitReportTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.addCleanup(rmtree, self.directory)
+        self.path = join(self.directory, 'report.xml')
+
+    def test_counts(self):
+        writer = JUnitReportWriter(self.path)
+        writer.add_case('first', test_case(u'install ☃'))
+        writer.add_case('first', test_case('build', failure='it broke'))
+        writer.add_case('second', test_case('test', skipped='not needed'))
+        self.assertTrue(exists(self.path + PARTIAL_SUFFIX))
+        writer.close()
+
+        self.assertFalse(exists(self.path + PARTIAL_SUFFIX))
+        root = parse(self.path).getroot()
+        self.assertEqual(root.get('tests'), '3')
+        self.assertEqual(root.get('failures'), '1')
+        self.assertEqual(root.get('skipped'), '1')
+        self.assertEqual(float(root.get('time')), 4.5)
+
+        suites = root.findall('testsuite')
+        self.assertEqual([suite.get('name') for suite in suites], ['first', 'second'])
+        self.assertEqual([suite.get('tests') for suite in suites], ['2', '1'])
+        self.assertEqual([suite.get('failures') for suite in suites], ['1', '0'])
+        self.assertEqual(suites[0].findall('testcase')[0].get('name'), u'install ☃')
+        self.assertEqual(suites[0].find('testcase/failure').get('message'), 'it broke')
+
+    def test_output_limit(self):
+        writer = JUnitReportWriter(self.path, output_limit=10)
+        writer.add_case('first', test_case('build', failure='x' * 20))
+        writer.close()
+
+        message = parse(self.path).getroot().find('testsuite/testcase/failure').get('message')
+        output_directory = join(self.directory, 'report.output')
+        self.assertTrue(message.startswith('x' * 10 + '\n'))
+        self.assertIn(join(output_directory, '1.txt'), message)
+        with open(join(output_directory, '1.txt')) as output_file:
+            self.assertEqual(output_file.read(), 'x' * 20)
+
+    def test_recovery(self):
+        writer = JUnitReportWriter(self.path)
+        writer.add_case('first', test_case('install'))
+        writer.add_case('second', test_case('build', failure='it broke'))
+        writer.add_case('second', test_case('test'))
+        # simulate the writer dying part of the way through a case
+        writer._file.seek(-10, 2)
+        writer._file.truncate()
+        writer._file.close()
+
+        recovered = recover_partial_reports(self.directory)
+        self.assertEqual([(path, counts.tests) for path, counts, _ in recovered], [(self.path, 2)])
+        self.assertEqual(sorted(listdir(self.directory)), ['report.xml'])
+
+        root = parse(self.path).getroot()
+        self.assertEqual(root.get('tests'), '2')
+        self.assertEqual(root.get('failures'), '1')
+        self.assertEqual([suite.get('name') for suite in root.findall('testsuite')], ['first', 'second'])
+
+    def test_recovery_skips_open_reports(self):
+        writer = JUnitReportWriter(self.path)
+        writer.add_case('first', test_case('install'))
+
+        self.assertEqual(recover_partial_reports(self.directory), [])
+        writer.close()
+        self.assertEqual(parse(self.path).getroot().get('tests'), '1')
+
+    def test_recovery_skips_reports_recovered_elsewhere(self):
+        # another run recovered the report after we listed it
+        with patch('oct.util.junit_report.listdir', return_value=['gone.xml' + PARTIAL_SUFFIX]):
+            self.assertEqual(recover_partial_reports(self.directory), [])
+
+        # another run recovered the report after we opened it
+        writer = JUnitReportWriter(self.path)
+        writer._file.close()
+        with patch('oct.util.junit_report.getmtime', side_effect=OSError(ENOENT, 'No such file or directory')):
+            self.assertEqual(recover_partial_reports(self.directory), [])
+        self.assertEqual(sorted(listdir(self.directory)), ['report.xml' + PARTIAL_SUFFIX])
+
+    def test_report_name(self):
+        self.assertEqual(
+            junit_report_name('20170301T120000Z-0123abcd', 'prepare/main'), '20170301T120000Z-0123abcd_prepare-main.xml'
+        )
+        self.assertEqual(junit_report_name('run', '/tmp/my site.yml'), 'run_tmp-my-site.yml.xml')
+
+    def test_index(self):
+        index = JUnitReportIndex(self.directory)
+        failed_counts = TestCounts()
+        failed_counts.tests, failed_counts.failures = 3, 1
+
+        index.record_start('first.xml', 'first', 'prepare/main')
+        index.record_end('first.xml', failed_counts, end=index.load()['first.xml']['start'] + 5)
+        index.record_start('second.xml', 'second', 'prepare/main')
+        index.record_end('second.xml', TestCounts())
+        index.record_start('third.xml', 'third', 'build/main')
+
+        self.assertEqual([entry['run_id'] for entry in index.reports()], ['third', 'second', 'first'])
+        self.assertEqual([entry['run_id'] for entry in index.reports(playbook='prepare/main')], ['second', 'first'])
+        self.assertEqual([entry['run_id'] for entry in index.reports(failed=True)], ['first'])
+
+        first = index.load()['first.xml']
+        self.assertEqual((first['tests'], first['failures']), (3, 1))
+        self.assertAlmostEqual(first['duration'], 5)
+        self.assertIsNone(index.load()['third.xml']['end'])
+
+    def test_index_recovery(self):
+        index = JUnitReportIndex(self.directory)
+        index.record_start('report.xml', 'run', 'prepare/main')
+        writer = JUnitReportWriter(self.path)
+        writer.add_case('first', test_case('build', failure='it broke'))
+        writer._file.close()
+
+        index.recover()
+        entry = index.load()['report.xml']
+        self.assertTrue(entry['recovered'])
+        self.assertEqual((entry['tests'], entry['failures']), (1, 1))
+        self.assertEqual([entry['run_id'] for entry in index.reports(failed=True)], ['run'])
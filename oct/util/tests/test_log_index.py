@@ -0,0 +1,116 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from os import makedirs, utime
+from os.path import dirname, exists, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import time
+from unittest import TestCase
+
+from oct.util.log_index import CONTENT_DIRECTORY, RunLogIndex, run_log_path
+
+
+class RunLogIndexTestCase(TestCase):
+    def setUp(self):
+        self.log_root = mkdtemp()
+        self.addCleanup(rmtree, self.log_root)
+        self.index = RunLogIndex(self.log_root)
+
+    def write_run(self, run_id, size, age_days=0):
+        """
+        Record a finished run with a log of the given size.
+
+        :param run_id: ID of the run
+        :param size: size of the log in bytes
+        :param age_days: how long ago the run started
+        """
+        self.index.record_start(run_id, 'playbook.yml')
+        with open(run_log_path(self.log_root, run_id), 'wb') as log_file:
+            log_file.write(b'x' * size)
+        self.index.record_end(run_id)
+
+        with self.index._update() as entries:
+            entries[run_id]['start'] -= age_days * 24 * 60 * 60
+
+    def test_record(self):
+        self.write_run('run', 10)
+        entry = self.index.lookup('run')
+        self.assertEqual(entry['playbook'], 'playbook.yml')
+        self.assertEqual(entry['size'], 10)
+        self.assertLessEqual(entry['start'], entry['end'])
+        self.assertIsNone(self.index.lookup('missing'))
+
+    def test_prune_by_age(self):
+        self.write_run('old', 10, age_days=10)
+        self.write_run('new', 10)
+        self.index.prune(retention_days=5, retention_bytes=100)
+        self.assertEqual(sorted(self.index.load()), ['new'])
+        self.assertFalse(exists(run_log_path(self.log_root, 'old')))
+        self.assertTrue(exists(run_log_path(self.log_root, 'new')))
+
+    def test_prune_by_size(self):
+        self.write_run('first', 10, age_days=3)
+        self.write_run('second', 10, age_days=2)
+        self.write_run('third', 10, age_days=1)
+        self.index.prune(retention_days=5, retention_bytes=20)
+        self.assertEqual(sorted(self.index.load()), ['second', 'third'])
+
+    def test_prune_keeps_running(self):
+        self.index.record_start('running', 'playbook.yml')
+        self.write_run('finished', 10)
+        self.index.prune(retention_days=5, retention_bytes=0)
+        self.assertEqual(sorted(self.index.load()), ['running'])
+
+    def write_content(self, name, size, age_days=0):
+        """
+        Store output last used some time ago.
+
+        :param name: name of the stored output
+        :param size: size of the output in bytes
+        :param age_days: how long ago the output was last used
+        :return: path to the stored output
+        """
+        path = join(self.log_root, CONTENT_DIRECTORY, name[:2], name)
+        if not exists(dirname(path)):
+            makedirs(dirname(path))
+        with open(path, 'wb') as content_file:
+            content_file.write(b'x' * size)
+        used = time() - age_days * 24 * 60 * 60
+        utime(path, (used, used))
+        return path
+
+    def test_prune_counts_content(self):
+        self.write_run('first', 10, age_days=3)
+        first_content = self.write_content('abc', 30, age_days=2.9)
+        self.write_run('second', 10, age_days=1)
+        second_content = self.write_content('def', 20)
+
+        self.index.prune(retention_days=5, retention_bytes=40)
+        self.assertEqual(sorted(self.index.load()), ['second'])
+        # output last used before the oldest remaining run was only used by removed runs
+        self.assertFalse(exists(first_content))
+        self.assertTrue(exists(second_content))
+
+    def test_prune_counts_runs_without_end(self):
+        self.write_run('old', 10, age_days=3)
+        self.index.record_start('crashed', 'playbook.yml')
+        with open(run_log_path(self.log_root, 'crashed'), 'wb') as log_file:
+            log_file.write(b'x' * 30)
+
+        self.index.prune(retention_days=5, retention_bytes=35)
+        self.assertEqual(sorted(self.index.load()), ['crashed'])
+        self.assertEqual(self.index.lookup('crashed')['size'], 30)
+
+    def test_prune_content(self):
+        old_content = join(self.log_root, CONTENT_DIRECTORY, 'ab', 'abc')
+        new_content = join(self.log_root, CONTENT_DIRECTORY, 'de', 'def')
+        for path in [old_content, new_content]:
+            makedirs(dirname(path))
+            open(path, 'w').close()
+        old_time = time() - 10 * 24 * 60 * 60
+        utime(old_content, (old_time, old_time))
+
+        self.index.prune(retention_days=5)
+        self.assertFalse(exists(old_content))
+        self.assertTrue(exists(new_content))
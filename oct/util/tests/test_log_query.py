@@ -0,0 +1,113 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from gzip import open as gzip_open
+from json import dumps
+from os.path import exists
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from oct.util.log_index import RunLogIndex, run_event_index_path, run_log_path
+from oct.util.log_query import LogQuery, query_runs, with_events
+
+
+class LogQueryTestCase(TestCase):
+    def setUp(self):
+        self.log_root = mkdtemp()
+        self.addCleanup(rmtree, self.log_root)
+        self.index = RunLogIndex(self.log_root)
+
+    def write_run(self, run_id, events, finished=True):
+        """
+        Write a run log holding the events, without an event index.
+
+        :param run_id: ID of the run
+        :param events: events to log
+        :param finished: whether or not the run has finished
+        """
+        self.index.record_start(run_id, 'playbook.yml')
+        with gzip_open(run_log_path(self.log_root, run_id), 'wb') as log_file:
+            for event in events:
+                log_file.write((dumps(event) + '\n').encode('utf-8'))
+        if finished:
+            self.index.record_end(run_id)
+
+    def test_query(self):
+        self.write_run(
+            'first', [
+                {
+                    'callback': 'v2_playbook_on_start'
+                },
+                {
+                    'callback': 'v2_runner_on_ok',
+                    'host': 'one',
+                    'name': 'task',
+                    'location': 'main.yml:1',
+                    'result': {}
+                },
+                {
+                    'callback': 'v2_runner_on_failed',
+                    'host': 'two',
+                    'name': 'task',
+                    'location': 'main.yml:1'
+                },
+            ]
+        )
+        self.write_run(
+            'second', [
+                {
+                    'callback': 'v2_runner_on_failed',
+                    'host': 'one',
+                    'name': 'other',
+                    'location': 'main.yml:5'
+                },
+                {
+                    'callback': 'v2_runner_on_failed',
+                    'host': 'one',
+                    'name': 'last',
+                    'location': 'main.yml:9',
+                    'ignore_errors': True
+                },
+            ]
+        )
+
+        matches = list(query_runs(self.log_root, LogQuery(hosts=['one'], statuses=['failed'])))
+        self.assertEqual([(run_id, summary['name'], summary['line']) for run_id, summary in matches], [('second', 'other', 0)])
+
+        matches = list(query_runs(self.log_root, LogQuery(location='main.yml:1'), last=1))
+        self.assertEqual(matches, [])
+
+        matches = list(query_runs(self.log_root, LogQuery(statuses=['ok', 'ignored'])))
+        self.assertEqual([summary['name'] for _, summary in matches], ['task', 'last'])
+
+    def test_event_index_written_for_finished_runs(self):
+        self.write_run('finished', [{'callback': 'v2_runner_on_ok', 'host': 'one'}])
+        self.write_run('running', [{'callback': 'v2_runner_on_ok', 'host': 'one'}], finished=False)
+
+        self.assertEqual(len(list(query_runs(self.log_root, LogQuery()))), 2)
+        self.assertTrue(exists(run_event_index_path(self.log_root, 'finished')))
+        self.assertFalse(exists(run_event_index_path(self.log_root, 'running')))
+
+    def test_with_events(self):
+        events = [
+            {
+                'callback': 'v2_runner_on_ok',
+                'host': 'one',
+                'name': 'first'
+            },
+            {
+                'callback': 'v2_runner_on_skipped',
+                'host': 'one',
+                'name': 'second'
+            },
+            {
+                'callback': 'v2_runner_on_ok',
+                'host': 'one',
+                'name': 'third'
+            },
+        ]
+        self.write_run('run', events)
+
+        matches = query_runs(self.log_root, LogQuery(statuses=['ok']))
+        self.assertEqual([event for _, _, event in with_events(self.log_root, matches)], [events[0], events[2]])
@@ -0,0 +1,137 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+import sys
+from hashlib import sha1
+from os import listdir
+from os.path import abspath, dirname, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from mock import Mock
+
+from oct.util.log_index import CONTENT_DIRECTORY, read_events
+
+# callback plugins are not part of a package, so we
+# import them from the plugin directory directly
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', '..', 'ansible', 'oct', 'callback_plugins'))
+from log_results import AsynchronousLogWriter  # noqa: E402
+
+
+class AsynchronousLogWriterTestCase(TestCase):
+    def setUp(self):
+        self.log_root = mkdtemp()
+        self.addCleanup(rmtree, self.log_root)
+
+    def writer(self, output_limit=10, truncate_output=False):
+        writer = AsynchronousLogWriter(
+            log_directory=self.log_root,
+            log_path=join(self.log_root, 'run.log.gz'),
+            event_index_path=join(self.log_root, 'run.index'),
+            output_limit=output_limit,
+            truncate_output=truncate_output,
+        )
+        self.addCleanup(writer.close)
+        return writer
+
+    def stored_content(self):
+        """
+        Determine what output has been stored outside of the log.
+
+        :return: paths to stored output, relative to the content directory
+        """
+        content_root = join(self.log_root, CONTENT_DIRECTORY)
+        try:
+            return sorted(join(prefix, name) for prefix in listdir(content_root) for name in listdir(join(content_root, prefix)))
+        except OSError:
+            return []
+
+    def test_output_within_limit_is_inline(self):
+        writer = self.writer()
+        event = {'result': {'stdout': 'a' * 10, 'stdout_lines': ['a' * 10]}}
+        writer._limit_output(event)
+
+        self.assertEqual(event, {'result': {'stdout': 'a' * 10}})
+        self.assertEqual(self.stored_content(), [])
+
+    def test_output_over_limit_is_stored(self):
+        writer = self.writer()
+        event = {'result': {'stdout': 'a' * 11, 'stderr': 'b' * 10}}
+        writer._limit_output(event)
+
+        self.assertEqual(event['result']['stderr'], 'b' * 10)
+        reference = event['result']['stdout']
+        self.assertEqual(reference['length'], 11)
+        digest = sha1(b'a' * 11).hexdigest()
+        self.assertEqual(reference['content'], join(CONTENT_DIRECTORY, digest[:2], digest))
+        self.assertEqual(self.stored_content(), [join(digest[:2], digest)])
+        with open(join(self.log_root, reference['content'])) as content_file:
+            self.assertEqual(content_file.read(), 'a' * 11)
+
+    def test_identical_output_is_stored_once(self):
+        writer = self.writer()
+        events = [
+            {
+                'result': {
+                    'stdout': 'a' * 20
+                }
+            },
+            {
+                'result': {
+                    'results': [{
+                        'stdout': 'a' * 20
+                    }, {
+                        'module_stderr': 'b' * 20
+                    }]
+                }
+            },
+        ]
+        writer._limit_output(events)
+
+        self.assertEqual(len(self.stored_content()), 2)
+        self.assertEqual(events[0]['result']['stdout'], events[1]['result']['results'][0]['stdout'])
+        self.assertNotEqual(events[0]['result']['stdout'], events[1]['result']['results'][1]['module_stderr'])
+
+    def test_truncated_output(self):
+        writer = self.writer(truncate_output=True)
+        event = {'stdout': 'a' * 15}
+        writer._limit_output(event)
+
+        self.assertEqual(event, {'stdout': '{}... [5 characters truncated]'.format('a' * 10)})
+        self.assertEqual(self.stored_content(), [])
+
+    def test_no_limit(self):
+        writer = self.writer(output_limit=0)
+        event = {'stdout': 'a' * 4096}
+        writer._limit_output(event)
+
+        self.assertEqual(event, {'stdout': 'a' * 4096})
+        self.assertEqual(self.stored_content(), [])
+
+    def test_reference_is_written_into_event(self):
+        writer = self.writer()
+        writer.emit(Mock(msg={'event': 'result', 'result': {'stdout': 'a' * 20}}))
+        writer.emit(Mock(msg={'event': 'result', 'result': {'stdout': 'short'}}))
+        writer.close()
+
+        events = [event for _, event in read_events(join(self.log_root, 'run.log.gz'))]
+        self.assertEqual(
+            events, [
+                {
+                    'event': 'result',
+                    'result': {
+                        'stdout': {
+                            'content': join(CONTENT_DIRECTORY, self.stored_content()[0]),
+                            'length': 20
+                        }
+                    }
+                },
+                {
+                    'event': 'result',
+                    'result': {
+                        'stdout': 'short'
+                    }
+                },
+            ]
+        )
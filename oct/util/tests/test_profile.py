@@ -0,0 +1,72 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function
+
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from oct.util.profile import critical_paths, profile_path, profiled_runs, read_profile, regressions, short_playbook_name, \
+    slowest_tasks, task_executions, task_statistics, write_profile
+
+
+def record(task, host, start, duration, role='', playbook='prepare/main'):
+    return {
+        'playbook': playbook,
+        'play': 'prepare',
+        'role': role,
+        'task': task,
+        'location': u'{}.yml:1'.format(task),
+        'host': host,
+        'status': 'ok',
+        'start': start,
+        'duration': duration,
+    }
+
+
+class ProfileTestCase(TestCase):
+    def test_round_trip(self):
+        profile_root = mkdtemp()
+        self.addCleanup(rmtree, profile_root)
+
+        records = [record(u'install ☃', 'one', 0.1, 2.5, role='golang')]
+        write_profile(profile_path(profile_root, 'second'), records)
+        write_profile(profile_path(profile_root, 'first'), [])
+
+        self.assertEqual(profiled_runs(profile_root), ['first', 'second'])
+        self.assertEqual(read_profile(profile_path(profile_root, 'second')), records)
+        self.assertEqual(read_profile(profile_path(profile_root, 'first')), [])
+
+    def test_short_playbook_name(self):
+        self.assertEqual(short_playbook_name('/usr/lib/oct/ansible/oct/playbooks/prepare/main.yml'), 'prepare/main')
+        self.assertEqual(short_playbook_name('/tmp/site.yml'), 'site')
+
+    def test_task_executions(self):
+        executions = task_executions([
+            record('second', 'one', 5.0, 1.0),
+            record('first', 'one', 0.0, 2.0),
+            record('first', 'two', 0.0, 4.0),
+            record('first', 'one', 6.0, 3.0),
+        ])
+        self.assertEqual([(execution['key'][2], execution['duration'], execution['host']) for execution in executions],
+                         [('first', 4.0, 'two'), ('second', 1.0, 'one'), ('first', 3.0, 'one')])
+
+    def test_aggregation(self):
+        baseline = {'old': [record('build', 'one', 0.0, 10.0, role='build'), record('test', 'one', 10.0, 5.0)], }
+        current = {
+            'new': [record('build', 'one', 0.0, 10.5, role='build'), record('test', 'one', 11.0, 9.0)],
+            'newer': [record('build', 'one', 0.0, 9.5, role='build'), record('test', 'two', 10.0, 12.0)],
+        }
+
+        statistics = task_statistics(current)
+        slowest = slowest_tasks(statistics, 1)
+        self.assertEqual([(task.key[2], task.mean, task.maximum, task.slowest_host) for task in slowest],
+                         [('test', 10.5, 12.0, 'two')])
+
+        regressed = regressions(task_statistics(baseline), statistics, threshold=0.1, minimum_change=1.0)
+        self.assertEqual([(old.mean, new.mean, new.key[2]) for old, new in regressed], [(5.0, 10.5, 'test')])
+        self.assertEqual(regressions(task_statistics(baseline), statistics, threshold=1.5, minimum_change=0), [])
+
+        path = critical_paths(current)['prepare/main']
+        self.assertEqual(path.mean, 20.5)
+        self.assertEqual(path.mean_wall_clock_time, 21.0)
+        self.assertEqual(path.mean_role_durations(), [('(no role)', 10.5), ('build', 10.0)])